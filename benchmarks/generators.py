@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+# =========================================================
+# 🧩【合成数据】—— 固定随机种子，规模由 n 控制，形状与真实输入一致
+# =========================================================
+
+def prediction_arrays(n, seed=0, n_categories=6):
+    """
+    回归预测结果：真实值、预测值（含与真实值相关的偏差和噪声）、类别、蛋白长度。
+
+    返回
+    -------
+    data : dict[str, np.ndarray]
+        键为 "True", "Pred", "Pred_b", "Category", "Protein_Len"
+    """
+    rng = np.random.default_rng(seed)
+    y_true = rng.normal(6.0, 1.5, n)
+    pred = 0.85 * y_true + 0.9 + rng.normal(0, 0.8, n)
+    pred_b = 0.7 * y_true + 1.8 + rng.normal(0, 1.0, n)
+    categories = np.array([f"assay_{i}" for i in range(n_categories)])[rng.integers(0, n_categories, n)]
+    length = rng.lognormal(5.8, 0.6, n).astype(np.int64) + 20
+    return {"True": y_true, "Pred": pred, "Pred_b": pred_b, "Category": categories, "Protein_Len": length}
+
+
+def write_prediction_csv(path, n, seed=0):
+    """预测结果 CSV（列同 prediction_arrays）。"""
+    pd.DataFrame(prediction_arrays(n, seed)).to_csv(path, index=False)
+    return path
+
+
+def write_xvg(path, n, seed=0):
+    """
+    GROMACS 风格的 RMSD .xvg：# / @ 注释头 + n 行（时间 ns, RMSD nm），RMSD 为有界随机游走。
+    """
+    rng = np.random.default_rng(seed)
+    time = np.arange(n) * 0.01
+    rmsd = np.clip(0.15 + np.cumsum(rng.normal(0, 0.002, n)), 0.05, None)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# This file was created by a synthetic benchmark generator\n"
+                "@    title \"RMSD\"\n@    xaxis  label \"Time (ns)\"\n@    yaxis  label \"RMSD (nm)\"\n"
+                "@TYPE xy\n")
+        np.savetxt(f, np.column_stack([time, rmsd]), fmt="%12.5f")
+    return path
+
+
+def cetsa_curves(n_proteins, n_temps=10, seed=0):
+    """
+    CETSA 熔解曲线矩阵：4PL 曲线（随机 Tm、斜率）+ 乘性噪声；MET 组 Tm 随机偏移。
+
+    返回
+    -------
+    temps : np.ndarray, shape (n_temps,)
+    con, met : np.ndarray, shape (n_proteins, n_temps)
+        原始强度（未归一化）
+    """
+    rng = np.random.default_rng(seed)
+    temps = np.linspace(37, 67, n_temps)
+    tm = rng.normal(52, 4, (n_proteins, 1))
+    slope = rng.uniform(8, 20, (n_proteins, 1))
+    scale = rng.lognormal(10, 1, (n_proteins, 1))
+
+    def curve(tm_):
+        frac = 0.05 + 0.95 / (1 + (temps / tm_) ** slope)
+        return scale * frac * rng.lognormal(0, 0.04, (n_proteins, n_temps))
+
+    return temps, curve(tm), curve(tm + rng.normal(2, 1.5, (n_proteins, 1)))
+
+
+def tpp2d_cube(n_proteins, seed=0, n_temps=10, concs=(0.0, 0.1, 0.5, 2.0, 10.0), hit_fraction=0.05):
+    """
+    2D-TPP 强度立方体：每个蛋白的熔解曲线；hit 的 Tm 随浓度按剂量-反应曲线偏移
+    （正负各半，pEC50 约 5~8），其余蛋白不受影响。
+
+    返回
+    -------
+    intensity : np.ndarray, shape (n_proteins, n_temps, len(concs))
+    temps, concs : np.ndarray
+    is_hit : np.ndarray[bool]
+    """
+    rng = np.random.default_rng(seed)
+    temps = np.linspace(37, 67, n_temps)
+    concs = np.asarray(concs, dtype=float)
+    tm = rng.normal(52, 4, (n_proteins, 1, 1))
+    slope = rng.uniform(8, 20, (n_proteins, 1, 1))
+    scale = rng.lognormal(10, 1, (n_proteins, 1, 1))
+    is_hit = rng.random(n_proteins) < hit_fraction
+    shift = np.where(is_hit, rng.choice([-1, 1], n_proteins) * rng.uniform(2, 6, n_proteins), 0.0)
+    ec50 = 10 ** -rng.uniform(5, 8, n_proteins) / 1e-6            # μM
+    dose = concs / (concs + ec50[:, None])                          # (n_proteins, n_concs)
+    tm_eff = tm + (shift[:, None] * dose)[:, None, :]
+    frac = 0.05 + 0.95 / (1 + (temps[None, :, None] / tm_eff) ** slope)
+    intensity = scale * frac * rng.lognormal(0, 0.04, (n_proteins, n_temps, len(concs)))
+    return intensity, temps, concs, is_hit
+
+
+def cetsa_single(n_points, seed=0):
+    """单个蛋白、n_points 个温度点（重复测量合并后）的 CETSA 数据。"""
+    rng = np.random.default_rng(seed)
+    temps = np.sort(rng.uniform(37, 67, n_points))
+    temps[0] = 37.0
+    con = 0.05 + 0.95 / (1 + (temps / 51) ** 14) + rng.normal(0, 0.02, n_points)
+    met = 0.05 + 0.95 / (1 + (temps / 54) ** 14) + rng.normal(0, 0.02, n_points)
+    return temps, np.abs(con) + 1e-3, np.abs(met) + 1e-3
+
+
+def write_feature_csv(path, n, n_features=12, seed=0):
+    """相关特征表：由少数潜变量线性组合生成，相关系数有正有负。"""
+    rng = np.random.default_rng(seed)
+    latent = rng.normal(size=(n, 3))
+    loadings = rng.normal(size=(3, n_features))
+    values = latent @ loadings + rng.normal(0, 1.0, (n, n_features))
+    pd.DataFrame(values, columns=[f"F{i + 1}" for i in range(n_features)]).to_csv(path, index=False)
+    return path
+
+
+def write_ranking_csv(path, n, n_scores=8, seed=0):
+    """评分函数比较表：真实亲和力 + n_scores 个不同噪声水平的评分列。"""
+    rng = np.random.default_rng(seed)
+    y = rng.normal(6, 1.5, n)
+    cols = {"True": y}
+    for i, noise in enumerate(np.linspace(0.6, 3.0, n_scores)):
+        cols[f"Score_{i}"] = -y * rng.uniform(0.5, 1.5) + rng.normal(0, noise, n)
+    pd.DataFrame(cols).to_csv(path, index=False)
+    return path
+
+
+def long_results_table(n, seed=0, n_methods=8, n_groups=3):
+    """长格式方法对比结果表（方法、划分、指标值），用于柱状图汇总。"""
+    rng = np.random.default_rng(seed)
+    method = rng.integers(0, n_methods, n)
+    group = rng.integers(0, n_groups, n)
+    value = 0.5 + 0.03 * method - 0.05 * group + rng.normal(0, 0.05, n)
+    return pd.DataFrame({"Method": np.array([f"M{i}" for i in range(n_methods)])[method],
+                         "Split": np.array(["random", "scaffold", "time"][:n_groups])[group],
+                         "Value": value})
@@ -0,0 +1,134 @@
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from run_benchmarks import BENCH_DIR, CASES, SCRIPTS_DIR
+
+# =========================================================
+# 🧩【内存回归】—— 同一进程内连续绘图 N 次，常驻内存不应持续增长
+# =========================================================
+# 每个绘图用例在独立子进程中运行：先预热（字体、字形、导入等一次性缓存），
+# 之后每次绘图记录当前 RSS。判定：
+#   growth        预热后 RSS 的线性趋势（最小二乘斜率 × 次数）≤ --max-growth-mb
+#                 （分配器会时而保留、时而归还编码用的大块空闲内存，RSS 可能在两档之间
+#                  成段跳动，首尾比较会误报；持续泄漏表现为稳定的正斜率）
+#   unreleased    结束时仍持有图元或 Agg 缓冲区的 Figure 数为 0
+#                 （render_utils.managed_figures 未释放的图、pyplot 中未关闭的图）
+
+# 只读数据、不绘图的用例不参与
+PLOT_CASES = [case for case in CASES if case not in ("read_xvg", "read_prediction_table", "cetsa_fit", "tpp2d_fit")]
+
+
+def _unreleased_figures():
+    from matplotlib.figure import Figure
+    gc.collect()
+    figures = [obj for obj in gc.get_objects() if isinstance(obj, Figure)]
+    n = sum(bool(fig.axes) or getattr(fig.canvas, "renderer", None) is not None for fig in figures)
+    if "matplotlib.pyplot" in sys.modules:
+        n += len(sys.modules["matplotlib.pyplot"].get_fignums())
+    return n
+
+
+def run_case(case, iterations=1000, size=1000, warmup=None, seed=0):
+    """
+    在当前进程中连续执行用例 iterations 次，返回结果字典：
+    case, iterations, ok, rss_start_bytes, rss_end_bytes（首尾 10% 的中位数，仅供参考）,
+    growth_bytes（趋势增长）, slope_bytes_per_iter, unreleased_figures, seconds, error。
+    """
+    sys.path[:0] = [SCRIPTS_DIR, BENCH_DIR]
+    import matplotlib
+    matplotlib.use("Agg")
+    import numpy as np
+    from worker_pool import current_rss_bytes
+
+    warmup = warmup if warmup is not None else max(20, iterations // 10)
+    result = {"case": case, "iterations": iterations, "ok": False, "rss_start_bytes": None,
+              "rss_end_bytes": None, "growth_bytes": None, "slope_bytes_per_iter": None,
+              "unreleased_figures": None, "seconds": None, "error": None}
+    try:
+        func, _ = CASES[case][1](size, seed)
+        for _ in range(warmup):
+            func()
+        rss = np.empty(iterations)
+        t0 = time.perf_counter()
+        for i in range(iterations):
+            func()
+            rss[i] = current_rss_bytes()
+        result["seconds"] = time.perf_counter() - t0
+        k = max(iterations // 10, 1)
+        result["rss_start_bytes"] = float(np.median(rss[:k]))
+        result["rss_end_bytes"] = float(np.median(rss[-k:]))
+        slope = float(np.polyfit(np.arange(iterations), rss, 1)[0]) if iterations > 1 else 0.0
+        result["slope_bytes_per_iter"] = slope
+        result["growth_bytes"] = slope * iterations
+        result["unreleased_figures"] = _unreleased_figures()
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def run_suite(cases=None, iterations=1000, size=1000, max_growth_mb=20.0, timeout=3600, verbose=True):
+    """
+    逐个用例运行内存回归检查（每个用例一个子进程）。
+
+    返回
+    -------
+    results : list[dict]
+        run_case 的结果，另含 passed
+    """
+    results = []
+    for case in cases or PLOT_CASES:
+        with tempfile.TemporaryDirectory(prefix="memreg_") as workdir:
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker", case,
+                   "--iterations", str(iterations), "--size", str(size)]
+            try:
+                out = subprocess.run(cmd, cwd=workdir, capture_output=True, text=True, timeout=timeout)
+                lines = out.stdout.strip().splitlines()
+                res = json.loads(lines[-1]) if lines else {
+                    "case": case, "ok": False, "error": out.stderr.strip()[-500:]}
+            except subprocess.TimeoutExpired:
+                res = {"case": case, "ok": False, "error": f"timeout ({timeout} s)"}
+        res["passed"] = (res["ok"] and res["growth_bytes"] <= max_growth_mb * 2 ** 20
+                         and res["unreleased_figures"] == 0)
+        results.append(res)
+        if verbose:
+            if res["ok"]:
+                print(f"[{'OK  ' if res['passed'] else 'FAIL'}] {case:<32s}"
+                      f"{res['rss_start_bytes'] / 2 ** 20:8.1f} → {res['rss_end_bytes'] / 2 ** 20:8.1f} MB  "
+                      f"趋势增长 {res['growth_bytes'] / 2 ** 20:+7.1f} MB  "
+                      f"斜率 {res['slope_bytes_per_iter'] / 1024:+7.1f} KB/次  "
+                      f"未释放 {res['unreleased_figures']}  {res['seconds']:7.1f} s")
+            else:
+                print(f"[FAIL] {case:<32s}{res['error'].splitlines()[-1] if res['error'] else ''}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="绘图函数内存回归检查（同一进程内重复绘图）")
+    parser.add_argument("--cases", nargs="*", default=None, help=f"用例（默认全部）: {', '.join(PLOT_CASES)}")
+    parser.add_argument("--iterations", type=int, default=1000, help="每个用例的绘图次数")
+    parser.add_argument("--size", type=int, default=1000, help="数据规模")
+    parser.add_argument("--max-growth-mb", type=float, default=20.0, help="预热后允许的 RSS 趋势增长")
+    parser.add_argument("--timeout", type=float, default=3600)
+    parser.add_argument("--output", default=None, help="结果 JSON 保存路径")
+    parser.add_argument("--worker", metavar="CASE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_case(args.worker, args.iterations, args.size)))
+        raise SystemExit(0)
+
+    results = run_suite(args.cases, args.iterations, args.size, args.max_growth_mb, args.timeout)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+    raise SystemExit(0 if all(r["passed"] for r in results) else 1)
+
+# python benchmarks/memory_regression.py                       # 全部用例各 1000 次
+# python benchmarks/memory_regression.py --cases plot_rmsd --iterations 200
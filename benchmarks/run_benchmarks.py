@@ -0,0 +1,330 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "scripts")
+
+# 规模阶梯 10² … 10⁷
+DEFAULT_SIZES = [10 ** k for k in range(2, 8)]
+
+# =========================================================
+# 🧩【基准用例】—— 用例名 → (最大规模, 准备函数)
+# =========================================================
+# 准备函数 setup(n, seed) 在计时之外生成数据（写入当前工作目录），
+# 返回 (被计时的无参函数, 输出文件列表)。每个 (用例, 规模) 在独立子进程中运行，
+# 峰值 RSS 互不影响。
+
+def _read_xvg(n, seed):
+    from generators import write_xvg
+    from gmx_rmsd_plot import read_xvg
+    path = write_xvg("traj.xvg", n, seed)
+    return (lambda: read_xvg(path)), []
+
+
+def _read_prediction_table(n, seed):
+    # 宽表中只读取雷达图所需的三列（float32）
+    from generators import write_prediction_csv
+    from table_io import read_arrays
+    path = write_prediction_csv("pred.csv", n, seed)
+    return (lambda: read_arrays(path, ["Protein_Len", "True", "Pred"])), []
+
+
+def _plot_rmsd(n, seed):
+    from generators import write_xvg
+    from gmx_rmsd_plot import plot_rmsd, read_xvg
+    df = read_xvg(write_xvg("traj.xvg", n, seed))
+    return (lambda: plot_rmsd(df, {"output_file": "rmsd.png", "ylim_auto": True})), ["rmsd.png"]
+
+
+def _plot_cetsa_curve(n, seed):
+    from generators import cetsa_single
+    from CETSA_curve import plot_cetsa_curve
+    temps, con, met = cetsa_single(n, seed)
+    ticks = [37, 42, 47, 52, 57, 62, 67]
+    return (lambda: plot_cetsa_curve(temps, con, met, x_ticks=ticks, save_path="cetsa.png")), ["cetsa.png"]
+
+
+def _cetsa_fit(n, seed):
+    # n 条曲线逐条 4PL 拟合（2D-TPP 规模的拟合开销）
+    import numpy as np
+    from scipy.optimize import curve_fit
+    from generators import cetsa_curves
+    from CETSA_curve import four_pl
+    temps, con, _ = cetsa_curves(n, seed=seed)
+    norm = con / con[:, :1]
+
+    def run():
+        for y in norm:
+            try:
+                curve_fit(four_pl, temps, y, maxfev=50000)
+            except RuntimeError:
+                pass
+    return run, []
+
+
+def _tpp2d_fit(n, seed):
+    # n 个蛋白 × 10 个温度 × 5 个浓度的批量 4PL 拟合与汇总
+    from generators import tpp2d_cube
+    from CETSA_curve import fit_tpp2d
+    intensity, temps, concs, _ = tpp2d_cube(n, seed=seed)
+    return (lambda: fit_tpp2d(intensity, temps, concs)), []
+
+
+def _mixed_corr(n, seed):
+    from generators import write_feature_csv
+    from mixed_corr_heatmap import plot_mixed_correlation_heatmap
+    path = write_feature_csv("features.csv", n, seed=seed)
+    return (lambda: plot_mixed_correlation_heatmap(path, save_path="corr.jpg")), ["corr.jpg"]
+
+
+def _metrics_radar(n, seed):
+    from generators import write_prediction_csv
+    from metrics_radar import plot_metrics_radar
+    path = write_prediction_csv("pred.csv", n, seed)
+    return (lambda: plot_metrics_radar(path, "Protein_Len", "True", "Pred", save_path="radar.png")), ["radar.png"]
+
+
+def _prediction_plot(func_name, module, **kwargs):
+    def setup(n, seed):
+        import importlib
+        from generators import prediction_arrays
+        func = getattr(importlib.import_module(module), func_name)
+        data = prediction_arrays(n, seed)
+        args = (data["True"], data["Pred"])
+        if func_name == "plot_pred_vs_true":
+            kwargs["categories"] = data["Category"]
+        return (lambda: func(*args, save_path="out.png", **kwargs)), ["out.png"]
+    return setup
+
+
+def _ranking(n, seed):
+    from generators import write_ranking_csv
+    from ranking_spearman import compute_spearman_ranking, plot_spearman_ranking
+    path = write_ranking_csv("scores.csv", n, seed=seed)
+
+    def run():
+        ranking = compute_spearman_ranking(path, "True", n_boot=1000, seed=seed)
+        plot_spearman_ranking(ranking, save_path="ranking.png", highlight_name="Score_0")
+    return run, ["ranking.png"]
+
+
+def _heatmap(n, seed):
+    # n 为单元格数：8 个模型 × n/8 列
+    import numpy as np
+    from heatmap import plot_heatmap_with_colorbar
+    rng = np.random.default_rng(seed)
+    data = {f"Model_{i}": rng.random(max(n // 8, 1)) for i in range(8)}
+    return (lambda: plot_heatmap_with_colorbar(data, annot=n <= 1000, heatmap_file="heat.png",
+                                               colorbar_file="cbar.png")), ["heat.png", "cbar.png"]
+
+
+def _bar_from_table(n, seed):
+    from generators import long_results_table
+    from hist import plot_bar_chart_from_table
+    table = long_results_table(n, seed)
+    return (lambda: plot_bar_chart_from_table(table, "Method", "Value", group_col="Split", err="ci",
+                                              save_path="bar.png", show=False)), ["bar.png"]
+
+
+CASES = {
+    "read_xvg": (10 ** 7, _read_xvg),
+    "read_prediction_table": (10 ** 7, _read_prediction_table),
+    "plot_rmsd": (10 ** 6, _plot_rmsd),
+    "plot_cetsa_curve": (10 ** 5, _plot_cetsa_curve),
+    "cetsa_fit": (10 ** 4, _cetsa_fit),
+    "tpp2d_fit": (10 ** 5, _tpp2d_fit),
+    "plot_mixed_correlation_heatmap": (10 ** 7, _mixed_corr),
+    "plot_metrics_radar": (10 ** 7, _metrics_radar),
+    "plot_residual_hist": (10 ** 7, _prediction_plot("plot_residual_hist", "plot_residual_hist", ytick_step=None)),
+    "plot_residual_scatter": (10 ** 5, _prediction_plot("plot_residual_scatter", "plot_residual_scatter")),
+    "plot_residual_scatter_binned": (10 ** 7, _prediction_plot("plot_residual_scatter", "plot_residual_scatter",
+                                                               mode="binned")),
+    "plot_sorted_curve": (10 ** 6, _prediction_plot("plot_sorted_curve", "plot_sorted_curve")),
+    "plot_sorted_curve_envelope": (10 ** 7, _prediction_plot("plot_sorted_curve", "plot_sorted_curve",
+                                                             mode="envelope")),
+    "plot_pred_vs_true": (10 ** 7, _prediction_plot("plot_pred_vs_true", "plot_pred_vs_true_slope_bias_histograms")),
+    "spearman_ranking": (10 ** 6, _ranking),
+    "plot_heatmap_with_colorbar": (10 ** 4, _heatmap),
+    "plot_bar_chart_from_table": (10 ** 7, _bar_from_table),
+}
+
+
+# =========================================================
+# 🧩【单个用例】—— 在子进程中执行
+# =========================================================
+def _peak_rss_bytes():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024   # Linux 单位为 KB
+
+
+def run_case(case, n, repeats=3, seed=0):
+    """
+    执行一个 (用例, 规模)，返回结果字典：
+    case, size, ok, seconds（最短一次）, seconds_all, setup_seconds,
+    setup_rss_bytes, peak_rss_bytes, output_bytes, stages（最短一次的分阶段耗时与计数）, error。
+    """
+    sys.path[:0] = [SCRIPTS_DIR, BENCH_DIR]
+    import matplotlib
+    matplotlib.use("Agg")
+    import profiling
+
+    result = {"case": case, "size": n, "ok": False, "seconds": None, "seconds_all": [],
+              "setup_seconds": None, "setup_rss_bytes": None, "peak_rss_bytes": None,
+              "output_bytes": None, "stages": None, "error": None}
+    try:
+        t0 = time.perf_counter()
+        func, outputs = CASES[case][1](n, seed)
+        result["setup_seconds"] = time.perf_counter() - t0
+        result["setup_rss_bytes"] = _peak_rss_bytes()
+        runs = []
+        for _ in range(repeats):
+            with profiling.collect() as records:
+                t0 = time.perf_counter()
+                func()
+                seconds = time.perf_counter() - t0
+            runs.append((seconds, [r.to_dict() for r in records]))
+            result["seconds_all"].append(seconds)
+        result["seconds"], best = min(runs, key=lambda run: run[0])
+        result["stages"] = best
+        result["output_bytes"] = sum(os.path.getsize(p) for p in outputs)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["peak_rss_bytes"] = _peak_rss_bytes()
+    return result
+
+
+# =========================================================
+# 🧩【运行与对比】
+# =========================================================
+def environment():
+    import importlib.metadata as md
+    versions = {}
+    for lib in ["numpy", "pandas", "matplotlib", "seaborn", "scipy"]:
+        try:
+            versions[lib] = md.version(lib)
+        except md.PackageNotFoundError:
+            versions[lib] = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **versions}
+
+
+def run_suite(cases=None, sizes=None, max_size=None, repeats=3, seed=0, timeout=600, verbose=True):
+    """
+    运行基准用例阶梯，每个 (用例, 规模) 一个子进程。
+
+    参数
+    ----------
+    cases : list[str], optional
+        用例名，默认全部
+    sizes : list[int], optional
+        规模阶梯，默认 10² … 10⁷（超过用例最大规模的跳过）
+    max_size : int, optional
+        全局规模上限
+    repeats : int
+        每个规模的重复次数（取最短时间）；规模 ≥ 10⁶ 时只运行一次
+    timeout : float
+        单个子进程超时秒数；超时的用例不再运行更大的规模
+
+    返回
+    -------
+    report : dict
+        {"environment": {...}, "results": [...]}
+    """
+    results = []
+    for case in cases or CASES:
+        case_max = CASES[case][0]
+        for n in sizes or DEFAULT_SIZES:
+            if n > case_max or (max_size is not None and n > max_size):
+                continue
+            reps = 1 if n >= 10 ** 6 else repeats
+            with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+                cmd = [sys.executable, os.path.abspath(__file__), "--worker", case, str(n),
+                       "--repeats", str(reps), "--seed", str(seed)]
+                try:
+                    out = subprocess.run(cmd, cwd=workdir, capture_output=True, text=True, timeout=timeout)
+                    lines = out.stdout.strip().splitlines()
+                    res = json.loads(lines[-1]) if lines else {
+                        "case": case, "size": n, "ok": False, "error": out.stderr.strip()[-500:]}
+                except subprocess.TimeoutExpired:
+                    res = {"case": case, "size": n, "ok": False, "error": f"timeout ({timeout} s)"}
+            results.append(res)
+            if verbose:
+                if res["ok"]:
+                    print(f"[OK  ] {case:<32s}{n:>10,d}  {res['seconds']:9.3f} s  "
+                          f"{res['peak_rss_bytes'] / 2 ** 20:8.1f} MB  {res['output_bytes'] / 1024:9.1f} KB")
+                else:
+                    print(f"[FAIL] {case:<32s}{n:>10,d}  {res['error'].splitlines()[-1] if res['error'] else ''}")
+            if not res["ok"] and "timeout" in (res.get("error") or ""):
+                break
+    return {"environment": environment(), "results": results}
+
+
+def compare(report, baseline, tolerance=0.25, min_seconds=0.05, verbose=True):
+    """
+    与基线对比，返回回归列表：耗时或峰值 RSS 超过基线 (1 + tolerance) 倍的 (用例, 规模)。
+    耗时差小于 min_seconds 的不计入（避免计时噪声）。
+    """
+    base = {(r["case"], r["size"]): r for r in baseline["results"] if r.get("ok")}
+    regressions = []
+    if verbose:
+        print(f"\n{'用例':<32s}{'规模':>10s}  {'耗时比':>8s}  {'RSS 比':>8s}  {'输出比':>8s}")
+    for r in report["results"]:
+        b = base.get((r["case"], r["size"]))
+        if b is None or not r.get("ok"):
+            continue
+        t_ratio = r["seconds"] / max(b["seconds"], 1e-9)
+        m_ratio = r["peak_rss_bytes"] / max(b["peak_rss_bytes"], 1)
+        o_ratio = r["output_bytes"] / b["output_bytes"] if b["output_bytes"] else 1.0
+        slow = t_ratio > 1 + tolerance and r["seconds"] - b["seconds"] > min_seconds
+        heavy = m_ratio > 1 + tolerance
+        if slow or heavy:
+            regressions.append({"case": r["case"], "size": r["size"], "time_ratio": t_ratio, "rss_ratio": m_ratio})
+        if verbose:
+            flag = "  ← 回归" if slow or heavy else ""
+            print(f"{r['case']:<32s}{r['size']:>10,d}  {t_ratio:8.2f}  {m_ratio:8.2f}  {o_ratio:8.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="绘图函数基准测试（耗时 / 峰值 RSS / 输出大小）")
+    parser.add_argument("--cases", nargs="*", default=None, help=f"用例（默认全部）: {', '.join(CASES)}")
+    parser.add_argument("--sizes", nargs="*", type=int, default=None, help="规模阶梯，默认 10^2 … 10^7")
+    parser.add_argument("--max-size", type=int, default=None, help="规模上限")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", default=None, help="结果 JSON 保存路径")
+    parser.add_argument("--baseline", default=None, help="基线 JSON；给定时对比并在回归时返回非零")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对变慢 / 内存增长")
+    parser.add_argument("--worker", nargs=2, metavar=("CASE", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_case(args.worker[0], int(args.worker[1]), args.repeats, args.seed)))
+        raise SystemExit(0)
+
+    report = run_suite(args.cases, args.sizes, args.max_size, args.repeats, args.seed, args.timeout)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    failed = not all(r["ok"] for r in report["results"])
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        failed |= bool(regressions)
+    raise SystemExit(1 if failed else 0)
+
+# 保存基线：
+# python benchmarks/run_benchmarks.py --max-size 100000 --output benchmarks/baseline.json
+#
+# 修改代码后对比：
+# python benchmarks/run_benchmarks.py --max-size 100000 --output latest.json --baseline benchmarks/baseline.json
@@ -1,6 +1,8 @@
+import os
+
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
 
 # ============================
 # 0. 定义 4PL 模型
@@ -12,6 +14,7 @@ def four_pl(x, a, b, c, d):
 # ============================
 # 1. 绘图函数
 # ============================
+@profiled
 def plot_cetsa_curve(
     temps,            # 实际温度数组，用于拟合
     con_raw,          # CON 原始强度
@@ -29,6 +32,8 @@ def plot_cetsa_curve(
     MET = met_raw / met_raw[0]
 
     # 拟合 4PL
+    from scipy.optimize import curve_fit
+    mark("import")
     popt_CON, _ = curve_fit(four_pl, temps, CON, maxfev=50000)
     popt_MET, _ = curve_fit(four_pl, temps, MET, maxfev=50000)
 
@@ -51,55 +56,385 @@ def plot_cetsa_curve(
     legend_fontsize = 12
     spine_width = 3
 
+    mark("stats")
+
     # ============================
     # 绘图
     # ============================
-    plt.figure(figsize=(8, 6))
-
-    # 原始数据点
-    plt.scatter(temps, CON, label="CON raw", color=color_CON, **scatter_params_con)
-    plt.scatter(temps, MET, label="MET raw", color=color_MET, **scatter_params_met)
-
-    # 拟合曲线
-    plt.plot(x_fit, CON_fit, label="CON - 4PL", color=color_CON, **line_params)
-    plt.plot(x_fit, MET_fit, label="MET - 4PL", color=color_MET, **line_params)
-
-    # 坐标轴刻度
-    if x_ticks is None:
-        x_ticks = temps
-    plt.xticks(x_ticks, [str(int(t)) for t in x_ticks], fontsize=tick_fontsize)
-    plt.yticks(fontsize=tick_fontsize)
-    plt.xlabel("Temperature (°C)", fontsize=label_fontsize)
-    plt.ylabel("Normalized Intensity", fontsize=label_fontsize)
-    plt.title("CETSA Curve Fitting: 4PL", fontsize=title_fontsize)
-
-    # 网格
-    plt.grid(False)
-
-    # 边框样式
-    ax = plt.gca()
-    for spine in ax.spines.values():
-        spine.set_linewidth(spine_width)
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-
-    # 图例
-    plt.legend(fontsize=legend_fontsize)
-
-    # 保存或显示
-    plt.tight_layout()
-    if save_path:
-        plt.savefig(save_path, dpi=300)
-        plt.close()
-    else:
-        plt.show()
+    with scoped_style():
+        fig, ax = new_subplots(figsize=(8, 6), show=save_path is None)
+
+        # 原始数据点
+        ax.scatter(temps, CON, label="CON raw", color=color_CON, **scatter_params_con)
+        ax.scatter(temps, MET, label="MET raw", color=color_MET, **scatter_params_met)
+
+        # 拟合曲线
+        ax.plot(x_fit, CON_fit, label="CON - 4PL", color=color_CON, **line_params)
+        ax.plot(x_fit, MET_fit, label="MET - 4PL", color=color_MET, **line_params)
+
+        # 坐标轴刻度
+        if x_ticks is None:
+            x_ticks = temps
+        ax.set_xticks(x_ticks, [str(int(t)) for t in x_ticks], fontsize=tick_fontsize)
+        ax.tick_params(axis='y', labelsize=tick_fontsize)
+        ax.set_xlabel("Temperature (°C)", fontsize=label_fontsize)
+        ax.set_ylabel("Normalized Intensity", fontsize=label_fontsize)
+        ax.set_title("CETSA Curve Fitting: 4PL", fontsize=title_fontsize)
+
+        # 网格
+        ax.grid(False)
+
+        # 边框样式
+        for spine in ax.spines.values():
+            spine.set_linewidth(spine_width)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+
+        # 图例
+        ax.legend(fontsize=legend_fontsize)
+
+        # 保存或显示
+        mark("artists")
+        fig.tight_layout()
+        mark("layout")
+        save_figure(fig, save_path, show=save_path is None, dpi=300)
 
     # 输出 Tm
     Tm_results = {"CON_Tm": popt_CON[2], "MET_Tm": popt_MET[2]}
     return popt_CON, popt_MET, Tm_results
 
 # ============================
-# 2. 示例调用
+# 2. 批量 4PL 拟合（向量化 Levenberg–Marquardt）
+# ============================
+# 2D-TPP（温度 × 化合物浓度）每个蛋白有 温度数 条剂量-反应曲线，全蛋白组为数万条；
+# 逐条 curve_fit 每条约几毫秒。这里把所有曲线的参数放在一个 (n, 4) 数组中同时迭代：
+# 每一步用解析雅可比矩阵构造 n 个 4×4 的正规方程并批量求解，各曲线独立调整阻尼，
+# 已收敛的曲线退出后续迭代。EC50 以 ln c 为参数，保证为正。
+
+def _four_pl_with_jacobian(log_x, p):
+    """p: (n, 4) = [a, b, ln c, d]；返回 f (n, m) 与 ∂f/∂p (n, m, 4)。"""
+    a, b, log_c, d = (p[:, i:i + 1] for i in range(4))
+    u = log_x - log_c
+    r = np.exp(np.clip(b * u, -50, 50))       # (x / c)^b
+    s = 1 / (1 + r)
+    f = d + (a - d) * s
+    drs = (a - d) * r * s * s
+    jac = np.stack([s, -drs * u, drs * b, 1 - s], axis=-1)
+    return f, jac
+
+
+def fit_four_pl_batch(x, Y, p0=None, n_starts=3, max_iter=200, tol=1e-8):
+    """
+    对多条共用横坐标的曲线同时拟合 four_pl。
+
+    参数
+    ----------
+    x : array-like, shape (m,)
+        横坐标（> 0）
+    Y : np.ndarray, shape (n, m)
+        每行一条曲线；NaN 视为缺失，不参与拟合
+    p0 : np.ndarray, shape (n, 4), optional
+        初值 [a, b, c, d]；默认 a、d 取首尾点，b = 1，c 取 x 的几何中点；拟合不好
+        （R² < 0.99）的曲线再以 x 范围内其他对数等距点为 c 的初值重拟合，保留残差最小的结果
+        （初值落在平台区时可能停在水平直线上）
+    n_starts : int
+        未给出 p0 时每条曲线的初值个数
+    max_iter : int
+        最大迭代次数
+    tol : float
+        残差平方和的相对下降小于 tol 时视为收敛
+
+    返回
+    -------
+    fit : dict
+        a, b, c, d（与 four_pl 参数相同，b 统一为非负）, sse, r2, converged，均为长度 n 的数组
+    """
+    log_x = np.log(np.asarray(x, dtype=float))
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    if p0 is None and n_starts > 1:
+        fit = fit_four_pl_batch(x, Y, max_iter=max_iter, tol=tol, n_starts=1)
+        n = len(Y)
+        first = np.argmax(np.isfinite(Y), axis=1)
+        last = Y.shape[1] - 1 - np.argmax(np.isfinite(Y[:, ::-1]), axis=1)
+        ends = np.nan_to_num(np.column_stack([Y[np.arange(n), first], Y[np.arange(n), last]]))
+        grid = np.linspace(log_x.min(), log_x.max(), n_starts + 2)[1:-1]
+        for log_c in np.delete(grid, len(grid) // 2):
+            redo = np.flatnonzero(~(fit["r2"] >= 0.99) & np.isfinite(fit["sse"]))
+            if not redo.size:
+                break
+            start = np.column_stack([ends[redo, 0], np.ones(len(redo)), np.full(len(redo), np.exp(log_c)),
+                                     ends[redo, 1]])
+            alt = fit_four_pl_batch(x, Y[redo], start, max_iter=max_iter, tol=tol)
+            better = alt["sse"] < fit["sse"][redo]
+            for key in fit:
+                fit[key][redo[better]] = alt[key][better]
+        return fit
+
+    n = len(Y)
+    w = np.isfinite(Y)
+    Yw = np.where(w, Y, 0.0)
+    if p0 is None:
+        first = np.argmax(w, axis=1)
+        last = Y.shape[1] - 1 - np.argmax(w[:, ::-1], axis=1)
+        p = np.column_stack([Yw[np.arange(n), first], np.ones(n),
+                             np.full(n, log_x.mean()), Yw[np.arange(n), last]])
+    else:
+        p = np.array(p0, dtype=float)
+        p[:, 2] = np.log(p[:, 2])
+    lo_c, hi_c = log_x.min() - np.log(100), log_x.max() + np.log(100)   # EC50 不超出浓度范围两个数量级
+
+    f, jac = _four_pl_with_jacobian(log_x, p)
+    sse = ((Yw - f) ** 2 * w).sum(axis=1)
+    lam = np.full(n, 1e-3)
+    active = w.sum(axis=1) >= 4
+    converged = np.zeros(n, dtype=bool)
+    eye = np.eye(4)
+    for _ in range(max_iter):
+        idx = np.flatnonzero(active)
+        if not idx.size:
+            break
+        J = jac[idx] * w[idx, :, None]
+        res = (Yw[idx] - f[idx]) * w[idx]
+        JTJ = np.einsum("nmi,nmj->nij", J, J)
+        g = np.einsum("nmi,nm->ni", J, res)
+        A = JTJ + lam[idx, None, None] * (JTJ * eye + 1e-12 * eye)
+        try:
+            step = np.linalg.solve(A, g[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            step = (np.linalg.pinv(A) @ g[..., None])[..., 0]
+        p_new = p[idx] + step
+        p_new[:, 1] = np.clip(p_new[:, 1], -50, 50)
+        p_new[:, 2] = np.clip(p_new[:, 2], lo_c, hi_c)
+        f_new, jac_new = _four_pl_with_jacobian(log_x, p_new)
+        sse_new = ((Yw[idx] - f_new) ** 2 * w[idx]).sum(axis=1)
+
+        better = sse_new < sse[idx]
+        gain = (sse[idx] - sse_new) / np.maximum(sse[idx], 1e-300)
+        ok = idx[better]
+        p[ok], f[ok], jac[ok], sse[ok] = p_new[better], f_new[better], jac_new[better], sse_new[better]
+        lam[ok] = np.maximum(lam[ok] / 3, 1e-12)
+        lam[idx[~better]] *= 4
+        # 收敛：接受的一步几乎没有改进，或阻尼增大到步长可忽略（已在极小值处）
+        done = (better & (gain < tol)) | (lam[idx] > 1e12)
+        converged[idx[done]] = True
+        active[idx[done]] = False
+
+    # b < 0 与交换 a、d 后 b > 0 是同一条曲线
+    flip = p[:, 1] < 0
+    p[flip] = p[flip][:, [3, 1, 2, 0]]
+    p[flip, 1] *= -1
+    sst = (((Yw - (Yw * w).sum(1, keepdims=True) / np.maximum(w.sum(1, keepdims=True), 1)) ** 2) * w).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(sst > 0, 1 - sse / sst, np.nan)
+    fitted = w.sum(axis=1) >= 4
+    nan = np.where(fitted, 1.0, np.nan)
+    return {"a": p[:, 0] * nan, "b": p[:, 1] * nan, "c": np.exp(p[:, 2]) * nan, "d": p[:, 3] * nan,
+            "sse": sse * nan, "r2": r2 * nan, "converged": converged & fitted}
+
+
+# ============================
+# 3. 2D-TPP：温度 × 浓度
+# ============================
+# 每个温度下以溶剂对照（浓度 0）归一化得到倍数变化 FC，对浓度拟合 4PL（对照点放在
+# 最低浓度再往下一个稀释梯度处）。对每个蛋白：
+#   有效温度  拟合 R² ≥ r2_min，且最高浓度处的拟合 |log2 FC| ≥ log2(min_fold)
+#   pEC50     各有效温度 pEC50 的中位数
+#   稳定性得分 各有效温度最高浓度处 log2 FC 之和（正：热稳定，负：去稳定）
+#   hit       有效温度数 ≥ min_temps
+
+def read_tpp2d_table(path, protein_col="protein", temp_col="temperature", conc_col="concentration",
+                     value_col="intensity"):
+    """
+    读取长表（每行一个 蛋白 × 温度 × 浓度 的强度，.csv / .parquet / .feather）。
+
+    返回
+    -------
+    intensity : np.ndarray, shape (n_proteins, n_temps, n_concs)
+        缺少的组合为 NaN
+    temps, concs : np.ndarray
+        升序
+    proteins : np.ndarray
+    """
+    from table_io import read_arrays
+    cols = read_arrays(path, [protein_col, temp_col, conc_col, value_col], float_dtype=np.float64,
+                       categorical=False)
+    proteins, pi = np.unique(np.asarray(cols[protein_col]), return_inverse=True)
+    temps, ti = np.unique(cols[temp_col], return_inverse=True)
+    concs, ci = np.unique(cols[conc_col], return_inverse=True)
+    intensity = np.full((len(proteins), len(temps), len(concs)), np.nan)
+    intensity[pi, ti, ci] = cols[value_col]
+    return intensity, temps, concs, proteins
+
+
+def fit_tpp2d(intensity, temps, concs, proteins=None, conc_unit=1e-6, r2_min=0.8, min_fold=1.5, min_temps=2):
+    """
+    2D-TPP 批量拟合：所有蛋白、所有温度的剂量-反应曲线一次性拟合。
+
+    参数
+    ----------
+    intensity : np.ndarray, shape (n_proteins, n_temps, n_concs)
+        原始强度
+    temps, concs : array-like
+        温度与浓度（须包含 0，即溶剂对照）
+    proteins : array-like, optional
+        蛋白名，默认为序号
+    conc_unit : float
+        浓度单位（摩尔），默认 μM；pEC50 = -log10(EC50 × conc_unit)
+    r2_min, min_fold, min_temps :
+        有效温度与 hit 的判定阈值（见上）
+
+    返回
+    -------
+    summary : pd.DataFrame
+        每个蛋白一行：protein, hit, n_temps_valid, pEC50, stability_score, max_log2fc, best_temperature
+    fits : pd.DataFrame
+        每个 蛋白 × 温度 一行：protein, temperature, top, bottom, hill, ec50, pEC50, r2, log2fc_top, converged
+    log2fc : np.ndarray, shape (n_proteins, n_temps, n_concs - 1)
+        各非零浓度相对对照的 log2 FC（绘制 hit 热图用）
+    """
+    import pandas as pd
+
+    intensity = np.asarray(intensity, dtype=float)
+    temps, concs = np.asarray(temps, dtype=float), np.asarray(concs, dtype=float)
+    n_prot, n_temp, _ = intensity.shape
+    proteins = np.arange(n_prot) if proteins is None else np.asarray(proteins)
+    order = np.argsort(concs)
+    concs, intensity = concs[order], intensity[..., order]
+    if concs[0] != 0:
+        raise ValueError("concs 中需要包含 0（溶剂对照），用于归一化")
+    doses = concs[1:]
+    step = doses[1] / doses[0] if len(doses) > 1 else 10.0
+    x = np.concatenate([[doses[0] / step], doses])   # 对照放在下一个稀释梯度处
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fc = intensity / intensity[..., :1]
+    fc[~np.isfinite(fc)] = np.nan
+    fit = fit_four_pl_batch(x, fc.reshape(n_prot * n_temp, -1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        top = four_pl(doses[-1], fit["a"], fit["b"], fit["c"], fit["d"])
+        log2fc_top = np.log2(np.where(top > 0, top, np.nan)).reshape(n_prot, n_temp)
+        log2fc = np.log2(fc[..., 1:])
+    pec50 = (-np.log10(fit["c"] * conc_unit)).reshape(n_prot, n_temp)
+    r2 = fit["r2"].reshape(n_prot, n_temp)
+
+    valid = (r2 >= r2_min) & (np.abs(log2fc_top) >= np.log2(min_fold))
+    n_valid = valid.sum(axis=1)
+    effect = np.where(valid, log2fc_top, 0.0)
+    strongest = np.argmax(np.abs(effect), axis=1)
+    any_effect = np.nan_to_num(np.abs(log2fc_top), nan=-1.0)
+    rows = np.arange(n_prot)
+    summary = pd.DataFrame({
+        "protein": proteins,
+        "hit": n_valid >= min_temps,
+        "n_temps_valid": n_valid,
+        "pEC50": _masked_median(pec50, valid),
+        "stability_score": effect.sum(axis=1),
+        "max_log2fc": log2fc_top[rows, np.argmax(any_effect, axis=1)],
+        "best_temperature": np.where(n_valid > 0, temps[strongest], np.nan),
+    })
+    fits = pd.DataFrame({
+        "protein": np.repeat(proteins, n_temp),
+        "temperature": np.tile(temps, n_prot),
+        "top": fit["a"], "bottom": fit["d"], "hill": fit["b"], "ec50": fit["c"],
+        "pEC50": pec50.ravel(), "r2": fit["r2"], "log2fc_top": log2fc_top.ravel(),
+        "converged": fit["converged"],
+    })
+    return summary, fits, log2fc
+
+
+def _masked_median(values, mask):
+    v = np.sort(np.where(mask, values, np.nan), axis=1)   # NaN 排在最后
+    k = mask.sum(axis=1)
+    rows = np.arange(len(v))
+    lo, hi = (np.maximum(k - 1, 0)) // 2, k // 2
+    return np.where(k > 0, (v[rows, lo] + v[rows, np.minimum(hi, v.shape[1] - 1)]) / 2, np.nan)
+
+
+@profiled
+def plot_tpp2d_heatmap(log2fc, temps, concs, title=None, vlim=None, cmap="RdBu_r", figsize=(3.2, 2.6),
+                       save_path=None):
+    """
+    单个蛋白的 2D-TPP 热图（行：温度，列：非零浓度，颜色：log2 FC），尺寸紧凑，便于批量输出。
+
+    参数
+    ----------
+    log2fc : np.ndarray, shape (n_temps, n_concs)
+    temps, concs : array-like
+        与 log2fc 的行、列对应（concs 不含对照）
+    title : str, optional
+        标题（通常为蛋白名）
+    vlim : float, optional
+        颜色范围 ±vlim，默认取 |log2fc| 的最大值；一组 hit 使用同一值颜色才可比较
+    """
+    log2fc = np.asarray(log2fc, dtype=float)
+    if vlim is None:
+        vlim = float(np.nanmax(np.abs(log2fc))) if np.isfinite(log2fc).any() else 1.0
+    mark("stats")
+
+    with scoped_style():
+        fig, ax = new_subplots(figsize=figsize, show=save_path is None)
+        im = ax.imshow(log2fc, cmap=cmap, vmin=-vlim, vmax=vlim, aspect="auto", origin="lower",
+                       interpolation="nearest")
+        ax.set_xticks(range(len(concs)), [f"{c:g}" for c in concs], fontsize=7, rotation=45)
+        ax.set_yticks(range(len(temps)), [f"{t:.3g}" for t in temps], fontsize=7)
+        ax.set_xlabel("Concentration", fontsize=8)
+        ax.set_ylabel("Temperature (°C)", fontsize=8)
+        if title is not None:
+            ax.set_title(str(title), fontsize=9, fontweight="bold")
+        cbar = fig.colorbar(im, ax=ax, fraction=0.08, pad=0.03)
+        cbar.ax.tick_params(labelsize=7)
+        cbar.set_label("log2 FC", fontsize=7)
+
+        mark("artists")
+        fig.tight_layout()
+        mark("layout")
+        save_figure(fig, save_path, show=save_path is None, dpi=300)
+
+
+def plot_tpp2d_hits(summary, log2fc, temps, concs, out_dir="tpp2d_hits", top=None, fmt="png",
+                    max_workers=None, threads=False, verbose=False):
+    """
+    为 fit_tpp2d 判定的每个 hit 输出一张 plot_tpp2d_heatmap（并行，颜色范围一致）。
+
+    参数
+    ----------
+    summary, log2fc :
+        同一次 fit_tpp2d 调用的返回值；summary 可以先筛选或排序（如 summary[summary.hit]），
+        但须保留其原始索引（即 log2fc 中的行号），每张图按索引取对应蛋白的数据
+    temps, concs : array-like
+        温度与浓度（concs 可含 0，绘图时去掉）
+    top : int, optional
+        只输出 |stability_score| 最大的前 top 个 hit
+    max_workers, threads, verbose :
+        传给 batch_render.render_batch
+
+    返回
+    -------
+    results : list[dict]
+        render_batch 的逐图结果
+    """
+    from batch_render import render_batch
+
+    hits = summary.index[summary["hit"].to_numpy()]
+    hits = hits[np.argsort(-summary.loc[hits, "stability_score"].abs().to_numpy(), kind="stable")][:top]
+    concs = np.sort(np.asarray(concs, dtype=float))
+    concs = concs[concs > 0].tolist()
+    temps = np.asarray(temps, dtype=float).tolist()
+    values = log2fc[hits.to_numpy()]   # 按原始行号取，而不是在（可能已筛选的）summary 中的位置
+    vlim = float(np.nanmax(np.abs(values))) if np.isfinite(values).any() else 1.0
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = []
+    for i, row in zip(hits, values):
+        name = str(summary.at[i, "protein"])
+        safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+        jobs.append({"id": name, "function": "plot_tpp2d_heatmap",
+                     "kwargs": {"log2fc": row, "temps": temps, "concs": concs, "title": name, "vlim": vlim,
+                                "save_path": os.path.join(out_dir, f"{safe}.{fmt}")}})
+    return render_batch(jobs, max_workers=max_workers, threads=threads, verbose=verbose)
+
+
+# ============================
+# 4. 示例调用
 # ============================
 if __name__ == "__main__":
     # 示例数据
@@ -115,3 +450,9 @@ if __name__ == "__main__":
     print("===== Tm Results =====")
     print(f"CON - 4PL Tm: {Tm_results['CON_Tm']:.3f}")
     print(f"MET - 4PL Tm: {Tm_results['MET_Tm']:.3f}")
+
+# 2D-TPP（长表：protein, temperature, concentration, intensity）：
+# intensity, temps, concs, proteins = read_tpp2d_table("tpp2d.csv")
+# summary, fits, log2fc = fit_tpp2d(intensity, temps, concs, proteins)
+# summary.sort_values("stability_score").to_csv("tpp2d_summary.csv", index=False)
+# plot_tpp2d_hits(summary, log2fc, temps, concs, out_dir="tpp2d_hits", max_workers=8)
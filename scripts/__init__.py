@@ -0,0 +1,60 @@
+"""
+matplotlib-demos 绘图脚本集合。
+
+    import scripts
+    scripts.plot_residual_hist(y_true, y_pred, save_path="residual_hist.png")
+
+导入本包不会加载 matplotlib / pandas / seaborn / scipy；每个绘图函数在第一次
+访问时才导入其所在脚本，脚本内的重量级依赖也推迟到函数实际调用时导入。
+命令行入口见 python -m scripts --help。
+"""
+import importlib
+import os
+import sys
+
+# 各脚本以同目录模块名相互导入（from render_utils import ...），作为包使用时也保持可用
+_SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, _SCRIPTS_DIR)
+
+from plot_registry import PLOT_FUNCTIONS, get_plot_function  # noqa: E402  （只依赖标准库）
+
+# 绘图函数以外的常用接口：名称 → 所在模块
+_HELPERS = {
+    "PredictionSet": "prediction_set",
+    "read_xvg": "gmx_rmsd_plot",
+    "aggregate_long_table": "hist",
+    "fit_tpp2d": "CETSA_curve",
+    "read_tpp2d_table": "CETSA_curve",
+    "plot_heatmap_batch": "heatmap",
+    "read_table": "table_io",
+    "read_arrays": "table_io",
+    "ImageBuffer": "render_utils",
+    "FigureExport": "render_utils",
+    "render_image": "render_utils",
+    "export_plot": "render_utils",
+    "managed_figures": "render_utils",
+    "EncodePipeline": "encode_pipeline",
+    "RenderCache": "render_cache",
+    "render_batch": "batch_render",
+    "compose_figure": "figure_composer",
+    "RecyclingPool": "worker_pool",
+    "generate_report": "regression_report",
+}
+
+__all__ = sorted(PLOT_FUNCTIONS) + sorted(_HELPERS)
+
+
+def __getattr__(name):
+    if name in PLOT_FUNCTIONS:
+        value = get_plot_function(name)
+    elif name in _HELPERS:
+        value = getattr(importlib.import_module(_HELPERS[name]), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value   # 之后的访问不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
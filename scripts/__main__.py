@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from scripts import PLOT_FUNCTIONS, get_plot_function
+
+# =========================================================
+# 🧩【统一命令行】
+# =========================================================
+#   python -m scripts list
+#   python -m scripts plot_residual_hist y_true=@pred.csv:True y_pred=@pred.csv:Pred save_path=out.png
+#   python -m scripts plot_rmsd df=@rmsd.xvg 'config={"output_file": "rmsd.png"}' --formats png,pdf
+#   python -m scripts check-imports
+#
+# 参数写作 名称=值：值按 JSON 解析（数字、列表、字典、true/false/null），失败时作为字符串；
+# @ 开头的值从文件读取：
+#   @文件.csv:列名 → 该列的 np.ndarray（.parquet / .feather 同样）
+#   @文件.xvg      → read_xvg 的 DataFrame
+#   @文件.npy      → np.ndarray
+
+# 各绘图模块的导入耗时预算（秒，冷启动、不含解释器启动）。
+# 基准为 matplotlib 的 Figure + Agg 后端（约 0.3 s）；用到 pandas 的模块另加约 0.3 s。
+IMPORT_BUDGET = {
+    "CETSA_curve": 0.6,
+    "hist": 0.6,
+    "plot_pred_vs_true_slope_bias_histograms": 0.6,
+    "plot_residual_hist": 0.6,
+    "plot_residual_scatter": 0.6,
+    "plot_sorted_curve": 0.6,
+    "mixed_corr_heatmap": 0.6,
+    "gmx_rmsd_plot": 0.9,
+    "heatmap": 0.9,
+    "metrics_radar": 0.9,
+    "ranking_spearman": 0.9,
+}
+
+# 导入包本身时不应加载的模块
+LAZY_MODULES = ["matplotlib", "numpy", "pandas", "seaborn", "scipy"]
+
+
+def parse_value(text):
+    """解析命令行中的参数值。"""
+    if text.startswith("@"):
+        path, _, column = text[1:].partition(":")
+        from batch_render import load_input
+        if path.endswith(".xvg"):
+            return load_input({"xvg": path})
+        if path.endswith(".npy"):
+            return load_input({"npy": path})
+        if column:
+            return load_input({"csv": path, "column": column})
+        return path
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def measure_import(module):
+    """在新的解释器中测量模块的冷启动导入耗时（秒）。"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if out.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{out.stderr[-2000:]}")
+    for line in reversed(out.stderr.splitlines()):
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    raise RuntimeError(f"未找到 {module} 的导入耗时")
+
+
+def check_imports(scale=1.0, verbose=True):
+    """
+    检查包导入保持轻量，且每个绘图模块的导入耗时不超过 IMPORT_BUDGET × scale。
+
+    返回
+    -------
+    ok : bool
+    """
+    ok = True
+    probe = (f"import json, sys; sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r}); "
+             f"import scripts; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))")
+    loaded = json.loads(subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                                       check=True).stdout)
+    if loaded:
+        ok = False
+    if verbose:
+        print(f"{'[FAIL]' if loaded else '[OK  ]'} import scripts 加载的重量级模块: {loaded or '无'}")
+
+    for module, budget in IMPORT_BUDGET.items():
+        seconds = measure_import(module)
+        passed = seconds <= budget * scale
+        ok &= passed
+        if verbose:
+            print(f"{'[OK  ]' if passed else '[FAIL]'} {module:<42s}{seconds:6.3f} s  (预算 {budget * scale:.2f} s)")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts", description="调用任意绘图函数（python -m scripts list 查看全部）",
+        epilog="参数格式：名称=值；@文件.csv:列名（或 .parquet / .feather）、@文件.xvg、@文件.npy 从文件读取")
+    parser.add_argument("function", help="绘图函数名，或 list / check-imports")
+    parser.add_argument("params", nargs="*", help="名称=值")
+    parser.add_argument("--formats", default=None, help="一次绘制输出多种格式，如 png,pdf,svg")
+    parser.add_argument("--dpi", type=float, default=None, help="覆盖绘图函数的 dpi（配合 --formats）")
+    parser.add_argument("--show", action="store_true", help="使用交互式后端显示")
+    parser.add_argument("--profile", action="store_true", help="在 stderr 打印分阶段耗时（同 PLOT_PROFILE=1）")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="check-imports 的预算倍数")
+    args = parser.parse_intermixed_args(argv)
+
+    if args.function == "list":
+        for name, spec in sorted(PLOT_FUNCTIONS.items()):
+            print(f"{name:<34s}{spec['module']:<42s}输出: {', '.join(spec['outputs'])}")
+        return 0
+    if args.function == "check-imports":
+        return 0 if check_imports(args.budget_scale) else 1
+    if args.function not in PLOT_FUNCTIONS:
+        parser.error(f"未注册的绘图函数: {args.function}")
+
+    kwargs = {}
+    for item in args.params:
+        key, sep, value = item.partition("=")
+        if not sep:
+            parser.error(f"参数应写作 名称=值: {item}")
+        kwargs[key] = parse_value(value)
+
+    if not args.show:
+        import matplotlib
+        matplotlib.use("Agg")
+    if args.formats:
+        from plot_registry import replace_outputs, with_default_outputs
+        from render_utils import FigureExport
+        kwargs, _ = replace_outputs(
+            args.function, with_default_outputs(args.function, kwargs),
+            lambda key, path: path if path is None else FigureExport(path, args.formats.split(","), args.dpi))
+
+    if args.profile:
+        import profiling
+        profiling.enable(profiling.stderr_sink)
+    result = get_plot_function(args.function)(**kwargs)
+    if result is not None:
+        print(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+import argparse
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from plot_registry import PLOT_FUNCTIONS, get_plot_function, output_paths, plot_modules, replace_outputs
+from worker_pool import RecyclingPool
+
+# =========================================================
+# 🧩【任务清单】—— JSONL（每行一个任务）或 YAML（任务列表）
+# =========================================================
+# 任务格式：
+# {"id": "rmsd_A", "function": "plot_rmsd",
+#  "inputs": {"df": {"xvg": "rmsd_A.xvg"}},
+#  "kwargs": {"config": {"output_file": "rmsd_A.png"}}}
+#
+# 可选 "formats": ["png", "pdf", "svg"] 与 "dpi"（数值或 {格式: dpi}）：
+# 一次绘制写出多种格式（render_utils.FigureExport），输出路径的扩展名被替换。
+#
+# inputs 中的值按加载器读取后与 kwargs 合并作为函数参数
+# （"csv" 也可以是 .parquet / .feather 路径，按扩展名由 table_io 读取；"table" 与 "csv" 同义）：
+#   {"csv": 路径, "columns": [...]}              → pd.DataFrame（只读所需列）
+#   {"csv": 路径, "column": 列名}                 → np.ndarray
+#   {"csv": 路径, "column": 列名, "as": "list"}   → list
+#   {"xvg": 路径}                                → gmx_rmsd_plot.read_xvg 的 DataFrame
+#   {"npy": 路径}                                → np.ndarray
+#   {"array": [...]}                             → np.ndarray
+#   {"npy_b64": base64 编码的 .npy 字节}           → np.ndarray（远程调用时传输大数组）
+# 其余值原样传入。
+
+def load_manifest(path):
+    """
+    读取任务清单，返回任务字典列表；缺少 id 的任务按行号编号。
+    """
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("读取 YAML 清单需要安装 PyYAML（pip install pyyaml），或改用 JSONL")
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f)
+        jobs = data["jobs"] if isinstance(data, dict) else data
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            jobs = [json.loads(line) for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    for i, job in enumerate(jobs):
+        job.setdefault("id", f"job_{i:05d}")
+        if job.get("function") not in PLOT_FUNCTIONS:
+            raise ValueError(f"任务 {job['id']} 的函数未注册: {job.get('function')}")
+    return jobs
+
+
+# =========================================================
+# 🧩【输入加载】
+# =========================================================
+_loaded_csv = {}
+
+
+def _read_csv_columns(path, columns):
+    # 同一工作进程内重复使用的表只读取一次，缺少的列再补读（按文件修改时间失效）；
+    # 保持文件中的数值精度，字符串列不转 category（结果与直接传入原始数据一致）
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    frame = _loaded_csv.get(key)
+    missing = [c for c in dict.fromkeys(columns) if frame is None or c not in frame]
+    if missing:
+        from table_io import read_table
+        new = read_table(path, missing, float_dtype=None, categorical=False)
+        frame = new if frame is None else frame.join(new)
+        if key not in _loaded_csv and len(_loaded_csv) >= 8:
+            _loaded_csv.clear()
+        _loaded_csv[key] = frame
+    return frame
+
+
+def _prefetch_csv(inputs):
+    # 同一任务中同一 CSV 的所有列合并为一次读取
+    wanted = {}
+    for spec in inputs.values():
+        if isinstance(spec, dict) and ("csv" in spec or "table" in spec):
+            cols = [spec["column"]] if "column" in spec else list(spec["columns"])
+            wanted.setdefault(spec.get("csv", spec.get("table")), []).extend(cols)
+    for path, cols in wanted.items():
+        _read_csv_columns(path, cols)
+
+
+def load_input(spec):
+    """按加载器规格读取单个输入。"""
+    if not isinstance(spec, dict):
+        return spec
+    import numpy as np
+    if "csv" in spec or "table" in spec:
+        path = spec.get("csv", spec.get("table"))
+        if "column" in spec:
+            values = _read_csv_columns(path, [spec["column"]])[spec["column"]].to_numpy()
+            return values.tolist() if spec.get("as") == "list" else values
+        return _read_csv_columns(path, spec["columns"])[spec["columns"]]
+    if "xvg" in spec:
+        from gmx_rmsd_plot import read_xvg
+        return read_xvg(spec["xvg"])
+    if "npy" in spec:
+        return np.load(spec["npy"])
+    if "array" in spec:
+        return np.asarray(spec["array"])
+    if "npy_b64" in spec:
+        import base64
+        import io
+        return np.load(io.BytesIO(base64.b64decode(spec["npy_b64"])), allow_pickle=False)
+    return spec
+
+
+# =========================================================
+# 🧩【工作进程】—— 启动时导入一次并固定 Agg 后端，之后复用
+# =========================================================
+_cache = None
+_pipeline = None
+
+
+def _init_worker(modules, cache_dir=None, cache_max_bytes=None):
+    global _cache
+    import warnings
+    import matplotlib
+    matplotlib.use("Agg")
+    # 部分脚本在保存后调用 plt.show()，Agg 后端下为空操作
+    warnings.filterwarnings("ignore", message=".*non-interactive.*")
+    for name in modules:
+        __import__(name)
+    if cache_dir is not None:
+        from render_cache import RenderCache
+        _cache = RenderCache(cache_dir, **({} if cache_max_bytes is None else {"max_bytes": cache_max_bytes}))
+    else:
+        _cache = None
+
+
+def run_job(job):
+    """
+    执行单个任务，返回结果字典：id, function, ok, cached, seconds, outputs, error。
+    """
+    t0 = time.perf_counter()
+    result = {"id": job["id"], "function": job["function"], "ok": False, "cached": False,
+              "outputs": [], "error": None}
+    try:
+        kwargs = dict(job.get("kwargs", {}))
+        inputs = job.get("inputs", {})
+        _prefetch_csv(inputs)
+        kwargs.update({k: load_input(v) for k, v in inputs.items()})
+        outputs = output_paths(job["function"], kwargs)
+        if not outputs:
+            raise ValueError("批处理任务必须指定输出路径: " + ", ".join(PLOT_FUNCTIONS[job["function"]]["outputs"]))
+        for path in outputs:
+            if not isinstance(path, (str, os.PathLike)):
+                continue   # ImageBuffer 等内存输出
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        exports = None
+        if job.get("formats"):
+            from render_utils import FigureExport
+            kwargs, exports = replace_outputs(
+                job["function"], kwargs,
+                lambda key, path: path if path is None else FigureExport(path, job["formats"], job.get("dpi")))
+        elif _pipeline is not None:
+            # 编码与写盘交给后台流水线，render_batch 结束前统一等待
+            kwargs, targets = replace_outputs(
+                job["function"], kwargs,
+                lambda key, path: _pipeline.target(path) if isinstance(path, (str, os.PathLike)) else path)
+            result["_pending"] = [t for t in targets.values() if hasattr(t, "future")]
+
+        if _cache is not None:
+            _, result["cached"] = _cache.call(job["function"], **kwargs)
+        else:
+            get_plot_function(job["function"])(**kwargs)
+        if exports is not None:
+            outputs = [p for exp in exports.values() if exp is not None for p in exp.paths]
+        result.update(ok=True, outputs=outputs)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=3)}"
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+# =========================================================
+# 🧩【批量渲染】
+# =========================================================
+def _print_result(res):
+    status = ("HIT " if res["cached"] else "OK  ") if res["ok"] else "FAIL"
+    print(f"[{status}] {res['id']:<24s}{res['function']:<32s}{res['seconds']:7.2f} s")
+    if not res["ok"]:
+        print("       " + res["error"].splitlines()[0])
+
+
+def render_batch(jobs, max_workers=None, report_path=None, verbose=True,
+                 cache_dir=None, cache_max_bytes=None, threads=False, encode_threads=0,
+                 max_rss_bytes=None, max_jobs_per_worker=None):
+    """
+    将任务分发到固定数量的常驻 Agg 工作进程中执行。
+
+    每个工作进程启动时只导入一次清单用到的模块，之后连续执行任务，
+    避免每张图都重新启动 Python 并导入 matplotlib / seaborn / scipy / pandas。
+    工作进程由 worker_pool.RecyclingPool 管理：内存超限的进程在任务之间被替换，
+    异常退出的进程只让当前任务失败。
+
+    参数
+    ----------
+    jobs : list[dict] or str
+        任务列表或任务清单路径（.jsonl / .yaml）
+    max_workers : int, optional
+        工作进程数，默认 CPU 核数
+    report_path : str, optional
+        结果 JSONL 保存路径（每个任务一行）
+    verbose : bool
+        是否逐个打印任务结果
+    cache_dir : str, optional
+        给定时启用渲染缓存（render_cache.RenderCache），输入与参数未变的任务直接复用旧图
+    cache_max_bytes : int, optional
+        渲染缓存总大小上限
+    threads : bool
+        在当前进程的线程池中渲染（共享已导入的模块与字体缓存，无进程启动开销）；
+        各绘图函数使用独立 Figure 与作用域样式，可安全并发
+    encode_threads : int
+        threads=True 时可用：> 0 时 PNG/JPEG 编码与写盘交给后台流水线
+        （encode_pipeline.EncodePipeline），与下一张图的绘制重叠进行
+    max_rss_bytes : int, optional
+        进程池模式下每个工作进程的常驻内存上限，任务完成后超过即替换为新进程
+    max_jobs_per_worker : int, optional
+        进程池模式下每个工作进程最多执行的任务数
+
+    返回
+    -------
+    results : list[dict]
+        与任务顺序一致的结果列表
+    """
+    if isinstance(jobs, str):
+        jobs = load_manifest(jobs)
+    t0 = time.perf_counter()
+    modules = plot_modules({job["function"] for job in jobs})
+
+    results = [None] * len(jobs)
+    global _cache, _pipeline
+    if encode_threads and not threads:
+        raise ValueError("encode_threads 需要 threads=True（进程池模式下各进程已并行编码）")
+    if threads and (max_rss_bytes is not None or max_jobs_per_worker is not None):
+        raise ValueError("max_rss_bytes / max_jobs_per_worker 只适用于进程池模式（线程无法单独回收）")
+    if threads:
+        # 线程模式在本进程内初始化，结束后恢复原缓存，避免影响之后的调用
+        previous_cache = _cache
+        _init_worker(modules, cache_dir, cache_max_bytes)
+        if encode_threads:
+            from encode_pipeline import EncodePipeline
+            _pipeline = EncodePipeline(workers=encode_threads)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    else:
+        executor = RecyclingPool(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(modules, cache_dir, cache_max_bytes),
+                                 max_rss_bytes=max_rss_bytes, max_tasks_per_child=max_jobs_per_worker)
+    try:
+        with executor as pool:
+            futures = {pool.submit(run_job, job): i for i, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                job = jobs[futures[future]]
+                try:
+                    res = future.result()
+                except Exception as e:   # 工作进程异常退出
+                    res = {"id": job["id"], "function": job["function"], "ok": False, "cached": False,
+                           "outputs": [], "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+                results[futures[future]] = res
+                if verbose and "_pending" not in res:
+                    _print_result(res)
+    finally:
+        if _pipeline is not None:
+            _pipeline.close(raise_errors=False)
+            _pipeline = None
+        if threads:
+            _cache = previous_cache
+
+    for res in results:
+        # 后台编码的任务：写盘完成（或失败）后才确定结果
+        pending = res.pop("_pending", None)
+        if pending is None:
+            continue
+        for target in pending:
+            if target.future is None:
+                continue   # 任务在保存前出错（已记为失败），或未写出该输出
+            error = target.future.exception()
+            if error is not None and res["ok"]:
+                res.update(ok=False, outputs=[],
+                           error=f"{type(error).__name__}: {error}\n")
+        if verbose:
+            _print_result(res)
+
+    if report_path is not None:
+        with open(report_path, "w", encoding="utf-8") as f:
+            for res in results:
+                f.write(json.dumps(res, ensure_ascii=False) + "\n")
+
+    if verbose:
+        n_ok = sum(r["ok"] for r in results)
+        busy = sum(r["seconds"] for r in results)
+        print(f"完成 {n_ok}/{len(results)} 个任务，总耗时 {time.perf_counter() - t0:.2f} s"
+              f"（任务累计 {busy:.2f} s）")
+        if isinstance(executor, RecyclingPool):
+            print(f"工作进程峰值内存 {executor.peak_rss_bytes / 2 ** 20:.0f} MB，"
+                  f"替换 {executor.n_recycled} 个，异常退出 {executor.n_crashed} 个")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按任务清单批量渲染图像")
+    parser.add_argument("manifest", help="任务清单（.jsonl / .yaml）")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="工作进程数，默认 CPU 核数")
+    parser.add_argument("--report", default=None, help="结果 JSONL 保存路径")
+    parser.add_argument("--threads", action="store_true", help="使用线程池而不是进程池")
+    parser.add_argument("--encode-threads", type=int, default=0,
+                        help="后台编码写盘线程数（需 --threads；0 表示在绘图线程中直接保存）")
+    parser.add_argument("--cache", default=None, help="渲染缓存目录（不给定则不使用缓存）")
+    parser.add_argument("--cache-max-gb", type=float, default=None, help="渲染缓存总大小上限（GB）")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="工作进程常驻内存上限（MB），超过后替换")
+    parser.add_argument("--max-jobs-per-worker", type=int, default=None, help="每个工作进程最多执行的任务数")
+    args = parser.parse_args()
+
+    results = render_batch(args.manifest, max_workers=args.workers, report_path=args.report,
+                           cache_dir=args.cache, threads=args.threads, encode_threads=args.encode_threads,
+                           cache_max_bytes=None if args.cache_max_gb is None else int(args.cache_max_gb * 1024 ** 3),
+                           max_rss_bytes=None if args.max_rss_mb is None else int(args.max_rss_mb * 1024 ** 2),
+                           max_jobs_per_worker=args.max_jobs_per_worker)
+    raise SystemExit(0 if all(r["ok"] for r in results) else 1)
+
+# python batch_render.py jobs.jsonl -j 8 --report results.jsonl
+
+# jobs.jsonl 示例：
+# {"id": "rmsd_A", "function": "plot_rmsd", "inputs": {"df": {"xvg": "rmsd_A.xvg"}}, "kwargs": {"config": {"output_file": "out/rmsd_A.png"}}}
+# {"id": "cetsa_P1", "function": "plot_cetsa_curve", "inputs": {"temps": {"array": [37, 41, 44, 47, 50, 53, 56, 59, 63, 67]}, "con_raw": {"csv": "cetsa.csv", "column": "P1_CON"}, "met_raw": {"csv": "cetsa.csv", "column": "P1_MET"}}, "kwargs": {"save_path": "out/cetsa_P1.png"}}
+# {"id": "heat", "function": "plot_heatmap_with_colorbar", "kwargs": {"data_dict": {"Model_A": [1.2, 1.4], "Model_B": [1.1, 1.3]}, "heatmap_file": "out/heat.png", "colorbar_file": "out/heat_cb.png"}}
+# {"id": "resid", "function": "plot_residual_hist", "inputs": {"y_true": {"csv": "pred.csv", "column": "True"}, "y_pred": {"csv": "pred.csv", "column": "Pred"}}, "kwargs": {"save_path": "out/resid.png"}}
@@ -0,0 +1,195 @@
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import matplotlib
+
+from render_utils import RASTER_FORMATS, ImageBuffer
+
+# =========================================================
+# 🧩【后台编码流水线】—— 绘制与 PNG/JPEG 压缩、写盘重叠进行
+# =========================================================
+# 绘图线程只负责绘制：Agg 像素缓冲区交给有界队列，由若干编码线程压缩并写盘，
+# 同时绘图线程继续绘制下一张图。PIL 压缩时释放 GIL，编码线程可以真正并行。
+# 队列满时提交方阻塞（背压），在途图像数量不超过 max_pending，内存占用有上限。
+#
+#   with EncodePipeline(workers=2) as pipe:
+#       for name, (y_true, y_pred) in datasets.items():
+#           plot_residual_hist(y_true, y_pred, save_path=pipe.target(f"out/{name}.png"))
+#   # 退出时等待全部写完；编码失败会在 flush() 时抛出
+
+_STOP = object()
+
+
+class EncodePipeline:
+    """
+    有界队列 + 编码/写盘线程池。
+
+    参数
+    ----------
+    workers : int
+        编码线程数
+    max_pending : int, optional
+        排队等待编码的图像上限（每张为一份完整 RGBA 缓冲区），默认 workers * 2
+
+    属性
+    ----------
+    draw_seconds, encode_seconds : float
+        累计绘制 / 编码写盘耗时（用于判断瓶颈）
+    """
+
+    def __init__(self, workers=2, max_pending=None):
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_pending or workers * 2)
+        self._lock = threading.Lock()
+        self._errors = []
+        self.n_written = 0
+        self.draw_seconds = 0.0
+        self.encode_seconds = 0.0
+        self._threads = [threading.Thread(target=self._run, name=f"encoder-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(raise_errors=exc_type is None)
+
+    # ---------- 提交 ----------
+    def target(self, path, format=None, dpi=None, **savefig_kwargs):
+        """返回可传给绘图函数输出路径参数的目标对象。"""
+        return PipelineTarget(self, path, format, dpi, savefig_kwargs)
+
+    def submit(self, write, *args):
+        """
+        提交一个写盘任务 write(*args)；队列满时阻塞。返回 Future。
+        """
+        if not self._threads:
+            raise RuntimeError("流水线已关闭")
+        future = Future()
+        self._queue.put((future, write, args))
+        return future
+
+    # ---------- 编码线程 ----------
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                future, write, args = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    future.set_result(write(*args))
+                except Exception as e:
+                    with self._lock:
+                        self._errors.append(e)
+                    future.set_exception(e)
+                with self._lock:
+                    self.encode_seconds += time.perf_counter() - t0
+                    self.n_written += 1
+            finally:
+                self._queue.task_done()
+
+    # ---------- 等待 ----------
+    def flush(self, raise_errors=True):
+        """
+        等待所有已提交的图像写完；raise_errors=True 时重新抛出期间的第一个编码错误。
+
+        返回
+        -------
+        errors : list[Exception]
+        """
+        self._queue.join()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors and raise_errors:
+            raise errors[0]
+        return errors
+
+    def close(self, raise_errors=True):
+        """写完剩余图像并结束编码线程。"""
+        if not self._threads:
+            return []
+        errors = self.flush(raise_errors=False)
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        if errors and raise_errors:
+            raise errors[0]
+        return errors
+
+
+class PipelineTarget:
+    """
+    EncodePipeline 的输出目标：绘制在调用线程完成，编码与写盘交给流水线。
+
+    栅格格式交出 RGBA 缓冲区，由编码线程压缩；矢量格式（pdf/svg）必须由后端绘制，
+    在调用线程生成字节后只把写盘交给流水线。
+
+    属性
+    ----------
+    future : concurrent.futures.Future
+        写盘完成后结果为输出路径
+    """
+
+    def __init__(self, pipeline, path, format=None, dpi=None, savefig_kwargs=None):
+        self.pipeline = pipeline
+        self.path = os.fspath(path)
+        self.format = (format or os.path.splitext(self.path)[1].lstrip(".") or "png").lower()
+        self.dpi = dpi
+        self.savefig_kwargs = savefig_kwargs or {}
+        self.future = None
+
+    def __repr__(self):
+        return f"<PipelineTarget {self.path}>"
+
+    def capture(self, fig, **savefig_kwargs):
+        """绘制 fig 并把编码写盘提交到流水线（由 save_figure 调用）。"""
+        kwargs = {**savefig_kwargs, **self.savefig_kwargs}
+        if self.dpi is not None:
+            kwargs["dpi"] = self.dpi
+        t0 = time.perf_counter()
+        if self.format in RASTER_FORMATS:
+            pil_kwargs = kwargs.pop("pil_kwargs", None)
+            metadata = kwargs.pop("metadata", None)
+            buf = ImageBuffer("rgba")
+            buf.capture(fig, **kwargs)
+            # 复制一份：同一 Figure 再次保存时会复用并覆盖渲染器缓冲区
+            pixels = buf.array.copy()
+            dpi = kwargs.get("dpi", matplotlib.rcParams["savefig.dpi"])
+            args = (self.path, pixels, self.format, fig.dpi if dpi == "figure" else dpi, metadata,
+                    None if pil_kwargs is None else dict(pil_kwargs))
+            write = _encode_raster
+        else:
+            kwargs.pop("pil_kwargs", None)
+            stream = io.BytesIO()
+            fig.savefig(stream, format=self.format, **kwargs)
+            args = (self.path, stream.getvalue())
+            write = _write_bytes
+        with self.pipeline._lock:
+            self.pipeline.draw_seconds += time.perf_counter() - t0
+        self.future = self.pipeline.submit(write, *args)
+
+
+def _encode_raster(path, pixels, fmt, dpi, metadata, pil_kwargs):
+    from matplotlib.image import imsave
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    imsave(path, pixels, format=fmt, origin="upper", dpi=dpi, metadata=metadata, pil_kwargs=pil_kwargs)
+    return path
+
+
+def _write_bytes(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
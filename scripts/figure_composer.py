@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+from plot_registry import PLOT_FUNCTIONS, replace_outputs
+
+# =========================================================
+# 🧩【多面板组图】—— 各面板由现有绘图函数并行渲染，再拼合为一张图
+# =========================================================
+# 论文组图（CETSA 曲线 + RMSD + 预测散点 + 雷达图…）通常在图像编辑软件中手工拼合，
+# 或在一张大图里串行重画。这里按版式描述：
+#   1. 每个面板作为 batch_render 任务，在各工作进程中以目标 dpi 渲染为一个图块
+#      （总耗时取决于最慢的面板，而不是各面板之和）
+#   2. 按网格位置（可跨行 / 跨列）把图块缩放到各自的格子中（保持长宽比、居中），
+#      并在格子左上角标注面板字母
+# 输出格式：
+#   .svg                  矢量：各面板的 SVG 原样嵌入（<svg> 嵌套，元素 id 加面板前缀避免冲突）
+#   .png / .jpg / .tif    栅格：图块按目标 dpi 渲染后缩放到格子大小
+#   .pdf / .eps           图块为目标 dpi 的栅格图像（需要矢量 PDF 时输出 SVG 再转换）
+#
+# 版式（dict，或 .json / .yaml 文件）：
+# {"figsize": [7.2, 6.0], "dpi": 300, "grid": [2, 2],
+#  "wspace": 0.02, "hspace": 0.02, "label_size": 14,
+#  "panels": [
+#    {"label": "A", "row": 0, "col": 0, "function": "plot_cetsa_curve", "inputs": {...}, "kwargs": {...}},
+#    {"label": "B", "row": 0, "col": 1, "rowspan": 2, "function": "plot_rmsd", ...},
+#    ...]}
+# 面板的 function / inputs / kwargs 与 batch_render 的任务相同，输出路径参数可省略（由组图接管）。
+
+LAYOUT_DEFAULTS = {"dpi": 300, "wspace": 0.02, "hspace": 0.02, "label_size": 14, "label_weight": "bold"}
+
+
+def load_layout(layout):
+    """读取版式（dict 原样返回副本），补全默认值并检查面板位置。"""
+    if isinstance(layout, (str, os.PathLike)):
+        path = os.fspath(layout)
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("读取 YAML 版式需要安装 PyYAML（pip install pyyaml），或改用 JSON")
+                layout = yaml.safe_load(f)
+            else:
+                layout = json.load(f)
+    layout = {**LAYOUT_DEFAULTS, **layout}
+    nrows, ncols = layout["grid"]
+    for i, panel in enumerate(layout["panels"]):
+        if panel.get("function") not in PLOT_FUNCTIONS:
+            raise ValueError(f"面板 {i} 的函数未注册: {panel.get('function')}")
+        r, c = panel["row"], panel["col"]
+        if not (0 <= r and r + panel.get("rowspan", 1) <= nrows and 0 <= c and c + panel.get("colspan", 1) <= ncols):
+            raise ValueError(f"面板 {panel.get('label', i)} 超出 {nrows}×{ncols} 网格")
+    return layout
+
+
+def panel_boxes(layout):
+    """
+    各面板格子在整张图中的位置。
+
+    返回
+    -------
+    boxes : list[tuple]
+        (left, bottom, width, height)，以图宽 / 图高为单位（0~1），顺序与 panels 一致
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.gridspec import GridSpec
+
+    nrows, ncols = layout["grid"]
+    fig = Figure(figsize=layout["figsize"])
+    gs = GridSpec(nrows, ncols, figure=fig, left=0, right=1, bottom=0, top=1,
+                  wspace=layout["wspace"], hspace=layout["hspace"])
+    bottoms, tops, lefts, rights = gs.get_grid_positions(fig)
+    boxes = []
+    for panel in layout["panels"]:
+        r, c = panel["row"], panel["col"]
+        r2, c2 = r + panel.get("rowspan", 1) - 1, c + panel.get("colspan", 1) - 1
+        boxes.append((lefts[c], bottoms[r2], rights[c2] - lefts[c], tops[r] - bottoms[r2]))
+    return boxes
+
+
+def _panel_jobs(layout, tile_dir, fmt):
+    jobs, tiles = [], []
+    for i, panel in enumerate(layout["panels"]):
+        name = panel["function"]
+        # 全部输出参数改写到临时目录；第一个输出参数（主图）即该面板的图块
+        kwargs, paths = replace_outputs(
+            name, panel.get("kwargs", {}),
+            lambda key, _: os.path.join(tile_dir, f"panel{i}_{key.replace('.', '_')}.{fmt}"))
+        jobs.append({"id": str(panel.get("label", i)), "function": name, "kwargs": kwargs,
+                     "inputs": panel.get("inputs", {}), "formats": [fmt], "dpi": layout["dpi"]})
+        tiles.append(paths[PLOT_FUNCTIONS[name]["outputs"][0]])
+    return jobs, tiles
+
+
+def _label_height(layout):
+    # 面板字母占用的格子顶部高度（以图高为单位），图块放在其下方
+    return layout["label_size"] * 1.4 / 72 / layout["figsize"][1]
+
+
+# ---------- 栅格拼合 ----------
+def _compose_raster(layout, boxes, tiles, save_path):
+    import matplotlib.image as mpimg
+    from render_utils import new_figure, save_figure, scoped_style
+
+    pad = _label_height(layout)
+    with scoped_style():
+        fig = new_figure(figsize=layout["figsize"], dpi=layout["dpi"])
+        for panel, (left, bottom, width, height), tile in zip(layout["panels"], boxes, tiles):
+            top_pad = pad if panel.get("label") else 0
+            ax = fig.add_axes((left, bottom, width, height - top_pad))
+            ax.imshow(mpimg.imread(tile), interpolation="antialiased")   # aspect="equal"：保持长宽比、居中
+            ax.set_axis_off()
+            if panel.get("label"):
+                fig.text(left, bottom + height, panel["label"], ha="left", va="top",
+                         fontsize=layout["label_size"], fontweight=layout["label_weight"])
+        save_figure(fig, save_path, dpi=layout["dpi"])
+
+
+# ---------- 矢量拼合（SVG） ----------
+_SVG_ROOT = re.compile(r"<svg\b[^>]*>", re.S)
+_SVG_VIEWBOX = re.compile(r'viewBox="([^"]+)"')
+
+
+def _nest_svg(text, prefix, x, y, width, height):
+    """把一个 SVG 文档改写为嵌套的 <svg> 元素：放到 (x, y, width, height)，id 加前缀。"""
+    root = _SVG_ROOT.search(text)
+    body = text[root.end():text.rindex("</svg>")]
+    ids = set(re.findall(r'\bid="([^"]+)"', body))
+    if ids:
+        # 同名的 id（字形、裁剪路径等）在不同面板中可能指向不同内容
+        pattern = re.compile(r'(\bid="|#)(' + "|".join(map(re.escape, sorted(ids, key=len, reverse=True)))
+                             + r')(?=["\)])')
+        body = pattern.sub(lambda m: f"{m.group(1)}{prefix}{m.group(2)}", body)
+    viewbox = _SVG_VIEWBOX.search(root.group(0)).group(1)
+    return (f'<svg x="{x:.3f}" y="{y:.3f}" width="{width:.3f}" height="{height:.3f}" '
+            f'viewBox="{viewbox}" preserveAspectRatio="xMidYMid meet">{body}</svg>\n')
+
+
+def _compose_svg(layout, boxes, tiles, save_path):
+    from xml.sax.saxutils import escape
+
+    fig_w, fig_h = (v * 72 for v in layout["figsize"])   # pt
+    pad = _label_height(layout)
+    parts = [f'<?xml version="1.0" encoding="utf-8" standalone="no"?>\n'
+             f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+             f'width="{fig_w:.3f}pt" height="{fig_h:.3f}pt" viewBox="0 0 {fig_w:.3f} {fig_h:.3f}" version="1.1">\n']
+    for i, (panel, (left, bottom, width, height), tile) in enumerate(zip(layout["panels"], boxes, tiles)):
+        top_pad = pad if panel.get("label") else 0
+        with open(tile, "r", encoding="utf-8") as f:
+            text = f.read()
+        # SVG 的 y 轴向下
+        parts.append(_nest_svg(text, f"p{i}-", left * fig_w, (1 - bottom - height + top_pad) * fig_h,
+                               width * fig_w, (height - top_pad) * fig_h))
+        if panel.get("label"):
+            parts.append(f'<text x="{left * fig_w:.3f}" y="{(1 - bottom - height) * fig_h + layout["label_size"]:.3f}" '
+                         f'font-family="sans-serif" font-size="{layout["label_size"]}" '
+                         f'font-weight="{layout["label_weight"]}">{escape(str(panel["label"]))}</text>\n')
+    parts.append("</svg>\n")
+    with open(save_path, "w", encoding="utf-8") as f:
+        f.write("".join(parts))
+
+
+# ---------- 对外接口 ----------
+def compose_figure(layout, save_path, max_workers=None, threads=False, verbose=False, keep_tiles=None):
+    """
+    按版式并行渲染各面板并拼合为一张图。
+
+    参数
+    ----------
+    layout : dict or str
+        版式（见模块说明），或 .json / .yaml 文件路径
+    save_path : str
+        输出路径；扩展名决定格式，.svg 为矢量拼合
+    max_workers : int, optional
+        渲染面板的工作进程数，默认 min(面板数, CPU 核数)
+    threads : bool
+        在当前进程的线程池中渲染面板（见 batch_render.render_batch）
+    verbose : bool
+        是否打印各面板的渲染结果
+    keep_tiles : str, optional
+        保留各面板图块的目录；默认渲染到临时目录，拼合后删除
+
+    返回
+    -------
+    results : list[dict]
+        各面板的 render_batch 结果，顺序与 panels 一致
+    """
+    from batch_render import render_batch
+
+    t0 = time.perf_counter()
+    layout = load_layout(layout)
+    fmt = os.path.splitext(os.fspath(save_path))[1].lower().lstrip(".") or "png"
+    vector = fmt == "svg"
+    boxes = panel_boxes(layout)
+    n_panels = len(layout["panels"])
+    max_workers = max_workers or min(n_panels, os.cpu_count() or 1)
+
+    with tempfile.TemporaryDirectory(prefix="compose_") as tmp:
+        tile_dir = keep_tiles or tmp
+        os.makedirs(tile_dir, exist_ok=True)
+        jobs, tiles = _panel_jobs(layout, tile_dir, "svg" if vector else "png")
+        results = render_batch(jobs, max_workers=max_workers, threads=threads, verbose=verbose)
+        failed = [r for r in results if not r["ok"]]
+        if failed:
+            raise RuntimeError("面板渲染失败: " + "; ".join(
+                f"{r['id']}: {r['error'].splitlines()[0]}" for r in failed))
+
+        os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+        if vector:
+            _compose_svg(layout, boxes, tiles, save_path)
+        else:
+            _compose_raster(layout, boxes, tiles, save_path)
+
+    if verbose:
+        slowest = max(r["seconds"] for r in results)
+        print(f"组图保存为: {save_path}（{n_panels} 个面板，最慢面板 {slowest:.2f} s，"
+              f"总耗时 {time.perf_counter() - t0:.2f} s）")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按版式并行渲染多面板组图")
+    parser.add_argument("layout", help="版式文件（.json / .yaml）")
+    parser.add_argument("-o", "--output", required=True, help="输出路径（.svg 为矢量）")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="工作进程数，默认 min(面板数, CPU 核数)")
+    parser.add_argument("--threads", action="store_true", help="使用线程池而不是进程池")
+    parser.add_argument("--keep-tiles", default=None, help="保留各面板图块的目录")
+    args = parser.parse_args()
+
+    compose_figure(args.layout, args.output, max_workers=args.workers, threads=args.threads,
+                   verbose=True, keep_tiles=args.keep_tiles)
+
+# python figure_composer.py figure2.json -o figure2.svg -j 4
+
+# figure2.json 示例：
+# {"figsize": [7.2, 5.4], "dpi": 300, "grid": [2, 2],
+#  "panels": [
+#   {"label": "A", "row": 0, "col": 0, "function": "plot_cetsa_curve",
+#    "inputs": {"temps": {"array": [37, 41, 44, 47, 50, 53, 56, 59, 63, 67]},
+#               "con_raw": {"csv": "cetsa.csv", "column": "P1_CON"}, "met_raw": {"csv": "cetsa.csv", "column": "P1_MET"}}},
+#   {"label": "B", "row": 0, "col": 1, "function": "plot_rmsd", "inputs": {"df": {"xvg": "rmsd_A.xvg"}}},
+#   {"label": "C", "row": 1, "col": 0, "function": "plot_pred_vs_true", ...},
+#   {"label": "D", "row": 1, "col": 1, "function": "plot_metrics_radar", ...}]}
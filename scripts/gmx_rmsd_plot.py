@@ -1,6 +1,7 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
+from cycler import cycler
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
 
 # =========================================================
 # 🧩【函数区】—— 可复用绘图工具
@@ -24,6 +25,21 @@ def read_xvg(filepath: str) -> pd.DataFrame:
     return pd.DataFrame({'Time (ns)': time, 'RMSD (nm)': rmsd})
 
 
+def seaborn_theme_rc(style="darkgrid", context="notebook", font_scale=1, palette="deep"):
+    """
+    返回与 sns.set_theme 等效的 rcParams 字典，但不修改全局样式，
+    用于 scoped_style 作用域内临时生效。
+    """
+    import seaborn as sns
+
+    rc = {"font.family": "sans-serif"}
+    rc.update(sns.plotting_context(context, font_scale=font_scale))
+    rc.update(sns.axes_style(style))
+    rc["axes.prop_cycle"] = cycler(color=sns.color_palette(palette))
+    return rc
+
+
+@profiled
 def plot_rmsd(
     df: pd.DataFrame,
     config: dict = None
@@ -90,85 +106,95 @@ def plot_rmsd(
     cfg = default_config
 
     # ------------------------
-    # Seaborn & Figure 设置
+    # Seaborn & Figure 设置（样式只在本图作用域内生效）
     # ------------------------
-    sns.set_theme(style=cfg["plot_style"], context=cfg["plot_context"], font_scale=cfg["font_scale"])
-    plt.figure(figsize=cfg["figsize"])
-
-    # 主曲线
-    sns.lineplot(
-        data=df,
-        x="Time (ns)",
-        y="RMSD (nm)",
-        color=cfg["line_color"],
-        linewidth=cfg["line_width"],
-        label="RMSD"
-    )
-
-    # 平滑曲线
-    if cfg["show_smooth"]:
-        df["Smooth"] = df["RMSD (nm)"].rolling(window=cfg["smooth_window"], center=True).mean()
+    import seaborn as sns
+    mark("import")
+
+    theme = seaborn_theme_rc(style=cfg["plot_style"], context=cfg["plot_context"], font_scale=cfg["font_scale"])
+    with scoped_style(theme):
+        fig, ax = new_subplots(figsize=cfg["figsize"], show=cfg["show_fig"])
+
+        # 主曲线
         sns.lineplot(
             data=df,
             x="Time (ns)",
-            y="Smooth",
-            color=cfg["smooth_color"],
-            linewidth=2.0,
-            label=f"Smoothed ({cfg['smooth_window']}-pt)"
+            y="RMSD (nm)",
+            color=cfg["line_color"],
+            linewidth=cfg["line_width"],
+            label="RMSD",
+            ax=ax
         )
 
-    # 标题与坐标轴
-    if cfg["show_title"]:
-        plt.title(cfg["title_text"], fontsize=cfg["title_fontsize"], weight='bold', pad=15)
-    plt.xlabel(cfg["xlabel_text"], fontsize=cfg["label_fontsize"])
-    plt.ylabel(cfg["ylabel_text"], fontsize=cfg["label_fontsize"])
+        # 平滑曲线
+        if cfg["show_smooth"]:
+            df["Smooth"] = df["RMSD (nm)"].rolling(window=cfg["smooth_window"], center=True).mean()
+            sns.lineplot(
+                data=df,
+                x="Time (ns)",
+                y="Smooth",
+                color=cfg["smooth_color"],
+                linewidth=2.0,
+                label=f"Smoothed ({cfg['smooth_window']}-pt)",
+                ax=ax
+            )
+
+        # 标题与坐标轴
+        if cfg["show_title"]:
+            ax.set_title(cfg["title_text"], fontsize=cfg["title_fontsize"], weight='bold', pad=15)
+        ax.set_xlabel(cfg["xlabel_text"], fontsize=cfg["label_fontsize"])
+        ax.set_ylabel(cfg["ylabel_text"], fontsize=cfg["label_fontsize"])
 
-    # Y轴范围
-    if not cfg["ylim_auto"]:
-        plt.ylim(cfg["ylim_range"])
-    else:
-        plt.ylim(0, df["RMSD (nm)"].max() * 1.1)
+        # Y轴范围
+        if not cfg["ylim_auto"]:
+            ax.set_ylim(cfg["ylim_range"])
+        else:
+            ax.set_ylim(0, df["RMSD (nm)"].max() * 1.1)
 
-    # 网格
-    plt.grid(cfg["show_grid"], linestyle=cfg["grid_style"], alpha=cfg["grid_alpha"])
+        # 网格（关闭时不传线型参数，否则 matplotlib 每次调用都发出警告并重新打开网格）
+        if cfg["show_grid"]:
+            ax.grid(True, linestyle=cfg["grid_style"], alpha=cfg["grid_alpha"])
+        else:
+            ax.grid(False)
 
-    # ------------------------
-    # 坐标轴细节
-    # ------------------------
-    ax = plt.gca()
-
-    # 边框
-    for spine_name, spine in ax.spines.items():
-        spine.set_visible({
-            "top": cfg["show_top_spine"],
-            "right": cfg["show_right_spine"],
-            "bottom": cfg["show_bottom_spine"],
-            "left": cfg["show_left_spine"]
-        }[spine_name])
-        spine.set_color(cfg["spine_color"])
-        spine.set_linewidth(cfg["spine_width"])
-
-    # 刻度
-    ax.tick_params(
-        axis="both",
-        which="major",
-        direction=cfg["tick_direction"],
-        length=cfg["tick_length"],
-        width=cfg["tick_width"],
-        colors=cfg["tick_color"],
-        labelsize=cfg["tick_labelsize"]
-    )
-    for label in ax.get_xticklabels() + ax.get_yticklabels():
-        label.set_fontweight(cfg["tick_labelweight"])
-
-    plt.tight_layout()
-    plt.legend(frameon=False)
-
-    # 保存/显示
-    if cfg["save_fig"]:
-        plt.savefig(cfg["output_file"], dpi=cfg["dpi"], bbox_inches="tight")
-    if cfg["show_fig"]:
-        plt.show()
+        # ------------------------
+        # 坐标轴细节
+        # ------------------------
+
+        # 边框
+        for spine_name, spine in ax.spines.items():
+            spine.set_visible({
+                "top": cfg["show_top_spine"],
+                "right": cfg["show_right_spine"],
+                "bottom": cfg["show_bottom_spine"],
+                "left": cfg["show_left_spine"]
+            }[spine_name])
+            spine.set_color(cfg["spine_color"])
+            spine.set_linewidth(cfg["spine_width"])
+
+        # 刻度
+        ax.tick_params(
+            axis="both",
+            which="major",
+            direction=cfg["tick_direction"],
+            length=cfg["tick_length"],
+            width=cfg["tick_width"],
+            colors=cfg["tick_color"],
+            labelsize=cfg["tick_labelsize"]
+        )
+        for label in ax.get_xticklabels() + ax.get_yticklabels():
+            label.set_fontweight(cfg["tick_labelweight"])
+
+        mark("artists")
+
+        fig.tight_layout()
+
+        mark("layout")
+        ax.legend(frameon=False)
+
+        # 保存/显示
+        save_figure(fig, cfg["output_file"] if cfg["save_fig"] else None, show=cfg["show_fig"],
+                    dpi=cfg["dpi"], bbox_inches="tight")
 
 
 # =========================================================
@@ -0,0 +1,179 @@
+import numpy as np
+
+# =========================================================
+# 🧩【函数区】—— 分组统计工具（一次排序，无逐组 Python 循环）
+# =========================================================
+
+def finite_range(x):
+    """有限值的 (最小值, 最大值)，忽略 NaN / inf；没有有限值时为 (0.0, 1.0)。"""
+    x = np.asarray(x, dtype=float)
+    finite = x[np.isfinite(x)]
+    if not finite.size:
+        return 0.0, 1.0
+    return float(finite.min()), float(finite.max())
+
+
+def bin_codes(x, bins):
+    """
+    将连续值按分箱边界映射为整数分组编号。
+
+    参数
+    ----------
+    x : np.ndarray
+        待分箱的数值数组
+    bins : int or array-like
+        分箱数（在 x 的有限值范围内等宽划分）或单调递增的分箱边界
+
+    返回
+    -------
+    codes : np.ndarray
+        每个样本所在分箱编号，落在边界之外的样本与 NaN 为 -1
+    edges : np.ndarray
+        实际使用的分箱边界，长度为分箱数 + 1
+    """
+    x = np.asarray(x, dtype=float)
+    if np.ndim(bins) == 0:
+        lo, hi = finite_range(x)
+        if hi <= lo:
+            hi = lo + 1.0
+        edges = np.linspace(lo, hi, int(bins) + 1)
+    else:
+        edges = np.asarray(bins, dtype=float)
+
+    n_bins = len(edges) - 1
+    codes = np.searchsorted(edges, x, side="right") - 1
+    # 最右侧边界归入最后一个分箱
+    codes[x == edges[-1]] = n_bins - 1
+    codes[(codes < 0) | (codes >= n_bins) | ~np.isfinite(x)] = -1
+    return codes, edges
+
+
+def group_sort_order(codes, values, n_groups):
+    """
+    返回按 (分组, 数值) 排序的索引，使每组在结果中连续且组内数值有序。
+
+    先对数值做一次快速排序，再对分组编号做稳定排序；分组数较少时
+    编号转为 16 位整数，numpy 对其使用基数排序，比 np.lexsort 快约 2 倍。
+    """
+    order = np.argsort(values)
+    code_dtype = np.int16 if n_groups < np.iinfo(np.int16).max else np.intp
+    return order[np.argsort(codes[order].astype(code_dtype), kind="stable")]
+
+
+def group_quantiles(codes, values, n_groups, qs):
+    """
+    按分组一次性计算多个分位数及样本数。
+
+    先按 (分组, 数值) 排序一次，每组在排序结果中是连续片段，
+    再按线性插值（与 np.quantile 默认方法一致）直接索引各分位点。
+
+    参数
+    ----------
+    codes : np.ndarray
+        分组编号，取值 0 ~ n_groups-1，小于 0 的样本会被忽略
+    values : np.ndarray
+        数值数组
+    n_groups : int
+        分组数
+    qs : float or array-like
+        分位数（0~1）
+
+    返回
+    -------
+    quantiles : np.ndarray
+        形状 (len(qs), n_groups)，空分组为 NaN
+    counts : np.ndarray
+        每组样本数
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    values = np.asarray(values, dtype=float)
+    keep = (codes >= 0) & np.isfinite(values)
+    codes, values = codes[keep], values[keep]
+
+    order = group_sort_order(codes, values, n_groups)
+    sorted_vals = values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    qs = np.atleast_1d(np.asarray(qs, dtype=float))
+    pos = starts[None, :] + qs[:, None] * np.maximum(counts - 1, 0)[None, :]
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, starts + np.maximum(counts - 1, 0))
+    frac = pos - lo
+
+    quantiles = np.full(pos.shape, np.nan)
+    valid = np.broadcast_to(counts > 0, pos.shape)
+    if valid.any():
+        quantiles[valid] = (sorted_vals[lo[valid]] * (1 - frac[valid])
+                            + sorted_vals[hi[valid]] * frac[valid])
+    return quantiles, counts
+
+
+def group_ranks(codes, values, n_groups):
+    """
+    组内平均秩（与 scipy.stats.rankdata 默认 "average" 一致，秩从 1 开始）。
+
+    一次 (分组, 数值) 联合排序后，用相邻元素比较找出并列片段，
+    直接得到每个并列片段的平均位置，无逐组循环。
+
+    参数
+    ----------
+    codes : np.ndarray
+        分组编号，取值 0 ~ n_groups-1
+    values : np.ndarray
+        数值数组
+    n_groups : int
+        分组数
+
+    返回
+    -------
+    ranks : np.ndarray
+        与 values 等长的组内秩
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    values = np.asarray(values)
+    order = group_sort_order(codes, values, n_groups)
+    sc, sv = codes[order], values[order]
+
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    # 并列片段边界：分组或数值发生变化的位置
+    brk = np.empty(len(sv) + 1, dtype=bool)
+    brk[0] = brk[-1] = True
+    brk[1:-1] = (sc[1:] != sc[:-1]) | (sv[1:] != sv[:-1])
+    run_edges = np.flatnonzero(brk)
+    run_id = np.cumsum(brk[:-1]) - 1
+    avg_pos = 0.5 * (run_edges[run_id] + run_edges[run_id + 1] - 1)
+
+    ranks = np.empty(len(sv), dtype=float)
+    ranks[order] = avg_pos - starts[sc] + 1
+    return ranks
+
+
+def group_pearson(codes, x, y, n_groups):
+    """
+    按分组计算皮尔森相关系数（分段求和，先求组均值再求中心化乘积和）。
+
+    参数
+    ----------
+    codes : np.ndarray
+        分组编号，取值 0 ~ n_groups-1
+    x, y : np.ndarray
+        两组数值
+    n_groups : int
+        分组数
+
+    返回
+    -------
+    r : np.ndarray
+        每组相关系数，样本不足或方差为 0 时为 NaN
+    """
+    n = np.bincount(codes, minlength=n_groups).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dx = x - (np.bincount(codes, weights=x, minlength=n_groups) / n)[codes]
+        dy = y - (np.bincount(codes, weights=y, minlength=n_groups) / n)[codes]
+        sxy = np.bincount(codes, weights=dx * dy, minlength=n_groups)
+        sxx = np.bincount(codes, weights=dx * dx, minlength=n_groups)
+        syy = np.bincount(codes, weights=dy * dy, minlength=n_groups)
+        return sxy / np.sqrt(sxx * syy)
@@ -1,7 +1,53 @@
+import os
+
+import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
+
+
+def _as_frame(data_dict, row_labels=None):
+    if isinstance(data_dict, pd.DataFrame):
+        # 直接传入的表（如批处理从文件读取的列）：行标签按位置替换，而不是按索引重排
+        return data_dict if row_labels is None else data_dict.set_axis(list(row_labels))
+    return pd.DataFrame(data_dict, index=row_labels)
+
+
+@profiled
+def plot_colorbar(vmin, vmax, cmap="coolwarm", colorbar_file="colorbar.png", figsize=(1, 6), labelsize=15):
+    """
+    绘制单独的 colorbar（范围 vmin ~ vmax）。
+
+    参数
+    ----------
+    vmin, vmax : float
+        颜色映射范围，应与对应热图一致
+    cmap : str
+        颜色映射
+    colorbar_file : str
+        保存路径
+    figsize : tuple
+        图像尺寸
+    labelsize : float
+        刻度字号
+    """
+    with scoped_style():
+        fig, ax = new_subplots(figsize=figsize)
+        sm = ScalarMappable(norm=Normalize(vmin=vmin, vmax=vmax), cmap=cmap)
+        sm.set_array([])
+
+        cbar = fig.colorbar(sm, ax=ax)
+        cbar.ax.tick_params(labelsize=labelsize)
+        ax.remove()
 
+        mark("artists")
+        save_figure(fig, colorbar_file, dpi=300, bbox_inches="tight")
+
+
+
+@profiled
 def plot_heatmap_with_colorbar(
     data_dict, 
     row_labels=None, 
@@ -16,14 +62,16 @@ def plot_heatmap_with_colorbar(
     figsize=(8, 8),
     colorbar_figsize=(1, 6),
     heatmap_file="heatmap.png",
-    colorbar_file="colorbar.png"
+    colorbar_file="colorbar.png",
+    vmin=None,
+    vmax=None,
 ):
     """
     绘制热图和单独的 colorbar，适用于接口调用。
     
     Parameters
     ----------
-    data_dict : dict
+    data_dict : dict or pd.DataFrame
         字典形式的数据，key为列名，value为列表或数组。
     row_labels : list, optional
         行索引标签。
@@ -49,51 +97,203 @@ def plot_heatmap_with_colorbar(
         colorbar 尺寸。
     heatmap_file : str
         热图保存路径。
-    colorbar_file : str
-        colorbar 保存路径。
+    colorbar_file : str or None
+        colorbar 保存路径；None 时不绘制（多张热图共用一个 colorbar，见 plot_heatmap_batch）。
+    vmin, vmax : float, optional
+        颜色映射范围，默认取本矩阵的最小 / 最大值（忽略 NaN）；
+        同一组图应传入相同的范围，颜色才可比较。
     """
     
+    import seaborn as sns
+    mark("import")
+
     # ===== 1. 构建 DataFrame =====
-    df = pd.DataFrame(data_dict, index=row_labels)
+    df = _as_frame(data_dict, row_labels)
     
     if col_labels:
-        df.columns = col_labels
+        # 不原地改名：DataFrame 输入可能就是调用方的表
+        df = df.set_axis(list(col_labels), axis=1)
+
+    if vmin is None:
+        vmin = float(np.nanmin(df.values))
+    if vmax is None:
+        vmax = float(np.nanmax(df.values))
 
     # ===== 绘制主热图 =====
-    plt.figure(figsize=figsize)
-    ax = sns.heatmap(
-        df.T,
-        annot=annot,
-        fmt=annot_fmt,
-        cmap=cmap,
-        cbar=False,
-        annot_kws={"size": annot_size, "weight": annot_weight},
-        linewidths=0.5,
-        linecolor="gray",
-    )
+    with scoped_style():
+        fig, ax = new_subplots(figsize=figsize)
+        sns.heatmap(
+            df.T,
+            annot=annot,
+            fmt=annot_fmt,
+            cmap=cmap,
+            vmin=vmin,
+            vmax=vmax,
+            cbar=False,
+            annot_kws={"size": annot_size, "weight": annot_weight},
+            linewidths=0.5,
+            linecolor="gray",
+            ax=ax,
+        )
+
+        ax.set_xticklabels(ax.get_xticklabels(), fontsize=annot_size * 0.7, rotation=xtick_rotation)
+        ax.set_yticklabels(ax.get_yticklabels(), fontsize=annot_size * 0.7, rotation=ytick_rotation)
+
+        mark("artists")
 
-    ax.set_xticklabels(ax.get_xticklabels(), fontsize=annot_size * 0.7, rotation=xtick_rotation)
-    ax.set_yticklabels(ax.get_yticklabels(), fontsize=annot_size * 0.7, rotation=ytick_rotation)
+        fig.tight_layout()
 
-    plt.tight_layout()
-    plt.savefig(heatmap_file, dpi=300, bbox_inches="tight")
-    plt.close()
+        mark("layout")
+        save_figure(fig, heatmap_file, dpi=300, bbox_inches="tight")
+
+    print(f"热图保存为: {heatmap_file}")
 
     # ===== 绘制单独 colorbar =====
-    fig, ax = plt.subplots(figsize=colorbar_figsize)
-    norm = plt.Normalize(vmin=df.values.min(), vmax=df.values.max())
-    sm = plt.cm.ScalarMappable(norm=norm, cmap=cmap)
-    sm.set_array([])
+    if colorbar_file is not None:
+        plot_colorbar(vmin, vmax, cmap=cmap, colorbar_file=colorbar_file,
+                      figsize=colorbar_figsize, labelsize=annot_size * 0.6)
+        print(f"colorbar保存为: {colorbar_file}")
 
-    cbar = fig.colorbar(sm, ax=ax)
-    cbar.ax.tick_params(labelsize=annot_size * 0.6)
-    ax.remove()
 
-    plt.savefig(colorbar_file, dpi=300, bbox_inches="tight")
-    plt.close()
+# =========================================================
+# 🧩【批量热图】—— 全部矩阵共用一个颜色范围与一个 colorbar
+# =========================================================
+# 逐张调用 plot_heatmap_with_colorbar 时，每张图按自身的最小 / 最大值着色，
+# 同一组图中相同的颜色代表不同的数值，且每张图都重复生成一个 colorbar。
+# 批量模式先流式遍历一遍全部矩阵求出共同范围（文件按块读取，不整表载入），
+# 再把各热图作为任务交给 batch_render 并行绘制，最后只绘制一个 colorbar。
 
-    print(f"热图保存为: {heatmap_file}")
-    print(f"colorbar保存为: {colorbar_file}")
+def _numeric_columns(path, exclude=None):
+    # 按表头之后的前若干行判断列类型；行标签列等文本列不属于热图数据
+    from table_io import iter_table_chunks, table_columns
+    head = next(iter_table_chunks(path, table_columns(path), chunksize=1000))
+    return [c for c in head.select_dtypes("number").columns if c != exclude]
+
+
+def _table_range(path, chunksize, row_label_col=None):
+    from table_io import iter_table_chunks
+    lo, hi = np.inf, -np.inf
+    for chunk in iter_table_chunks(path, _numeric_columns(path, row_label_col), chunksize=chunksize):
+        values = chunk.to_numpy(dtype=float)
+        if values.size and not np.isnan(values).all():
+            lo, hi = min(lo, np.nanmin(values)), max(hi, np.nanmax(values))
+    return lo, hi
+
+
+def heatmap_value_range(matrices, center=None, chunksize=1_000_000, row_label_col=None):
+    """
+    一次遍历全部矩阵，返回共同的颜色范围 (vmin, vmax)（忽略 NaN）。
+
+    参数
+    ----------
+    matrices : iterable
+        每项为 data_dict（dict）、DataFrame、二维数组，或表格文件路径
+        （.csv / .parquet / .feather，只统计数值列，按块读取）；可以是生成器
+    center : float, optional
+        给定时范围关于 center 对称（发散色图如 coolwarm 的中点对应 center）
+    chunksize : int
+        读取文件时每块的行数
+    row_label_col : str, optional
+        文件中的行标签列（为数值时也不参与统计）
+
+    返回
+    -------
+    vmin, vmax : float
+    """
+    from table_io import is_table_path
+    lo, hi = np.inf, -np.inf
+    for m in matrices:
+        if is_table_path(m):
+            m_lo, m_hi = _table_range(m, chunksize, row_label_col)
+        else:
+            values = _as_frame(m).to_numpy(dtype=float) if isinstance(m, (dict, pd.DataFrame)) \
+                else np.asarray(m, dtype=float)
+            if not values.size or np.isnan(values).all():
+                continue
+            m_lo, m_hi = np.nanmin(values), np.nanmax(values)
+        lo, hi = min(lo, m_lo), max(hi, m_hi)
+    if not np.isfinite(lo):
+        raise ValueError("输入矩阵中没有有效数值")
+    if center is not None:
+        half = max(center - lo, hi - center)
+        lo, hi = center - half, center + half
+    return float(lo), float(hi)
+
+
+def plot_heatmap_batch(
+    matrices,
+    heatmap_file="heatmap_{name}.png",
+    colorbar_file="colorbar.png",
+    vmin=None,
+    vmax=None,
+    center=None,
+    cmap="coolwarm",
+    annot_size=25,
+    colorbar_figsize=(1, 6),
+    max_workers=None,
+    threads=False,
+    verbose=False,
+    row_label_col=None,
+    **kwargs,
+):
+    """
+    用同一颜色范围并行绘制一组热图，并只生成一个共用的 colorbar。
+
+    参数
+    ----------
+    matrices : dict
+        名称 → data_dict / DataFrame / 表格文件路径（文件中的各数值列即热图的列，文本列被忽略）
+    heatmap_file : str
+        热图保存路径模板，{name} 替换为名称
+    colorbar_file : str or None
+        共用 colorbar 的保存路径；None 时不绘制
+    vmin, vmax : float, optional
+        颜色范围；未给出的一端由 heatmap_value_range 对全部矩阵求得
+    center : float, optional
+        见 heatmap_value_range
+    cmap, annot_size, colorbar_figsize :
+        同 plot_heatmap_with_colorbar
+    max_workers, threads, verbose :
+        传给 batch_render.render_batch（默认进程池，threads=True 时在当前进程的线程池中绘制）
+    row_label_col : str, optional
+        表格文件中作为行标签（row_labels）的列
+    **kwargs :
+        其余 plot_heatmap_with_colorbar 参数（row_labels、annot_fmt、figsize 等），各图相同
+
+    返回
+    -------
+    result : dict
+        vmin, vmax, colorbar_file, results（render_batch 的逐图结果，顺序与 matrices 一致）
+    """
+    from batch_render import render_batch
+    from table_io import is_table_path
+
+    if vmin is None or vmax is None:
+        lo, hi = heatmap_value_range(matrices.values(), center=center, row_label_col=row_label_col)
+        vmin = lo if vmin is None else vmin
+        vmax = hi if vmax is None else vmax
+
+    jobs = []
+    for name, data in matrices.items():
+        job_kwargs = dict(kwargs, cmap=cmap, annot_size=annot_size, vmin=vmin, vmax=vmax,
+                          heatmap_file=heatmap_file.format(name=name), colorbar_file=None)
+        job = {"id": str(name), "function": "plot_heatmap_with_colorbar", "kwargs": job_kwargs}
+        if is_table_path(data):
+            # 文件在工作进程中读取，不经主进程序列化传递
+            job["inputs"] = {"data_dict": {"table": data, "columns": _numeric_columns(data, row_label_col)}}
+            if row_label_col is not None:
+                job["inputs"]["row_labels"] = {"table": data, "column": row_label_col, "as": "list"}
+        else:
+            job_kwargs["data_dict"] = data
+        jobs.append(job)
+    results = render_batch(jobs, max_workers=max_workers, threads=threads, verbose=verbose)
+
+    if colorbar_file is not None:
+        # 与各热图一样，输出目录不存在时先创建
+        os.makedirs(os.path.dirname(os.path.abspath(colorbar_file)), exist_ok=True)
+        plot_colorbar(vmin, vmax, cmap=cmap, colorbar_file=colorbar_file,
+                      figsize=colorbar_figsize, labelsize=annot_size * 0.6)
+    return {"vmin": vmin, "vmax": vmax, "colorbar_file": colorbar_file, "results": results}
 
 
 # ==========================
@@ -114,3 +314,12 @@ if __name__ == "__main__":
         heatmap_file="example_heatmap.png",
         colorbar_file="example_colorbar.png"
     )
+
+    # 一组热图共用颜色范围与 colorbar：
+    # plot_heatmap_batch(
+    #     {"fold1": example_data, "fold2": "fold2_scores.csv", "fold3": "fold3_scores.parquet"},
+    #     heatmap_file="panel/heatmap_{name}.png",
+    #     colorbar_file="panel/colorbar.png",
+    #     row_labels=row_names,
+    #     max_workers=4,
+    # )
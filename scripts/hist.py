@@ -1,7 +1,9 @@
-import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.ticker import MultipleLocator
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
 
+@profiled
 def plot_bar_chart(
     methods,
     values,
@@ -30,7 +32,8 @@ def plot_bar_chart(
     show_left_spine=True,
     grid=False,
     save_path=None,
-    dpi=300
+    dpi=300,
+    show=None
 ):
     """
     绘制带误差棒的柱状图
@@ -41,8 +44,8 @@ def plot_bar_chart(
         x轴标签（方法名称列表）
     values : list[float]  
         每个方法对应的数值
-    errors : list[float], optional  
-        误差棒大小
+    errors : list[float] or array (2, N), optional  
+        误差棒大小（可为上下不对称误差）
     colors : list[str], optional  
         每个柱子的颜色
     highlight_idx : int, optional  
@@ -77,66 +80,342 @@ def plot_bar_chart(
         保存路径
     dpi : int  
         保存分辨率
+    show : bool, optional  
+        是否弹出窗口显示，默认仅在不保存时显示
     """
     x = np.arange(len(methods))
-    fig, ax = plt.subplots(figsize=figsize)
-
-    # 绘制柱状图
-    bars = ax.bar(
-        x, values, 
-        width=bar_width, 
-        color=colors, 
-        edgecolor=edgecolor, 
-        linewidth=edgewidth,
-        yerr=errors,
-        capsize=4
-    )
-
-    # 高亮柱子
-    if highlight_idx is not None and 0 <= highlight_idx < len(values):
-        bars[highlight_idx].set_color("orange")
-
-    # 显示数值
-    if show_values:
-        for i, val in enumerate(values):
-            ax.text(i, val + 0.02, f"{val:.3f}", ha="center", va="bottom",
-                    fontsize=value_font_size)
-
-    # x轴
-    ax.set_xticks(x)
-    ax.set_xticklabels(methods, rotation=rotation, ha="right", fontsize=x_font_size, fontname=fontname)
-
-    # y轴字体
-    ax.tick_params(axis='y', labelsize=y_font_size)
+    if show is None:
+        show = save_path is None
+    with scoped_style():
+        fig, ax = new_subplots(figsize=figsize, show=show)
+
+        # 绘制柱状图
+        bars = ax.bar(
+            x, values, 
+            width=bar_width, 
+            color=colors, 
+            edgecolor=edgecolor, 
+            linewidth=edgewidth,
+            yerr=errors,
+            capsize=4
+        )
+
+        # 高亮柱子
+        if highlight_idx is not None and 0 <= highlight_idx < len(values):
+            bars[highlight_idx].set_color("orange")
+
+        # 显示数值（有误差棒时标注在误差棒上端）
+        if show_values:
+            ax.bar_label(bars, fmt="%.3f", fontsize=value_font_size, padding=2)
+
+        # x轴
+        ax.set_xticks(x)
+        ax.set_xticklabels(methods, rotation=rotation, ha="right", fontsize=x_font_size, fontname=fontname)
+
+        # y轴字体
+        ax.tick_params(axis='y', labelsize=y_font_size)
     
-    # 坐标轴标签与标题
-    ax.set_ylabel(ylabel, fontsize=font_size)
-    ax.set_title(title, fontsize=title_font_size)
+        # 坐标轴标签与标题
+        ax.set_ylabel(ylabel, fontsize=font_size)
+        ax.set_title(title, fontsize=title_font_size)
 
-    # 坐标范围
-    if ylim is not None:
-        ax.set_ylim(ylim)
+        # 坐标范围
+        if ylim is not None:
+            ax.set_ylim(ylim)
     
-    # y轴刻度间隔
-    if y_tick_step is not None:
-        ax.yaxis.set_major_locator(MultipleLocator(y_tick_step))
+        # y轴刻度间隔
+        if y_tick_step is not None:
+            ax.yaxis.set_major_locator(MultipleLocator(y_tick_step))
     
-    # 网格
-    if grid:
-        ax.grid(axis="y", linestyle="--", alpha=0.7)
+        # 网格
+        if grid:
+            ax.grid(axis="y", linestyle="--", alpha=0.7)
+
+        # 边框可见性
+        ax.spines["top"].set_visible(show_top_spine)
+        ax.spines["right"].set_visible(show_right_spine)
+        ax.spines["bottom"].set_visible(show_bottom_spine)
+        ax.spines["left"].set_visible(show_left_spine)
+
+        mark("artists")
+
+        fig.tight_layout()
+
+        mark("layout")
+
+        # 保存/显示
+        save_figure(fig, save_path, show=show, dpi=dpi)
+
+
+def aggregate_long_table(
+    table,
+    method_col,
+    value_col,
+    group_col=None,
+    err="sd",
+    ci=0.95,
+    n_boot=1000,
+    seed=0,
+    boot_max_n=500
+):
+    """
+    由长格式原始结果表按 (方法, 分组) 汇总均值和误差。
+
+    参数:
+    ----------
+    table : str or pd.DataFrame
+        长格式表或其路径（.csv / .parquet / .feather），每行一条结果（如某方法某种子某划分的指标）
+    method_col : str
+        方法列名
+    value_col : str
+        数值列名
+    group_col : str, optional
+        分组列名（如数据集划分），用于簇状柱状图
+    err : str
+        误差类型："sd" 标准差，"sem" 标准误，"ci" 均值的自助法置信区间
+    ci : float
+        err="ci" 时的置信水平
+    n_boot : int
+        err="ci" 时的自助法重抽样次数
+    seed : int
+        随机种子
+    boot_max_n : int
+        err="ci" 时样本数不超过此值的组逐次重抽样；更大的组的自助均值分布
+        按正态近似 N(均值, 总体标准差 / √n) 直接取分位数（n 较大时两者一致）
+
+    返回:
+    -------
+    summary : pd.DataFrame
+        每个 (方法, 分组) 一行，列为 method_col, [group_col], mean, err_low, err_high, n；
+        err_low / err_high 为相对均值的下/上误差长度，可直接作为 yerr
+    """
+    keys = [method_col] if group_col is None else [method_col, group_col]
+    if isinstance(table, str):
+        # 分组键读为 category，groupby 直接使用整数编码
+        from table_io import read_table
+        df = read_table(table, keys + [value_col], float_dtype=None)
+    else:
+        df = table[keys + [value_col]]
+    mark("load")
 
-    # 边框可见性
-    ax.spines["top"].set_visible(show_top_spine)
-    ax.spines["right"].set_visible(show_right_spine)
-    ax.spines["bottom"].set_visible(show_bottom_spine)
-    ax.spines["left"].set_visible(show_left_spine)
+    # 单次 groupby 同时得到均值、标准差和样本数（保持首次出现顺序）
+    grouped = df.groupby(keys, sort=False, observed=True)[value_col]
+    summary = grouped.agg(["mean", "std", "count"]).reset_index()
+    summary = summary.rename(columns={"count": "n"})
 
-    plt.tight_layout()
+    if err == "sd":
+        summary["err_low"] = summary["err_high"] = summary["std"]
+    elif err == "sem":
+        summary["err_low"] = summary["err_high"] = summary["std"] / np.sqrt(summary["n"])
+    elif err == "ci":
+        low, high = _bootstrap_mean_ci(grouped.ngroup(), df[value_col], summary, ci, n_boot, seed, boot_max_n)
+        summary["err_low"] = summary["mean"].to_numpy() - low
+        summary["err_high"] = high - summary["mean"].to_numpy()
+    else:
+        raise ValueError(f"未知的误差类型: {err}")
 
-    # 保存
-    if save_path is not None:
-        fig.savefig(save_path, dpi=dpi)
-    plt.show()
+    return summary.drop(columns="std")
+
+
+def _bootstrap_mean_ci(group_codes, values, summary, ci, n_boot, seed, boot_max_n):
+    # ngroup 编号与 agg 结果顺序一致（均为首次出现顺序）；分组键缺失的行编号为 NaN，
+    # 与数值缺失的行一样不参与（mean / std / count 同样忽略）
+    from statistics import NormalDist
+
+    codes = group_codes.fillna(-1).to_numpy().astype(np.intp)
+    values = values.to_numpy(dtype=float)
+    keep = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+    n_groups = len(summary)
+    counts = np.bincount(codes, minlength=n_groups)
+    mean = summary["mean"].to_numpy(dtype=float)
+    low, high = np.full(n_groups, np.nan), np.full(n_groups, np.nan)
+    alpha = (1 - ci) / 2
+
+    # 大组：正态近似（自助法重抽样的方差为总体方差 / n）
+    big = counts > boot_max_n
+    z = NormalDist().inv_cdf(1 - alpha)
+    n_big = counts[big]
+    se = summary["std"].to_numpy(dtype=float)[big] * np.sqrt((n_big - 1) / n_big) / np.sqrt(n_big)
+    low[big], high[big] = mean[big] - z * se, mean[big] + z * se
+
+    # 小组：所有组同时重抽样，按批向量化（每批为 批大小 × 行数 的下标矩阵）
+    small = np.flatnonzero((counts > 0) & ~big)
+    if small.size:
+        rows = np.isin(codes, small)
+        order = np.argsort(codes[rows], kind="stable")
+        sorted_codes, sorted_values = codes[rows][order], values[rows][order]
+        n_rows = len(sorted_values)
+        starts = np.searchsorted(sorted_codes, small)
+        offset = np.repeat(starts, counts[small])
+        size = np.repeat(counts[small], counts[small])
+        rng = np.random.default_rng(seed)
+        boot = np.empty((n_boot, small.size))
+        batch = max(1, min(n_boot, 4_000_000 // n_rows))
+        for b0 in range(0, n_boot, batch):
+            b = min(batch, n_boot - b0)
+            idx = offset + (rng.random((b, n_rows)) * size).astype(np.intp)
+            boot[b0:b0 + b] = np.add.reduceat(sorted_values[idx], starts, axis=1) / counts[small]
+        low[small], high[small] = np.quantile(boot, [alpha, 1 - alpha], axis=0)
+    return low, high
+
+
+@profiled
+def plot_grouped_bar_chart(
+    summary,
+    method_col,
+    group_col,
+    group_colors=None,
+    figsize=(8, 4),
+    bar_width=0.8,
+    rotation=90,
+    fontname="DejaVu Sans",
+    font_size=14,
+    x_font_size=12,
+    y_font_size=12,
+    title_font_size=16,
+    legend_font_size=11,
+    ylabel="",
+    title="",
+    ylim=None,
+    y_tick_step=None,
+    show_values=False,
+    value_font_size=10,
+    value_fmt="{:.3f}",
+    edgecolor="black",
+    edgewidth=1.2,
+    show_top_spine=False,
+    show_right_spine=False,
+    show_bottom_spine=True,
+    show_left_spine=True,
+    grid=False,
+    save_path=None,
+    dpi=300,
+    show=None
+):
+    """
+    绘制簇状柱状图：每个分组一次 ax.bar 调用（一个 BarContainer），数值用 ax.bar_label 标注。
+
+    参数:
+    ----------
+    summary : pd.DataFrame
+        aggregate_long_table 的输出（需包含 group_col）
+    method_col, group_col : str
+        方法列与分组列
+    group_colors : list[str], optional
+        每个分组的颜色
+    bar_width : float
+        每个方法簇的总宽度
+    value_fmt : str
+        数值标注格式
+    其余参数同 plot_bar_chart
+    """
+    methods = list(dict.fromkeys(summary[method_col]))
+    groups = list(dict.fromkeys(summary[group_col]))
+    # 透视为 (分组, 方法) 矩阵，缺失组合为 NaN（不绘制）
+    table = summary.set_index([group_col, method_col])
+    mean = table["mean"].unstack(method_col).reindex(index=groups, columns=methods)
+    low = table["err_low"].unstack(method_col).reindex(index=groups, columns=methods)
+    high = table["err_high"].unstack(method_col).reindex(index=groups, columns=methods)
+
+    x = np.arange(len(methods))
+    width = bar_width / len(groups)
+    if show is None:
+        show = save_path is None
+    with scoped_style():
+        fig, ax = new_subplots(figsize=figsize, show=show)
+
+        for k, g in enumerate(groups):
+            offset = (k - (len(groups) - 1) / 2) * width
+            container = ax.bar(
+                x + offset, mean.loc[g].to_numpy(),
+                width=width,
+                color=None if group_colors is None else group_colors[k % len(group_colors)],
+                edgecolor=edgecolor,
+                linewidth=edgewidth,
+                yerr=np.vstack([low.loc[g].to_numpy(), high.loc[g].to_numpy()]),
+                capsize=3,
+                label=str(g)
+            )
+            if show_values:
+                ax.bar_label(container, labels=[value_fmt.format(v) if np.isfinite(v) else ""
+                                                 for v in mean.loc[g].to_numpy()],
+                             fontsize=value_font_size, padding=2)
+
+        # x轴
+        ax.set_xticks(x)
+        ax.set_xticklabels(methods, rotation=rotation, ha="right", fontsize=x_font_size, fontname=fontname)
+        ax.tick_params(axis='y', labelsize=y_font_size)
+
+        # 坐标轴标签与标题
+        ax.set_ylabel(ylabel, fontsize=font_size)
+        ax.set_title(title, fontsize=title_font_size)
+        ax.legend(frameon=False, fontsize=legend_font_size)
+
+        if ylim is not None:
+            ax.set_ylim(ylim)
+        if y_tick_step is not None:
+            ax.yaxis.set_major_locator(MultipleLocator(y_tick_step))
+        if grid:
+            ax.grid(axis="y", linestyle="--", alpha=0.7)
+
+        # 边框可见性
+        ax.spines["top"].set_visible(show_top_spine)
+        ax.spines["right"].set_visible(show_right_spine)
+        ax.spines["bottom"].set_visible(show_bottom_spine)
+        ax.spines["left"].set_visible(show_left_spine)
+
+        mark("artists")
+
+        fig.tight_layout()
+
+        mark("layout")
+
+        # 保存/显示
+        save_figure(fig, save_path, show=show, dpi=dpi)
+
+
+@profiled
+def plot_bar_chart_from_table(
+    table,
+    method_col,
+    value_col,
+    group_col=None,
+    err="sd",
+    ci=0.95,
+    n_boot=1000,
+    seed=0,
+    boot_max_n=500,
+    **plot_kwargs
+):
+    """
+    直接由长格式原始结果表绘制柱状图：先单次 groupby 汇总，再绘制单组或簇状柱状图。
+
+    参数:
+    ----------
+    table, method_col, value_col, group_col, err, ci, n_boot, seed, boot_max_n :
+        同 aggregate_long_table
+    **plot_kwargs :
+        传给 plot_bar_chart（无分组）或 plot_grouped_bar_chart（有分组）的绘图参数
+
+    返回:
+    -------
+    summary : pd.DataFrame
+        汇总结果
+    """
+    summary = aggregate_long_table(table, method_col, value_col, group_col=group_col,
+                                   err=err, ci=ci, n_boot=n_boot, seed=seed, boot_max_n=boot_max_n)
+    mark("stats")
+    if group_col is None:
+        plot_bar_chart(
+            methods=summary[method_col].tolist(),
+            values=summary["mean"].to_numpy(),
+            errors=np.vstack([summary["err_low"], summary["err_high"]]),
+            **plot_kwargs
+        )
+    else:
+        plot_grouped_bar_chart(summary, method_col, group_col, **plot_kwargs)
+    return summary
 
 
 # methods = ["Pafnucy", "OnionNet", "IGN", "SIGN", "SMINA"]
@@ -162,3 +441,16 @@ def plot_bar_chart(
 #     ylabel="RMSE",
 #     save_path="rmse_plot.png"
 # )
+
+# # 由长格式原始结果直接汇总绘图（每行一条记录：method, seed, split, rmse）
+# summary = plot_bar_chart_from_table(
+#     "benchmark_results.csv",
+#     method_col="method",
+#     value_col="rmse",
+#     group_col="split",          # 不分组时设为 None
+#     err="ci",                   # "sd" / "sem" / "ci"
+#     group_colors=["pink", "mediumseagreen", "skyblue"],
+#     show_values=True,
+#     ylabel="RMSE",
+#     save_path="rmse_grouped.png"
+# )
@@ -1,108 +1,431 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
 import matplotlib.patches as mpatches
-from scipy.stats import pearsonr, spearmanr
+from matplotlib.collections import LineCollection
+from group_stats import group_ranks, group_pearson
+from prediction_set import PredictionSet
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
+from table_io import iter_table_chunks, read_table
 
-def plot_metrics_radar(csv_path, length_col, true_col, pred_col, figsize=(6,6), save_path="metrics_radar.png"):
+# 默认蛋白长度分组
+DEFAULT_LENGTH_BINS = [0, 300, 600, 900, np.inf]
+DEFAULT_LENGTH_LABELS = ["<300", "300-600", "600-900", ">900"]
+
+
+def group_codes(df, length_col=None, bins=None, labels=None, group_col=None):
     """
-    根据蛋白长度分组绘制预测指标雷达图。
+    生成分组编号：按数值列分箱，或直接使用类别列。
 
-    参数:
+    参数
+    ----------
+    df : pd.DataFrame
+        数据表
+    length_col : str, optional
+        用于分箱的数值列名（如蛋白长度）
+    bins : list, optional
+        分箱边界（左闭右开），默认 [0, 300, 600, 900, ∞)
+    labels : list, optional
+        分箱标签，默认使用内置长度标签或 "[a, b)" 形式
+    group_col : str, optional
+        类别分组列名；给定时忽略 length_col / bins
+
+    返回
+    -------
+    codes : np.ndarray
+        每行所在分组编号，无法分组的行为 -1
+    group_labels : list
+        分组标签，顺序与编号一致
+    """
+    if group_col is not None:
+        cat = df[group_col]
+        if not isinstance(cat.dtype, pd.CategoricalDtype):
+            cat = cat.astype("category")
+        return cat.cat.codes.to_numpy(), [str(c) for c in cat.cat.categories]
+
+    if bins is None:
+        bins = DEFAULT_LENGTH_BINS
+        labels = DEFAULT_LENGTH_LABELS if labels is None else labels
+    if labels is None:
+        labels = [f"[{lo:g}, {hi:g})" for lo, hi in zip(bins[:-1], bins[1:])]
+    cut = pd.cut(df[length_col], bins=bins, labels=labels, right=False)
+    return cut.cat.codes.to_numpy(), list(labels)
+
+
+def grouped_metrics(codes, y_true, y_pred, group_labels, true_ranks=None):
+    """
+    单次向量化计算所有分组的 RMSE、MAE、Pearson、Spearman、R2 和 CI。
+
+    整体只做一次分组排序求组内秩（Spearman），其余指标均为分段求和，
+    不对每个分组单独切片，适用于百万行、上百个分组的数据。
+
+    参数
+    ----------
+    codes : np.ndarray
+        分组编号，小于 0 的行会被忽略
+    y_true : np.ndarray
+        真实值
+    y_pred : np.ndarray
+        预测值
+    group_labels : list
+        分组标签
+    true_ranks : np.ndarray, optional
+        预先计算好的真实值组内秩（需与过滤后的行一一对应），多模型时可复用
+
+    返回
+    -------
+    metrics_df : pd.DataFrame
+        每个非空分组一行，列为 N, RMSE, MAE, Pearson, Spearman, R2, CI, Length_Group
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    keep = (codes >= 0) & np.isfinite(y_true) & np.isfinite(y_pred)
+    if not keep.all():
+        codes, y_true, y_pred = codes[keep], y_true[keep], y_pred[keep]
+    n_groups = len(group_labels)
+
+    n = np.bincount(codes, minlength=n_groups).astype(float)
+    err = y_true - y_pred
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rmse = np.sqrt(np.bincount(codes, weights=err * err, minlength=n_groups) / n)
+        mae = np.bincount(codes, weights=np.abs(err), minlength=n_groups) / n
+
+    pearson = group_pearson(codes, y_true, y_pred, n_groups)
+    if true_ranks is None:
+        true_ranks = group_ranks(codes, y_true, n_groups)
+    pred_ranks = group_ranks(codes, y_pred, n_groups)
+    spearman = group_pearson(codes, true_ranks, pred_ranks, n_groups)
+
+    metrics_df = pd.DataFrame({
+        "N": n.astype(int), "RMSE": rmse, "MAE": mae, "Pearson": pearson,
+        "Spearman": spearman, "R2": pearson ** 2, "CI": 0.5 * (pearson + spearman),
+        "Length_Group": group_labels,
+    })
+    return metrics_df[metrics_df["N"] > 0].reset_index(drop=True)
+
+
+class MetricAccumulator:
+    """
+    分组在线指标累加器：按块更新、内存恒定、可合并。
+
+    - RMSE / MAE：误差平方和、绝对误差和（精确）
+    - Pearson：分组计数、均值、二阶中心矩与协方差，按 Chan 并行公式合并（精确且数值稳定）
+    - Spearman：真实值 × 预测值的分组联合直方图，由直方图边际计算中位秩后求秩相关；
+      同一格内的样本视为并列，精度取决于分箱分辨率（分箱边界取数据分位数时最好），
+      直方图可直接相加，适合多进程分片后合并
+
+    参数
+    ----------
+    true_edges : array-like
+        真实值分箱边界（单调递增），超出范围的值归入首/末格
+    pred_edges : array-like
+        预测值分箱边界，与 true_edges 分箱数相同
+    group_labels : list, optional
+        预先固定的分组标签；为 None 时在更新过程中按出现顺序动态追加
+    """
+
+    def __init__(self, true_edges, pred_edges, group_labels=None):
+        self.true_edges = np.asarray(true_edges, dtype=float)
+        self.pred_edges = np.asarray(pred_edges, dtype=float)
+        if len(self.true_edges) != len(self.pred_edges):
+            raise ValueError("true_edges 与 pred_edges 的分箱数必须相同")
+        self.n_rank_bins = len(self.true_edges) - 1
+        self.group_labels = []
+        self._index = {}
+        self.n = np.zeros(0)
+        self.mean_t = np.zeros(0)
+        self.mean_p = np.zeros(0)
+        self.m2_t = np.zeros(0)
+        self.m2_p = np.zeros(0)
+        self.c_tp = np.zeros(0)
+        self.sse = np.zeros(0)
+        self.sae = np.zeros(0)
+        self.hist = np.zeros((0, self.n_rank_bins, self.n_rank_bins), dtype=np.int64)
+        if group_labels is not None:
+            self.register_groups(group_labels)
+
+    def register_groups(self, labels):
+        """登记分组标签，返回其在累加器中的编号数组（新标签追加到末尾）。"""
+        new = [str(g) for g in labels if str(g) not in self._index]
+        for g in dict.fromkeys(new):
+            self._index[g] = len(self.group_labels)
+            self.group_labels.append(g)
+        extra = len(self.group_labels) - len(self.n)
+        if extra > 0:
+            for name in ("n", "mean_t", "mean_p", "m2_t", "m2_p", "c_tp", "sse", "sae"):
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros(extra)]))
+            b = self.n_rank_bins
+            self.hist = np.concatenate([self.hist, np.zeros((extra, b, b), dtype=np.int64)])
+        return np.array([self._index[str(g)] for g in labels], dtype=np.intp)
+
+    def _rank_bin(self, x, edges):
+        return np.clip(np.searchsorted(edges, x, side="right") - 1, 0, self.n_rank_bins - 1)
+
+    def update(self, codes, y_true, y_pred):
+        """
+        用一个数据块更新累加器。
+
+        参数
+        ----------
+        codes : np.ndarray
+            累加器分组编号（由 register_groups 得到），小于 0 的行会被忽略
+        y_true, y_pred : np.ndarray
+            真实值与预测值
+        """
+        codes = np.asarray(codes, dtype=np.intp)
+        y_true = np.asarray(y_true, dtype=float)
+        y_pred = np.asarray(y_pred, dtype=float)
+        keep = (codes >= 0) & np.isfinite(y_true) & np.isfinite(y_pred)
+        codes, y_true, y_pred = codes[keep], y_true[keep], y_pred[keep]
+        g = len(self.group_labels)
+
+        # 本块的分组统计量
+        nb = np.bincount(codes, minlength=g).astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mt = np.bincount(codes, weights=y_true, minlength=g) / nb
+            mp = np.bincount(codes, weights=y_pred, minlength=g) / nb
+        dt = y_true - mt[codes]
+        dp = y_pred - mp[codes]
+        err = y_true - y_pred
+        self._combine(nb, np.nan_to_num(mt), np.nan_to_num(mp),
+                      np.bincount(codes, weights=dt * dt, minlength=g),
+                      np.bincount(codes, weights=dp * dp, minlength=g),
+                      np.bincount(codes, weights=dt * dp, minlength=g))
+        self.sse += np.bincount(codes, weights=err * err, minlength=g)
+        self.sae += np.bincount(codes, weights=np.abs(err), minlength=g)
+
+        # Spearman 联合直方图
+        b = self.n_rank_bins
+        flat = (codes * b + self._rank_bin(y_true, self.true_edges)) * b \
+            + self._rank_bin(y_pred, self.pred_edges)
+        self.hist += np.bincount(flat, minlength=g * b * b).reshape(g, b, b)
+
+    def _combine(self, nb, mt, mp, m2t, m2p, ctp):
+        """按 Chan 并行公式合并分组计数、均值和二阶矩。"""
+        na = self.n
+        n = na + nb
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = np.where(n > 0, na * nb / n, 0.0)
+            ft = np.where(n > 0, nb / n, 0.0)
+        d_t = mt - self.mean_t
+        d_p = mp - self.mean_p
+        self.mean_t = self.mean_t + d_t * ft
+        self.mean_p = self.mean_p + d_p * ft
+        self.m2_t = self.m2_t + m2t + d_t * d_t * w
+        self.m2_p = self.m2_p + m2p + d_p * d_p * w
+        self.c_tp = self.c_tp + ctp + d_t * d_p * w
+        self.n = n
+
+    def merge(self, other):
+        """合并另一个累加器（如其他进程处理的分片），返回自身。"""
+        if (not np.array_equal(other.true_edges, self.true_edges)
+                or not np.array_equal(other.pred_edges, self.pred_edges)):
+            raise ValueError("MetricAccumulator 的分箱设置不一致，无法合并")
+        idx = self.register_groups(other.group_labels)
+        g = len(self.group_labels)
+
+        def scatter(arr):
+            out = np.zeros(g)
+            out[idx] = arr
+            return out
+
+        self._combine(scatter(other.n), scatter(other.mean_t), scatter(other.mean_p),
+                      scatter(other.m2_t), scatter(other.m2_p), scatter(other.c_tp))
+        self.sse[idx] += other.sse
+        self.sae[idx] += other.sae
+        self.hist[idx] += other.hist
+        return self
+
+    def spearman(self):
+        """由联合直方图计算每组 Spearman 相关系数（格内并列取中位秩）。"""
+        h = self.hist.astype(float)
+        rows, cols = h.sum(axis=2), h.sum(axis=1)
+        rank_t = np.cumsum(rows, axis=1) - rows + (rows + 1) / 2
+        rank_p = np.cumsum(cols, axis=1) - cols + (cols + 1) / 2
+        mid = ((self.n + 1) / 2)[:, None]
+        rt, rp = rank_t - mid, rank_p - mid
+        cov = np.einsum("gi,gij,gj->g", rt, h, rp)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return cov / np.sqrt((rows * rt ** 2).sum(1) * (cols * rp ** 2).sum(1))
+
+    def result(self):
+        """
+        返回与 grouped_metrics 相同格式的分组指标表。
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rmse = np.sqrt(self.sse / self.n)
+            mae = self.sae / self.n
+            pearson = self.c_tp / np.sqrt(self.m2_t * self.m2_p)
+        spearman = self.spearman()
+        metrics_df = pd.DataFrame({
+            "N": self.n.astype(int), "RMSE": rmse, "MAE": mae, "Pearson": pearson,
+            "Spearman": spearman, "R2": pearson ** 2, "CI": 0.5 * (pearson + spearman),
+            "Length_Group": self.group_labels,
+        })
+        return metrics_df[metrics_df["N"] > 0].reset_index(drop=True)
+
+
+def rank_edges(csv_path, columns, n_rank_bins=128, chunksize=1_000_000, sample_per_chunk=20_000, seed=0):
+    """
+    分块扫描一遍，从每块的随机子样本估计各列分位数，作为 Spearman 直方图的分箱边界。
+
+    多个进程处理同一数据集的不同分片时，应先用同一组边界构造累加器，才能合并。
+
+    返回
+    -------
+    edges : dict
+        列名 -> 长度为 n_rank_bins + 1 的分箱边界
+    """
+    rng = np.random.default_rng(seed)
+    samples = {c: [] for c in columns}
+    for chunk in iter_table_chunks(csv_path, columns, chunksize, dtype={c: "float32" for c in columns}):
+        idx = rng.choice(len(chunk), size=min(sample_per_chunk, len(chunk)), replace=False)
+        for c in columns:
+            samples[c].append(chunk[c].to_numpy()[idx])
+    qs = np.linspace(0, 1, n_rank_bins + 1)
+    return {c: np.unique(np.nanquantile(np.concatenate(samples[c]), qs)) for c in columns}
+
+
+def accumulate_csv(csv_path, length_col, true_col, pred_col, bins=None, labels=None, group_col=None,
+                   chunksize=1_000_000, n_rank_bins=128, value_range=None, accumulator=None):
+    """
+    分块读取表格（只读取所需列并指定 dtype），在线累加分组指标。
+
+    参数
     ----------
     csv_path : str
-        CSV 文件路径，必须包含蛋白长度、真实值和预测值列。
-    length_col : str
-        CSV 中蛋白长度列名。
-    true_col : str
-        CSV 中真实值列名。
-    pred_col : str
-        CSV 中预测值列名。
-    figsize : tuple, default (6,6)
-        图形尺寸。
-    save_path : str, default "metrics_radar.png"
-        保存文件路径。
+        CSV / Parquet / Feather 文件路径（见 table_io）
+    length_col, true_col : str
+        蛋白长度列、真实值列
+    pred_col : str or list[str]
+        预测值列；为列表时一次读取所有模型列，每个模型各有一个累加器
+    bins, labels, group_col :
+        分组方式，同 group_codes
+    chunksize : int
+        每块行数
+    n_rank_bins : int
+        Spearman 直方图分辨率
+    value_range : tuple, optional
+        真实值与预测值的共同取值范围（等宽分箱）；为 None 时先分块扫描一遍，
+        以抽样分位数作为分箱边界
+    accumulator : MetricAccumulator or dict, optional
+        已有累加器（多模型时为 {模型列: 累加器}），给定时在其基础上继续累加
 
-    返回:
+    返回
     -------
-    metrics_norm_df : pd.DataFrame
-        标准化后的指标数据，按蛋白长度分组。
+    accumulator : MetricAccumulator or dict
+        调用 .result() 得到分组指标表，调用 .merge() 合并其他分片；
+        pred_col 为列表时返回 {模型列: 累加器}
     """
+    pred_cols = [pred_col] if isinstance(pred_col, str) else list(pred_col)
+    key_col = group_col if group_col is not None else length_col
+    dtype = {c: "float32" for c in [true_col] + pred_cols}
+    dtype[key_col] = "category" if group_col is not None else "float32"
 
-    # ===============================
-    # 读取数据
-    # ===============================
-    df = pd.read_csv(csv_path)
+    if accumulator is None:
+        if value_range is None:
+            edges = rank_edges(csv_path, [true_col] + pred_cols, n_rank_bins, chunksize)
+            # 分位数并列时边界会被去重，各列补齐为相同分箱数
+            size = max(len(e) for e in edges.values())
+            edges = {c: np.pad(e, (0, size - len(e)), mode="edge") for c, e in edges.items()}
+        else:
+            grid = np.linspace(value_range[0], value_range[1], n_rank_bins + 1)
+            edges = {c: grid for c in [true_col] + pred_cols}
+        if group_col is None:
+            fixed = labels if bins is not None else (labels or DEFAULT_LENGTH_LABELS)
+            fixed = group_codes(pd.DataFrame({length_col: [0.0]}), length_col, bins, fixed)[1]
+        else:
+            fixed = None
+        accumulators = {c: MetricAccumulator(edges[true_col], edges[c], group_labels=fixed) for c in pred_cols}
+    else:
+        accumulators = {pred_cols[0]: accumulator} if isinstance(accumulator, MetricAccumulator) else accumulator
 
-    # ===============================
-    # 计算评估指标函数
-    # ===============================
-    def calc_metrics(y_true, y_pred):
-        y_true = np.array(y_true)
-        y_pred = np.array(y_pred)
-        rmse = np.sqrt(np.mean((y_true - y_pred) ** 2))
-        mae = np.mean(np.abs(y_true - y_pred))
-        pearson = pearsonr(y_true, y_pred)[0]
-        spearman = spearmanr(y_true, y_pred)[0]
-        r2 = pearson ** 2
-        ci = 0.5 * (pearson + spearman)
-        return {"RMSE": rmse, "MAE": mae, "Pearson": pearson, "Spearman": spearman, "R2": r2, "CI": ci}
+    for chunk in iter_table_chunks(csv_path, [key_col, true_col] + pred_cols, chunksize, dtype=dtype):
+        codes, chunk_labels = group_codes(chunk, length_col, bins=bins, labels=labels, group_col=group_col)
+        y_true = chunk[true_col].to_numpy()
+        for c, acc in accumulators.items():
+            mapping = acc.register_groups(chunk_labels)
+            acc_codes = np.where(codes >= 0, mapping[np.maximum(codes, 0)] if len(mapping) else -1, -1)
+            acc.update(acc_codes, y_true, chunk[c].to_numpy())
+    return accumulators[pred_cols[0]] if isinstance(pred_col, str) else accumulators
 
-    # ===============================
-    # 按蛋白长度分组
-    # ===============================
-    bins = [0, 300, 600, 900, np.inf]
-    labels_len = ["<300", "300-600", "600-900", ">900"]
-    df["Length_Group"] = pd.cut(df[length_col], bins=bins, labels=labels_len, right=False)
 
-    metrics_list = []
-    for group_label in labels_len:
-        group = df[df["Length_Group"] == group_label]
-        if group.empty:
-            continue
-        metrics_cat = calc_metrics(group[true_col], group[pred_col])
-        metrics_cat["Length_Group"] = group_label
-        metrics_list.append(metrics_cat)
+def grouped_metrics_multi(codes, y_true, preds, group_labels):
+    """
+    多模型分组指标：真实值的组内秩只计算一次，在所有模型间复用。
 
-    metrics_df = pd.DataFrame(metrics_list)
+    参数
+    ----------
+    codes : np.ndarray
+        分组编号
+    y_true : np.ndarray
+        真实值
+    preds : dict
+        {模型名: 预测值数组}
+    group_labels : list
+        分组标签
 
-    # ===============================
-    # 标准化相关性指标
-    # ===============================
-    labels = ["Pearson", "Spearman", "R2", "CI"]
-    normalized_data = []
-    for _, row in metrics_df.iterrows():
-        values = [np.clip(row[label], 0, 1) for label in labels]
-        normalized_data.append(values)
+    返回
+    -------
+    metrics_df : pd.DataFrame
+        grouped_metrics 的结果按模型纵向拼接，增加 Model 列
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    y_true = np.asarray(y_true, dtype=float)
+    keep = (codes >= 0) & np.isfinite(y_true)
+    codes, y_true = codes[keep], y_true[keep]
+    true_ranks = group_ranks(codes, y_true, len(group_labels))
 
-    metrics_norm_df = pd.DataFrame(normalized_data, columns=labels, index=metrics_df["Length_Group"])
+    frames = []
+    for model, y_pred in preds.items():
+        y_pred = np.asarray(y_pred, dtype=float)[keep]
+        # 该模型存在缺失预测时行集合不同，不能复用共享秩
+        shared = true_ranks if np.isfinite(y_pred).all() else None
+        m = grouped_metrics(codes, y_true, y_pred, group_labels, true_ranks=shared)
+        m.insert(0, "Model", model)
+        frames.append(m)
+    return pd.concat(frames, ignore_index=True)
 
-    # ===============================
-    # 绘制雷达图
-    # ===============================
-    num_vars = len(labels)
-    angles = np.linspace(0, 2 * np.pi, num_vars, endpoint=False).tolist()
-    angles += angles[:1]
 
-    color_palette = ['#ED949A', '#B2A3DD', '#96CCEA', '#A4DDD3']
-    current_colors = {g: color_palette[i % len(color_palette)] for i, g in enumerate(labels_len)}
+# 雷达图配色与刻度
+RADAR_PALETTE = ['#ED949A', '#B2A3DD', '#96CCEA', '#A4DDD3']
+RADAR_METRICS = ["Pearson", "Spearman", "R2", "CI"]
 
-    fig, ax = plt.subplots(figsize=figsize, subplot_kw=dict(polar=True))
 
-    # 同心圆刻度
+def _radar_grid():
+    """同心圆刻度与最外层边框的线段，只计算一次，供所有子图复用。"""
+    theta = np.linspace(0, 2 * np.pi, 200)
     radii_levels = np.arange(0.2, 1.01, 0.2)
+    rings = [np.column_stack([theta, np.full_like(theta, r)]) for r in radii_levels]
+    border = np.column_stack([theta, np.ones_like(theta)])
+    return radii_levels, rings, border
+
+
+def _draw_radar(ax, norm_df, colors, grid, title=None):
+    """
+    在极坐标轴上绘制一组雷达多边形。
+
+    norm_df 的每一行是一条多边形（行索引为图例名称），列为 RADAR_METRICS。
+    """
+    labels = list(norm_df.columns)
+    angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
+    angles += angles[:1]
+    radii_levels, rings, border = grid
+
+    # 同心圆刻度（一个 LineCollection）
+    ax.add_collection(LineCollection(rings, linestyles='--', colors='gray', linewidths=0.8, alpha=0.8))
     for r in radii_levels:
-        ax.plot(np.linspace(0, 2*np.pi, 200), [r]*200, linestyle='--', color='gray', linewidth=0.8, alpha=0.8)
         ax.text(np.pi/2, r, f"{r:.1f}", fontsize=9, color='black', ha='center', va='bottom', fontfamily='Times New Roman')
 
-    # 绘制每个长度区间
-    for group_label in metrics_norm_df.index:
-        data = metrics_norm_df.loc[group_label].tolist()
-        data += data[:1]
-        color = current_colors[group_label]
-        ax.plot(angles, data, color=color, linewidth=1.8, label=group_label, zorder=2)
+    for name in norm_df.index:
+        values = norm_df.loc[name].tolist()
+        data = values + values[:1]
+        color = colors[name]
+        ax.plot(angles, data, color=color, linewidth=1.8, label=name, zorder=2)
         ax.fill(angles, data, color=color, alpha=0.15, zorder=1)
-        ax.scatter(angles[:-1], metrics_norm_df.loc[group_label], color=color, s=40, zorder=3)
+        ax.scatter(angles[:-1], values, color=color, s=40, zorder=3)
 
     ax.set_xticks(angles[:-1])
     ax.set_xticklabels(labels, fontsize=11, fontfamily='Times New Roman', weight='bold', color='black')
@@ -113,20 +436,171 @@ def plot_metrics_radar(csv_path, length_col, true_col, pred_col, figsize=(6,6),
     ax.set_yticklabels([])
 
     # 最外层边框
-    ax.plot(np.linspace(0, 2*np.pi, 200), [1]*200, color='black', linewidth=1.2)
+    ax.add_collection(LineCollection([border], colors='black', linewidths=1.2))
+
+    if norm_df.empty:
+        ax.text(0, 0, "No valid predictions", fontsize=11, color='gray', ha='center', va='center',
+                fontfamily='Times New Roman')
+
+    if title is not None:
+        ax.set_title(title, fontsize=12, fontfamily='Times New Roman', weight='bold', pad=30)
 
-    # 图例
-    group_patches = [mpatches.Patch(color=current_colors[g], alpha=0.6, label=g) for g in metrics_norm_df.index]
-    fig.legend(handles=group_patches,
-               loc='lower center', bbox_to_anchor=(0.5, 0.015),
-               frameon=False, ncol=2,
-               prop={'family': 'Times New Roman', 'weight': 'bold', 'size': 12})
 
-    plt.subplots_adjust(left=0.05, right=0.95, top=0.9, bottom=0.15)
-    plt.savefig(save_path, dpi=600)
-    # plt.show()
+@profiled
+def plot_metrics_radar(csv_path, length_col, true_col, pred_col, figsize=(6,6), save_path="metrics_radar.png",
+                       bins=None, labels=None, group_col=None,
+                       chunksize=None, n_rank_bins=128, value_range=None,
+                       layout="grid", ncols=None):
+    """
+    根据蛋白长度分组绘制预测指标雷达图。
 
-    return metrics_norm_df
+    参数:
+    ----------
+    csv_path : str or PredictionSet
+        表格文件路径（CSV / Parquet / Feather），必须包含蛋白长度、真实值和预测值列；
+        也可传入 PredictionSet（分组列从其 extra 中读取，true_col 被忽略，
+        pred_col 仅作模型名，为 None 时使用 PredictionSet.name）。
+    length_col : str
+        CSV 中蛋白长度列名。
+    true_col : str
+        CSV 中真实值列名。
+    pred_col : str or list[str]
+        CSV 中预测值列名；传入列表时一次读取、一次分组计算所有模型的指标，
+        并在同一张图中绘制多模型对比。
+    figsize : tuple, default (6,6)
+        图形尺寸（多模型时为每个子图的尺寸）。
+    save_path : str, default "metrics_radar.png"
+        保存文件路径。
+    bins : list, optional
+        自定义分箱边界（左闭右开），默认 [0, 300, 600, 900, ∞)。
+    labels : list, optional
+        分箱标签。
+    group_col : str, optional
+        类别分组列名，给定时按该列分组而不是按长度分箱。
+    chunksize : int, optional
+        给定时按块流式读取表格并在线累加指标（内存恒定），适用于超大文件；
+        此时 Spearman 由联合直方图近似计算。
+    n_rank_bins : int, default 128
+        流式模式下 Spearman 直方图分辨率。
+    value_range : tuple, optional
+        流式模式下真实值/预测值取值范围，不给定时先扫描一遍按抽样分位数分箱。
+    layout : str, default "grid"
+        多模型时的布局："grid" 每个模型一个雷达子图（多边形为长度分组）；
+        "overlay" 每个长度分组一个雷达子图（多边形为各模型叠加）。
+    ncols : int, optional
+        多模型时子图列数，默认取接近正方形的网格。
+
+    返回:
+    -------
+    metrics_norm_df : pd.DataFrame
+        标准化后的指标数据，按蛋白长度分组；多模型时索引为 (Model, Length_Group)。
+    """
+    if isinstance(csv_path, PredictionSet) and pred_col is None:
+        pred_col = csv_path.name or "Pred"
+    pred_cols = [pred_col] if isinstance(pred_col, str) else list(pred_col)
+    key_col = group_col if group_col is not None else length_col
+    if isinstance(csv_path, PredictionSet):
+        # ===============================
+        # 直接使用内存中的 PredictionSet（单模型）
+        # ===============================
+        ps = csv_path
+        codes, labels_len = group_codes(pd.DataFrame({key_col: ps.extra[key_col]}), length_col,
+                                        bins=bins, labels=labels, group_col=group_col)
+        metrics_df = grouped_metrics(codes, ps.y_true, ps.y_pred, labels_len)
+        metrics_df.insert(0, "Model", pred_col)
+    elif chunksize:
+        # ===============================
+        # 流式读取并在线累加（所有模型共用一次读取）
+        # ===============================
+        accumulators = accumulate_csv(csv_path, length_col, true_col, pred_cols, bins=bins, labels=labels,
+                                      group_col=group_col, chunksize=chunksize,
+                                      n_rank_bins=n_rank_bins, value_range=value_range)
+        frames = []
+        for model, acc in accumulators.items():
+            m = acc.result()
+            m.insert(0, "Model", model)
+            frames.append(m)
+        metrics_df = pd.concat(frames, ignore_index=True)
+        labels_len = accumulators[pred_cols[0]].group_labels
+    else:
+        # ===============================
+        # 读取数据（仅读取所需列，float32 / category）
+        # ===============================
+        df = read_table(csv_path, [key_col, true_col] + pred_cols)
+        mark("load")
+
+        # ===============================
+        # 分组并一次性计算全部分组指标
+        # ===============================
+        codes, labels_len = group_codes(df, length_col, bins=bins, labels=labels, group_col=group_col)
+        metrics_df = grouped_metrics_multi(codes, df[true_col].to_numpy(),
+                                           {c: df[c].to_numpy() for c in pred_cols}, labels_len)
+
+    # ===============================
+    # 标准化相关性指标
+    # ===============================
+    metrics_norm_df = metrics_df.set_index(["Model", "Length_Group"])[RADAR_METRICS].clip(0, 1)
+    present_models = set(metrics_norm_df.index.get_level_values(0))
+    if isinstance(pred_col, str) and pred_col not in present_models:
+        raise ValueError(f"模型 {pred_col} 没有有效预测值（全部为 NaN 或无有效分组）")
+    mark("stats")
+
+    # ===============================
+    # 绘制雷达图
+    # ===============================
+    with scoped_style():
+        grid = _radar_grid()
+        if isinstance(pred_col, str):
+            panels = [(None, metrics_norm_df.loc[pred_col])]
+            legend_names = labels_len
+            fig, ax = new_subplots(figsize=figsize, subplot_kw=dict(polar=True))
+            axes = [ax]
+        else:
+            if layout == "overlay":
+                # 每个分组一个子图，多边形为各模型
+                swapped = metrics_norm_df.swaplevel().sort_index(level=0, sort_remaining=False)
+                present = swapped.index.get_level_values(0)
+                panels = [(g, swapped.loc[g]) for g in labels_len if g in present]
+                legend_names = pred_cols
+            else:
+                # 没有有效预测值的模型保留空子图并标注，子图位置与 pred_col 顺序一致
+                empty = pd.DataFrame(columns=RADAR_METRICS, dtype=float)
+                panels = [(m, metrics_norm_df.loc[m] if m in present_models else empty) for m in pred_cols]
+                legend_names = labels_len
+            ncols = ncols or int(np.ceil(np.sqrt(len(panels))))
+            nrows = int(np.ceil(len(panels) / ncols))
+            fig, axes = new_subplots(nrows, ncols, figsize=(figsize[0] * ncols, figsize[1] * nrows),
+                                     subplot_kw=dict(polar=True), squeeze=False)
+            axes = axes.ravel()
+            for ax in axes[len(panels):]:
+                ax.set_visible(False)
+
+        palette = RADAR_PALETTE if len(legend_names) <= len(RADAR_PALETTE) else \
+            [matplotlib.colormaps["tab20"](i % 20) for i in range(len(legend_names))]
+        current_colors = {g: palette[i % len(palette)] for i, g in enumerate(legend_names)}
+        for ax, (title, norm_df) in zip(axes, panels):
+            _draw_radar(ax, norm_df, current_colors, grid, title=title)
+
+        # 图例
+        shown = [g for g in legend_names if any(g in p.index for _, p in panels)]
+        group_patches = [mpatches.Patch(color=current_colors[g], alpha=0.6, label=g) for g in shown]
+        fig.legend(handles=group_patches,
+                   loc='lower center', bbox_to_anchor=(0.5, 0.015),
+                   frameon=False, ncol=2 if len(axes) == 1 else min(len(shown), 6),
+                   prop={'family': 'Times New Roman', 'weight': 'bold', 'size': 12})
+
+        mark("artists")
+        if len(axes) == 1:
+            fig.subplots_adjust(left=0.05, right=0.95, top=0.9, bottom=0.15)
+        else:
+            # 标题与图例区域按英寸预留，避免子图数量变化时互相遮挡
+            height = fig.get_figheight()
+            fig.subplots_adjust(left=0.05, right=0.95, top=1 - 0.6 / height, bottom=1.0 / height,
+                                hspace=0.6, wspace=0.4)
+        mark("layout")
+        save_figure(fig, save_path, dpi=600)
+
+    return metrics_norm_df.loc[pred_col] if isinstance(pred_col, str) else metrics_norm_df
 
 # metrics_norm_df = plot_metrics_radar(
 #     csv_path="example_data.csv",
@@ -139,6 +613,21 @@ def plot_metrics_radar(csv_path, length_col, true_col, pred_col, figsize=(6,6),
 
 # print(metrics_norm_df)
 
+# # 自定义分箱边界，或按类别列分组
+# metrics_norm_df = plot_metrics_radar(
+#     csv_path="example_data.csv",
+#     length_col="Protein_Len",
+#     true_col="True",
+#     pred_col="Pred_fp",
+#     bins=[0, 200, 400, 800, 1600, np.inf],
+#     save_path="metrics_radar_bins.png"
+# )
+
+# # 超大文件：分块流式读取，多个分片的累加器可合并
+# acc = accumulate_csv("part_0.csv", "Protein_Len", "True", "Pred_fp", chunksize=1_000_000, value_range=(0, 15))
+# acc.merge(accumulate_csv("part_1.csv", "Protein_Len", "True", "Pred_fp", chunksize=1_000_000, value_range=(0, 15)))
+# print(acc.result())
+
 # Protein_Len,True,Pred_fp
 # 150,0.85,0.80
 # 210,0.90,0.88
@@ -148,3 +637,18 @@ def plot_metrics_radar(csv_path, length_col, true_col, pred_col, figsize=(6,6),
 # 850,0.70,0.68
 # 1000,0.95,0.92
 # 1200,0.80,0.82
+
+# # 多模型对比：一次读取、一次分组，15 个模型绘制在同一张图中
+# metrics_norm_df = plot_metrics_radar(
+#     csv_path="example_data.csv",
+#     length_col="Protein_Len",
+#     true_col="True",
+#     pred_col=["Pred_fp", "Pred_gnn", "Pred_seq"],
+#     figsize=(3.5, 3.5),
+#     layout="grid",        # 或 "overlay"
+#     save_path="metrics_radar_models.png"
+# )
+
+# # 已在内存中的 PredictionSet：与其他诊断图共用同一份数组
+# ps = PredictionSet.from_csv("example_data.csv", "True", "Pred_fp", extra_cols=["Protein_Len"])
+# metrics_norm_df = plot_metrics_radar(ps, "Protein_Len", None, None, save_path="metrics_radar_ps.png")
@@ -1,39 +1,46 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import matplotlib
 import numpy as np
 from matplotlib.patches import Wedge, Circle
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
+from table_io import read_table
 
 # ================================
 # 设置绘图参数（顶刊风格）
 # ================================
+PLOT_STYLE_RC = {
+    'font.family': 'times new roman',
+    'font.size': 10,
+    'axes.labelsize': 10,
+    'axes.titlesize': 10,
+    'xtick.labelsize': 8,
+    'ytick.labelsize': 8,
+    'figure.dpi': 600,
+    'savefig.dpi': 600,
+    'axes.unicode_minus': False,
+    'mathtext.fontset': 'custom',
+    'mathtext.rm': 'Arial',
+    'mathtext.it': 'Arial:italic',
+    'mathtext.bf': 'Arial:bold'
+}
+
+
 def set_plot_style():
-    plt.rcParams.update({
-        'font.family': 'times new roman',
-        'font.size': 10,
-        'axes.labelsize': 10,
-        'axes.titlesize': 10,
-        'xtick.labelsize': 8,
-        'ytick.labelsize': 8,
-        'figure.dpi': 600,
-        'savefig.dpi': 600,
-        'axes.unicode_minus': False,
-        'mathtext.fontset': 'custom',
-        'mathtext.rm': 'Arial',
-        'mathtext.it': 'Arial:italic',
-        'mathtext.bf': 'Arial:bold'
-    })
+    """全局应用顶刊风格（会影响之后的所有图）；绘图函数内部只在作用域内临时应用。"""
+    matplotlib.rcParams.update(PLOT_STYLE_RC)
 
 # ================================
 # 绘制混合相关性热图函数
 # ================================
+@profiled
 def plot_mixed_correlation_heatmap(
         csv_file: str,
         save_path: str = 'correlation_mixed_RdBu.jpg',
         figsize: tuple = (10, 8),
         cmap_name: str = 'RdBu_r',
         show_values: bool = True,
-        select_columns: list = None):
+        select_columns: list = None,
+        show: bool = False):
     """
     绘制混合型相关性热图（左下三角扇形、右上三角气泡+数值、对角线固定1.0）
 
@@ -52,7 +59,7 @@ def plot_mixed_correlation_heatmap(
     参数:
     ----------
     csv_file : str
-        CSV 文件路径
+        表格文件路径（CSV / Parquet / Feather，见 table_io）
     save_path : str
         保存图像路径（支持 .jpg, .png 等格式）
     figsize : tuple
@@ -63,98 +70,106 @@ def plot_mixed_correlation_heatmap(
         是否在右上三角显示数值
     select_columns : list or None
         如果只想绘制部分特征，可传入列名列表。默认 None 表示使用全部特征。
+    show : bool
+        保存后是否弹出窗口显示
 
     返回:
     ----------
     correlation_matrix : pd.DataFrame
         计算得到的皮尔森相关系数矩阵
     """
-    set_plot_style()
+    import seaborn as sns
+    mark("import")
 
-    # 读取数据
-    df = pd.read_csv(csv_file, encoding='utf-8')
-    if select_columns is not None:
-        df = df[select_columns]
+    # 读取数据（给定 select_columns 时只读取这些列；float32 读入，相关系数按 float64 计算）
+    df = read_table(csv_file, select_columns)
+    mark("load")
 
     feature = df  # 可根据需求筛选列
 
     # 计算相关系数矩阵
     correlation_matrix = feature.corr(method='pearson')
     correlation_matrix.to_csv('correlation_matrix_RdBu.csv', index=True)
+    mark("stats")
 
     # 绘图
-    fig, ax = plt.subplots(figsize=figsize)
-    cmap = plt.get_cmap(cmap_name)
-
-    # 绘制空热图以生成坐标和颜色条
-    sns.heatmap(
-        np.zeros_like(correlation_matrix),
-        cmap=cmap,
-        annot=False,
-        square=True,
-        cbar_kws={
-            "shrink": 0.8,
-            "label": "Pearson correlation coefficient",
-            "ticks": np.arange(-1, 1.1, 0.5)
-        },
-        vmin=-1, vmax=1,
-        ax=ax
-    )
-
-    n = len(correlation_matrix)
-    for i in range(n):
-        for j in range(n):
-            value = correlation_matrix.iloc[i, j]
-            color = cmap((value + 1)/2)
-            brightness = color[0]*0.299 + color[1]*0.587 + color[2]*0.114
-            text_color = 'white' if brightness < 0.6 else 'black'
-
-            # 左下三角：扇形
-            if i > j:
-                outline = Circle((j+0.5, i+0.5), 0.4, facecolor='none',
-                                 edgecolor='gray', linewidth=0.8)
-                ax.add_patch(outline)
-                angle = 360 * abs(value)
-                if value >= 0:
-                    wedge = Wedge((j+0.5, i+0.5), 0.4, 270, 270+angle,
-                                  facecolor=color, edgecolor='black', linewidth=0.5)
+    with scoped_style(PLOT_STYLE_RC):
+        fig, ax = new_subplots(figsize=figsize, show=show)
+        cmap = matplotlib.colormaps[cmap_name]
+
+        # 绘制空热图以生成坐标和颜色条
+        sns.heatmap(
+            np.zeros_like(correlation_matrix),
+            cmap=cmap,
+            annot=False,
+            square=True,
+            cbar_kws={
+                "shrink": 0.8,
+                "label": "Pearson correlation coefficient",
+                "ticks": np.arange(-1, 1.1, 0.5)
+            },
+            vmin=-1, vmax=1,
+            ax=ax
+        )
+
+        n = len(correlation_matrix)
+        for i in range(n):
+            for j in range(n):
+                value = correlation_matrix.iloc[i, j]
+                color = cmap((value + 1)/2)
+                brightness = color[0]*0.299 + color[1]*0.587 + color[2]*0.114
+                text_color = 'white' if brightness < 0.6 else 'black'
+
+                # 左下三角：扇形
+                if i > j:
+                    outline = Circle((j+0.5, i+0.5), 0.4, facecolor='none',
+                                     edgecolor='gray', linewidth=0.8)
+                    ax.add_patch(outline)
+                    angle = 360 * abs(value)
+                    if value >= 0:
+                        wedge = Wedge((j+0.5, i+0.5), 0.4, 270, 270+angle,
+                                      facecolor=color, edgecolor='black', linewidth=0.5)
+                    else:
+                        wedge = Wedge((j+0.5, i+0.5), 0.4, 90, 90+angle,
+                                      facecolor=color, edgecolor='black', linewidth=0.5)
+                    ax.add_patch(wedge)
+
+                # 右上三角：气泡 + 数值
+                elif i < j:
+                    bubble = Circle((j+0.5, i+0.5), 0.4,
+                                    facecolor=color, edgecolor='gray', linewidth=0.8)
+                    ax.add_patch(bubble)
+                    if show_values:
+                        ax.text(j+0.5, i+0.5, f"{value:.2f}", ha='center', va='center',
+                                fontsize=10, color=text_color)
+
+                # 对角线：固定显示1.0
                 else:
-                    wedge = Wedge((j+0.5, i+0.5), 0.4, 90, 90+angle,
-                                  facecolor=color, edgecolor='black', linewidth=0.5)
-                ax.add_patch(wedge)
-
-            # 右上三角：气泡 + 数值
-            elif i < j:
-                bubble = Circle((j+0.5, i+0.5), 0.4,
-                                facecolor=color, edgecolor='gray', linewidth=0.8)
-                ax.add_patch(bubble)
-                if show_values:
-                    ax.text(j+0.5, i+0.5, f"{value:.2f}", ha='center', va='center',
-                            fontsize=10, color=text_color)
-
-            # 对角线：固定显示1.0
-            else:
-                diag_value = 1.0
-                diag_color = cmap((diag_value + 1)/2)
-                bubble = Circle((j+0.5, i+0.5), 0.4,
-                                facecolor=diag_color, edgecolor='gray', linewidth=0.8)
-                ax.add_patch(bubble)
-                ax.text(j+0.5, i+0.5, f"{diag_value:.2f}", ha='center', va='center',
-                        fontsize=10, color='white')
-
-    # 坐标标签
-    ax.set_xticklabels(correlation_matrix.columns, rotation=45, ha='right')
-    ax.set_yticklabels(correlation_matrix.columns, rotation=0)
-
-    # 网格线
-    for x in range(n+1):
-        ax.axhline(x, color='white', linewidth=0.5)
-        ax.axvline(x, color='white', linewidth=0.5)
-
-    plt.tight_layout()
-    plt.savefig(save_path, dpi=600, bbox_inches='tight', pil_kwargs={'optimize': True})
-    print(f"热图已保存为 {save_path} (600dpi)")
-    plt.show()
+                    diag_value = 1.0
+                    diag_color = cmap((diag_value + 1)/2)
+                    bubble = Circle((j+0.5, i+0.5), 0.4,
+                                    facecolor=diag_color, edgecolor='gray', linewidth=0.8)
+                    ax.add_patch(bubble)
+                    ax.text(j+0.5, i+0.5, f"{diag_value:.2f}", ha='center', va='center',
+                            fontsize=10, color='white')
+
+        # 坐标标签
+        ax.set_xticklabels(correlation_matrix.columns, rotation=45, ha='right')
+        ax.set_yticklabels(correlation_matrix.columns, rotation=0)
+
+        # 网格线
+        for x in range(n+1):
+            ax.axhline(x, color='white', linewidth=0.5)
+            ax.axvline(x, color='white', linewidth=0.5)
+
+        mark("artists")
+
+        fig.tight_layout()
+
+        mark("layout")
+        save_figure(fig, save_path, dpi=600, bbox_inches='tight', pil_kwargs={'optimize': True})
+        print(f"热图已保存为 {save_path} (600dpi)")
+        save_figure(fig, show=show)
 
     return correlation_matrix
 
@@ -0,0 +1,127 @@
+import importlib
+import inspect
+import os
+
+# =========================================================
+# 🧩【绘图函数注册表】—— 函数名 → 所在模块与输出路径参数
+# =========================================================
+# outputs 为保存路径所在的参数名；"config.output_file" 表示 config 字典中的键。
+# 模块按需导入，只读取注册表不会加载 matplotlib / seaborn / scipy。
+PLOT_FUNCTIONS = {
+    "plot_cetsa_curve": {"module": "CETSA_curve", "outputs": ["save_path"]},
+    "plot_tpp2d_heatmap": {"module": "CETSA_curve", "outputs": ["save_path"]},
+    "plot_rmsd": {"module": "gmx_rmsd_plot", "outputs": ["config.output_file"]},
+    "plot_heatmap_with_colorbar": {"module": "heatmap", "outputs": ["heatmap_file", "colorbar_file"]},
+    "plot_colorbar": {"module": "heatmap", "outputs": ["colorbar_file"]},
+    "plot_bar_chart": {"module": "hist", "outputs": ["save_path"]},
+    "plot_grouped_bar_chart": {"module": "hist", "outputs": ["save_path"]},
+    "plot_bar_chart_from_table": {"module": "hist", "outputs": ["save_path"]},
+    "plot_metrics_radar": {"module": "metrics_radar", "outputs": ["save_path"]},
+    "plot_mixed_correlation_heatmap": {"module": "mixed_corr_heatmap", "outputs": ["save_path"]},
+    "plot_pred_vs_true": {"module": "plot_pred_vs_true_slope_bias_histograms", "outputs": ["save_path"]},
+    "plot_residual_hist": {"module": "plot_residual_hist", "outputs": ["save_path"]},
+    "plot_residual_scatter": {"module": "plot_residual_scatter", "outputs": ["save_path"]},
+    "plot_sorted_curve": {"module": "plot_sorted_curve", "outputs": ["save_path"]},
+    "plot_spearman_ranking": {"module": "ranking_spearman", "outputs": ["save_path"]},
+}
+
+
+def get_plot_function(name):
+    """按函数名导入并返回绘图函数。"""
+    if name not in PLOT_FUNCTIONS:
+        raise KeyError(f"未注册的绘图函数: {name}（可选: {', '.join(sorted(PLOT_FUNCTIONS))}）")
+    module = importlib.import_module(PLOT_FUNCTIONS[name]["module"])
+    return getattr(module, name)
+
+
+def output_paths(name, kwargs):
+    """
+    从调用参数中取出该函数会写入的文件路径（未指定的输出参数会被跳过）。
+
+    参数
+    ----------
+    name : str
+        绘图函数名
+    kwargs : dict
+        调用参数
+
+    返回
+    -------
+    paths : list[str]
+    """
+    paths = []
+    for key in PLOT_FUNCTIONS[name]["outputs"]:
+        value = kwargs
+        for part in key.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is not None:
+            paths.append(value)
+    return paths
+
+
+def with_default_outputs(name, kwargs):
+    """
+    返回补全输出路径后的参数字典：未显式给出的输出参数使用函数签名中的默认值。
+    """
+    params = inspect.signature(get_plot_function(name)).parameters
+    kwargs = dict(kwargs)
+    for out in PLOT_FUNCTIONS[name]["outputs"]:
+        if "." not in out and out not in kwargs and out in params \
+                and params[out].default is not inspect.Parameter.empty:
+            kwargs[out] = params[out].default
+    return kwargs
+
+
+def replace_outputs(name, kwargs, new_path):
+    """
+    返回输出路径参数被替换后的新参数字典（不修改原字典）。
+
+    参数
+    ----------
+    name : str
+        绘图函数名
+    kwargs : dict
+        调用参数
+    new_path : callable
+        new_path(输出参数名, 原路径或 None) → 新路径
+
+    返回
+    -------
+    kwargs : dict
+        替换后的调用参数
+    paths : dict
+        输出参数名 → 新路径
+    """
+    kwargs = dict(kwargs)
+    paths = {}
+    for key in PLOT_FUNCTIONS[name]["outputs"]:
+        parent, *rest = key.split(".")
+        if rest:
+            old = (kwargs.get(parent) or {}).get(rest[0])
+            path = new_path(key, old)
+            kwargs[parent] = {**(kwargs.get(parent) or {}), rest[0]: path}
+        else:
+            path = new_path(key, kwargs.get(parent))
+            kwargs[parent] = path
+        paths[key] = path
+    return kwargs, paths
+
+
+def redirect_outputs(name, kwargs, directory, fmt="png"):
+    """
+    将所有输出路径改写到 directory 下，文件名为输出参数名，扩展名为 fmt。
+
+    返回
+    -------
+    kwargs : dict
+        改写后的调用参数
+    paths : dict
+        输出参数名 → 文件路径
+    """
+    return replace_outputs(name, kwargs, lambda key, _: os.path.join(directory, f"{key.replace('.', '_')}.{fmt}"))
+
+
+def plot_modules(names=None):
+    """返回给定函数（默认全部）所在的模块名，去重并保持顺序。"""
+    names = PLOT_FUNCTIONS if names is None else names
+    return list(dict.fromkeys(PLOT_FUNCTIONS[n]["module"] for n in names))
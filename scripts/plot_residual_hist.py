@@ -1,9 +1,11 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from matplotlib.ticker import MultipleLocator
+from prediction_set import as_prediction_set
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
 
-def plot_residual_hist(y_true, y_pred, save_path="residual_hist.png",
+@profiled
+def plot_residual_hist(y_true, y_pred=None, save_path="residual_hist.png",
                        hist_color="royalblue", kde_color="peachpuff", hist_alpha=0.6,
                        bins=40, line_color="gray", line_style="--", line_width=2,
                        figsize=(7,6), title="Residual Distribution",
@@ -14,9 +16,9 @@ def plot_residual_hist(y_true, y_pred, save_path="residual_hist.png",
 
     参数
     ----------
-    y_true : np.ndarray
-        真实值数组
-    y_pred : np.ndarray
+    y_true : np.ndarray or PredictionSet
+        真实值数组；也可直接传入 PredictionSet（此时忽略 y_pred，复用其缓存的派生量）
+    y_pred : np.ndarray, optional
         预测值数组
     save_path : str
         保存图像路径
@@ -49,32 +51,37 @@ def plot_residual_hist(y_true, y_pred, save_path="residual_hist.png",
     title_size : int
         标题字体大小
     """
-    residuals = y_pred - y_true
+    import seaborn as sns
+    mark("import")
 
-    plt.figure(figsize=figsize)
-    sns.histplot(residuals, bins=bins, kde=True, color=hist_color, alpha=hist_alpha,
-                 line_kws={"color": kde_color, "lw": 2})
-    plt.axvline(0, color=line_color, linestyle=line_style, lw=line_width)
+    residuals = as_prediction_set(y_true, y_pred).residuals
+    mark("stats")
 
-    plt.title(title, fontsize=title_size, fontweight="bold")
-    ax = plt.gca()
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
+    with scoped_style():
+        fig, ax = new_subplots(figsize=figsize)
+        sns.histplot(residuals, bins=bins, kde=True, color=hist_color, alpha=hist_alpha,
+                     line_kws={"color": kde_color, "lw": 2}, ax=ax)
+        ax.axvline(0, color=line_color, linestyle=line_style, lw=line_width)
 
-    # 设置刻度间隔
-    if xtick_step is not None:
-        ax.xaxis.set_major_locator(MultipleLocator(xtick_step))
-    if ytick_step is not None:
-        ax.yaxis.set_major_locator(MultipleLocator(ytick_step))
+        ax.set_title(title, fontsize=title_size, fontweight="bold")
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
 
-    # 设置刻度字体大小
-    ax.tick_params(axis='x', labelsize=xtick_labelsize)
-    ax.tick_params(axis='y', labelsize=ytick_labelsize)
+        # 设置刻度间隔
+        if xtick_step is not None:
+            ax.xaxis.set_major_locator(MultipleLocator(xtick_step))
+        if ytick_step is not None:
+            ax.yaxis.set_major_locator(MultipleLocator(ytick_step))
 
-    plt.grid(False)
-    plt.tight_layout()
-    plt.savefig(save_path, dpi=300)
-    plt.close()
+        # 设置刻度字体大小
+        ax.tick_params(axis='x', labelsize=xtick_labelsize)
+        ax.tick_params(axis='y', labelsize=ytick_labelsize)
+
+        ax.grid(False)
+        mark("artists")
+        fig.tight_layout()
+        mark("layout")
+        save_figure(fig, save_path, dpi=300)
 
 # import numpy as np
 # import pandas as pd
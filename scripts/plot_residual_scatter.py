@@ -1,20 +1,30 @@
 import numpy as np
-import matplotlib.pyplot as plt
+from group_stats import bin_codes, group_quantiles
+from prediction_set import as_prediction_set
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
 
-def plot_residual_scatter(y_true, y_pred, save_path="residual_scatter.png",
+@profiled
+def plot_residual_scatter(y_true, y_pred=None, save_path="residual_scatter.png",
                           scatter_color="#72B6A1", scatter_alpha=0.7, scatter_size=40,
                           scatter_edgecolor="k", scatter_linewidth=0.6,
                           line_color="#D47B3B", line_style="--", line_width=2,
                           figsize=(7,6), title="Residual Plot",
-                          xtick_labelsize=18, ytick_labelsize=18):
+                          xtick_labelsize=18, ytick_labelsize=18,
+                          mode="scatter", bins=30, band_color=None,
+                          show_points=True, max_points=2000, random_state=0):
     """
     绘制残差散点图（Residuals = Pred - True）。
 
+    mode="binned" 时按 y_true 分箱，一次排序计算每箱残差的中位数、IQR、
+    5/95 分位数和样本数，以条带形式绘制，可叠加下采样后的散点层；
+    绘图开销只与分箱数和 max_points 有关，与样本量无关。
+
     参数
     ----------
-    y_true : np.ndarray
-        真实值数组
-    y_pred : np.ndarray
+    y_true : np.ndarray or PredictionSet
+        真实值数组；也可直接传入 PredictionSet（此时忽略 y_pred，复用其缓存的派生量）
+    y_pred : np.ndarray, optional
         预测值数组
     save_path : str
         保存图像路径
@@ -42,27 +52,107 @@ def plot_residual_scatter(y_true, y_pred, save_path="residual_scatter.png",
         x轴刻度字体大小
     ytick_labelsize : int
         y轴刻度字体大小
+    mode : str
+        "scatter" 绘制全部散点；"binned" 绘制分箱残差统计条带
+    bins : int or array-like
+        binned 模式下的分箱数或分箱边界
+    band_color : str, optional
+        条带和中位数曲线颜色，默认与散点颜色一致
+    show_points : bool
+        binned 模式下是否叠加下采样散点层
+    max_points : int
+        下采样散点层的最大点数
+    random_state : int
+        下采样随机种子
+
+    返回
+    -------
+    stats : dict or None
+        binned 模式下返回每箱统计量（center, median, q25, q75, q05, q95, count），
+        scatter 模式返回 None
     """
-    residuals = y_pred - y_true
+    if mode not in ("scatter", "binned"):
+        raise ValueError(f"未知的绘图模式: {mode}（可选: scatter, binned）")
+    ps = as_prediction_set(y_true, y_pred)
+    y_true, residuals = ps.y_true, ps.residuals
+    stats = None
+    mark("stats")
+
+    with scoped_style():
+        fig, ax = new_subplots(figsize=figsize)
+        if mode == "binned":
+            stats = binned_residual_stats(y_true, residuals, bins=bins, binning=ps.true_bins(bins))
+            mark("stats")
+            band_color = band_color or scatter_color
+
+            # 下采样散点层
+            if show_points:
+                n = len(y_true)
+                rng = np.random.default_rng(random_state)
+                idx = rng.choice(n, size=min(max_points, n), replace=False)
+                ax.scatter(y_true[idx], residuals[idx], alpha=min(scatter_alpha, 0.3),
+                           s=scatter_size * 0.25, color=scatter_color, linewidth=0)
+
+            # 分位数条带 + 中位数曲线（跳过空分箱）
+            ok = stats["count"] > 0
+            x = stats["center"][ok]
+            ax.fill_between(x, stats["q05"][ok], stats["q95"][ok], color=band_color,
+                            alpha=0.2, linewidth=0, label="5-95%")
+            ax.fill_between(x, stats["q25"][ok], stats["q75"][ok], color=band_color,
+                            alpha=0.45, linewidth=0, label="IQR")
+            ax.plot(x, stats["median"][ok], color=band_color, lw=2, marker="o",
+                    markersize=3, label="Median")
+            ax.legend(frameon=False)
+        else:
+            ax.scatter(y_true, residuals, alpha=scatter_alpha, s=scatter_size,
+                       edgecolor=scatter_edgecolor, linewidth=scatter_linewidth,
+                       color=scatter_color)
+        ax.axhline(0, color=line_color, linestyle=line_style, lw=line_width)
+
+        ax.set_title(title, fontsize=16, fontweight="bold")
+        ax.tick_params(axis='x', labelsize=xtick_labelsize)
+        ax.tick_params(axis='y', labelsize=ytick_labelsize)
+
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
 
-    plt.figure(figsize=figsize)
-    plt.scatter(y_true, residuals, alpha=scatter_alpha, s=scatter_size,
-                edgecolor=scatter_edgecolor, linewidth=scatter_linewidth,
-                color=scatter_color)
-    plt.axhline(0, color=line_color, linestyle=line_style, lw=line_width)
+        ax.grid(False)
+        mark("artists")
+        fig.tight_layout()
+        mark("layout")
+        save_figure(fig, save_path, dpi=300)
 
-    plt.title(title, fontsize=16, fontweight="bold")
-    plt.tick_params(axis='x', labelsize=xtick_labelsize)
-    plt.tick_params(axis='y', labelsize=ytick_labelsize)
+    return stats
 
-    ax = plt.gca()
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
 
-    plt.grid(False)
-    plt.tight_layout()
-    plt.savefig(save_path, dpi=300)
-    plt.close()
+def binned_residual_stats(y_true, residuals, bins=30, binning=None):
+    """
+    按 y_true 分箱计算残差统计量（一次排序完成，无逐箱循环）。
+
+    参数
+    ----------
+    y_true : np.ndarray
+        真实值数组
+    residuals : np.ndarray
+        残差数组（Pred - True）
+    bins : int or array-like
+        分箱数或分箱边界
+    binning : tuple, optional
+        预先计算好的 (codes, edges)，如 PredictionSet.true_bins(bins)；给定时忽略 bins
+
+    返回
+    -------
+    stats : dict
+        center / median / q25 / q75 / q05 / q95 / count，每项长度为分箱数
+    """
+    codes, edges = bin_codes(y_true, bins) if binning is None else binning
+    n_bins = len(edges) - 1
+    qs, counts = group_quantiles(codes, residuals, n_bins, [0.5, 0.25, 0.75, 0.05, 0.95])
+    return {
+        "center": 0.5 * (edges[:-1] + edges[1:]),
+        "median": qs[0], "q25": qs[1], "q75": qs[2], "q05": qs[3], "q95": qs[4],
+        "count": counts,
+    }
 
 # import numpy as np
 # import pandas as pd
@@ -76,6 +166,10 @@ def plot_residual_scatter(y_true, y_pred, save_path="residual_scatter.png",
 
 # plot_residual_scatter(y_true, y_pred, save_path="residual_scatter_example.png")
 
+# # 大样本：分箱残差统计条带 + 下采样散点
+# stats = plot_residual_scatter(y_true, y_pred, save_path="residual_binned_example.png",
+#                               mode="binned", bins=40, max_points=3000)
+
 # ID,True,Pred
 # 1,3.0,2.8
 # 2,5.0,5.2
@@ -1,21 +1,30 @@
 import numpy as np
-import matplotlib.pyplot as plt
+from group_stats import group_quantiles
+from prediction_set import as_prediction_set
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
 
-def plot_sorted_curve(y_true, y_pred, save_path="sorted_curve.png",
+@profiled
+def plot_sorted_curve(y_true, y_pred=None, save_path="sorted_curve.png",
                       true_color="#D47B3B", pred_color="#72B6A1",
                       true_marker="o", pred_marker="s",
                       true_linewidth=2, pred_linewidth=1,
                       true_markersize=2, pred_markersize=2,
                       figsize=(8,6), title="Sorted True vs Predicted",
-                      xtick_labelsize=18, ytick_labelsize=18):
+                      xtick_labelsize=18, ytick_labelsize=18,
+                      mode="line", n_buckets=None, dpi=300):
     """
     绘制按真实值排序后的真实值与预测值曲线。
 
+    mode="envelope" 时不再逐点绘制，而是把按真实值排名后的序列压缩为
+    n_buckets 个排名区间（默认每个像素列一个区间），绘制预测值的
+    min/max 包络、5-95% 与 IQR 分位数条带及中位数曲线，大样本下绘图开销恒定。
+
     参数
     ----------
-    y_true : np.ndarray
-        真实值数组
-    y_pred : np.ndarray
+    y_true : np.ndarray or PredictionSet
+        真实值数组；也可直接传入 PredictionSet（此时忽略 y_pred，复用其缓存的派生量）
+    y_pred : np.ndarray, optional
         预测值数组
     save_path : str
         保存图像路径
@@ -43,28 +52,120 @@ def plot_sorted_curve(y_true, y_pred, save_path="sorted_curve.png",
         x轴刻度字体大小
     ytick_labelsize : int
         y轴刻度字体大小
+    mode : str
+        "line" 逐点绘制；"envelope" 绘制按排名区间汇总的包络/分位数条带
+    n_buckets : int, optional
+        envelope 模式的排名区间数，默认取图宽像素数 figsize[0] * dpi
+    dpi : int
+        保存分辨率
+
+    返回
+    -------
+    envelope : dict or None
+        envelope 模式下返回每个排名区间的统计量，line 模式返回 None
+    """
+    if mode not in ("line", "envelope"):
+        raise ValueError(f"未知的绘图模式: {mode}（可选: line, envelope）")
+    ps = as_prediction_set(y_true, y_pred)
+    y_true, y_pred = ps.y_true, ps.y_pred
+    envelope = None
+
+    with scoped_style():
+        fig, ax = new_subplots(figsize=figsize)
+        if mode == "envelope":
+            if n_buckets is None:
+                n_buckets = int(figsize[0] * dpi)
+            # 完整排序缓存在 PredictionSet 中，line 模式与后续调用可复用
+            envelope = sorted_envelope(y_true, y_pred, n_buckets, order=ps.true_order)
+            mark("stats")
+            x = envelope["rank"]
+            ax.fill_between(x, envelope["min"], envelope["max"], color=pred_color,
+                            alpha=0.15, linewidth=0, label="Pred min-max")
+            ax.fill_between(x, envelope["q05"], envelope["q95"], color=pred_color,
+                            alpha=0.3, linewidth=0, label="Pred 5-95%")
+            ax.fill_between(x, envelope["q25"], envelope["q75"], color=pred_color,
+                            alpha=0.5, linewidth=0, label="Pred IQR")
+            ax.plot(x, envelope["median"], color=pred_color, lw=pred_linewidth, label="Pred")
+            ax.plot(x, envelope["true"], color=true_color, lw=true_linewidth, label="True")
+        else:
+            sorted_idx = ps.true_order
+            ax.plot(y_true[sorted_idx], label="True", marker=true_marker, color=true_color,
+                    lw=true_linewidth, markersize=true_markersize)
+            ax.plot(y_pred[sorted_idx], label="Pred", marker=pred_marker, color=pred_color,
+                    lw=pred_linewidth, markersize=pred_markersize)
+
+        ax.set_title(title, fontsize=16, fontweight="bold")
+        ax.tick_params(axis='x', labelsize=xtick_labelsize)
+        ax.tick_params(axis='y', labelsize=ytick_labelsize)
+        ax.legend()
+
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+
+        ax.grid(False)
+        mark("artists")
+        fig.tight_layout()
+        mark("layout")
+        save_figure(fig, save_path, dpi=dpi)
+
+    return envelope
+
+
+# 划分点不超过此数时用 argpartition，否则完整排序
+ARGPARTITION_MAX_KTH = 16
+
+
+def sorted_envelope(y_true, y_pred, n_buckets, order=None):
     """
-    sorted_idx = np.argsort(y_true)
+    将按真实值排序后的序列压缩为排名区间统计量。
 
-    plt.figure(figsize=figsize)
-    plt.plot(y_true[sorted_idx], label="True", marker=true_marker, color=true_color,
-             lw=true_linewidth, markersize=true_markersize)
-    plt.plot(y_pred[sorted_idx], label="Pred", marker=pred_marker, color=pred_color,
-             lw=pred_linewidth, markersize=pred_markersize)
+    按真实值排序一次后按排名切分区间，再对各区间内的预测值做一次分组分位数计算。
+    区间数很少时改用 np.argpartition 只在区间边界处划分；区间数多时（默认每个
+    像素列一个区间）多点划分比一次完整排序更慢。
+
+    参数
+    ----------
+    y_true : np.ndarray
+        真实值数组
+    y_pred : np.ndarray
+        预测值数组
+    n_buckets : int
+        排名区间数
+    order : np.ndarray, optional
+        已有的真实值完整排序索引（如 PredictionSet.true_order），给定时不再排序
 
-    plt.title(title, fontsize=16, fontweight="bold")
-    plt.tick_params(axis='x', labelsize=xtick_labelsize)
-    plt.tick_params(axis='y', labelsize=ytick_labelsize)
-    plt.legend()
+    返回
+    -------
+    envelope : dict
+        rank（区间中心排名）/ true（区间内真实值中位数）/ min / max /
+        q05 / q25 / median / q75 / q95
+    """
+    n = len(y_true)
+    n_buckets = max(1, min(int(n_buckets), n))
+    bounds = np.linspace(0, n, n_buckets + 1).astype(np.intp)
 
-    ax = plt.gca()
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
+    # 区间内部无需有序（group_quantiles 按组处理），只需区间之间按排名划分
+    kth = bounds[1:-1]
+    fully_sorted = order is not None or len(kth) > ARGPARTITION_MAX_KTH
+    if order is None:
+        order = np.argsort(y_true) if fully_sorted else np.argpartition(y_true, kth)
+    codes = np.repeat(np.arange(n_buckets), np.diff(bounds))
 
-    plt.grid(False)
-    plt.tight_layout()
-    plt.savefig(save_path, dpi=300)
-    plt.close()
+    qs = [0.0, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0]
+    pred_q, _ = group_quantiles(codes, y_pred[order], n_buckets, qs)
+    if fully_sorted:
+        # 区间内真实值已有序，中位数直接按位置取
+        sorted_true = y_true[order]
+        mid = (bounds[:-1] + bounds[1:] - 1) / 2
+        true_median = 0.5 * (sorted_true[np.floor(mid).astype(np.intp)] + sorted_true[np.ceil(mid).astype(np.intp)])
+    else:
+        true_median = group_quantiles(codes, y_true[order], n_buckets, [0.5])[0][0]
+    return {
+        "rank": 0.5 * (bounds[:-1] + bounds[1:] - 1),
+        "true": true_median,
+        "min": pred_q[0], "q05": pred_q[1], "q25": pred_q[2], "median": pred_q[3],
+        "q75": pred_q[4], "q95": pred_q[5], "max": pred_q[6],
+    }
 
 # import numpy as np
 # import pandas as pd
@@ -77,6 +178,10 @@ def plot_sorted_curve(y_true, y_pred, save_path="sorted_curve.png",
 
 # plot_sorted_curve(y_true, y_pred, save_path="sorted_curve_example.png")
 
+# # 大样本：按排名区间绘制预测值包络
+# envelope = plot_sorted_curve(y_true, y_pred, save_path="sorted_envelope_example.png",
+#                              mode="envelope", n_buckets=500)
+
 # ID,True,Pred
 # 1,3.0,2.8
 # 2,5.0,5.2
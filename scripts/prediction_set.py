@@ -0,0 +1,160 @@
+import numpy as np
+
+from group_stats import bin_codes, finite_range, group_ranks
+
+# =========================================================
+# 🧩【数据容器】—— 一个模型的预测结果及其派生量（惰性计算、只算一次）
+# =========================================================
+
+class PredictionSet:
+    """
+    回归诊断图共用的列式数据容器。
+
+    y_true / y_pred 以连续的 float64 数组保存；残差、排序索引、秩、取值范围、
+    线性拟合、类别编号等派生量在首次访问时计算并缓存，之后所有绘图函数直接复用，
+    同一模型的全部诊断图对每个数组只遍历一次。
+
+    参数
+    ----------
+    y_true : array-like
+        真实值
+    y_pred : array-like
+        预测值
+    categories : array-like, optional
+        样本类别标签（plot_pred_vs_true 着色用）
+    extra : dict, optional
+        其他与样本一一对应的列（如蛋白长度），供 plot_metrics_radar 分组
+    name : str, optional
+        模型名称
+
+    示例
+    ----------
+    ps = PredictionSet.from_csv("example.csv", "True", "Pred", extra_cols=["Protein_Len"])
+    plot_residual_hist(ps)
+    plot_residual_scatter(ps, mode="binned")
+    plot_sorted_curve(ps)
+    """
+
+    __slots__ = ("y_true", "y_pred", "categories", "extra", "name", "_cache")
+
+    def __init__(self, y_true, y_pred, categories=None, extra=None, name=None):
+        self.y_true = np.ascontiguousarray(y_true, dtype=float)
+        self.y_pred = np.ascontiguousarray(y_pred, dtype=float)
+        if self.y_true.shape != self.y_pred.shape or self.y_true.ndim != 1:
+            raise ValueError("y_true 与 y_pred 必须是等长的一维数组")
+        self.categories = None if categories is None else np.asarray(categories)
+        self.extra = {} if extra is None else {k: np.asarray(v) for k, v in extra.items()}
+        self.name = name
+        self._cache = {}
+
+    @classmethod
+    def from_frame(cls, df, true_col, pred_col, category_col=None, extra_cols=None, name=None):
+        """由 DataFrame 的指定列构建。"""
+        extra_cols = [] if extra_cols is None else list(extra_cols)
+        return cls(
+            df[true_col].to_numpy(), df[pred_col].to_numpy(),
+            categories=None if category_col is None else df[category_col].to_numpy(),
+            extra={c: df[c].to_numpy() for c in extra_cols},
+            name=pred_col if name is None else name,
+        )
+
+    @classmethod
+    def from_csv(cls, csv_path, true_col, pred_col, category_col=None, extra_cols=None, name=None):
+        """由 CSV / Parquet / Feather 构建，只读取所需列（浮点列直接读为 float64，不再转换复制）。"""
+        from table_io import read_table
+        cols = [true_col, pred_col] + ([] if category_col is None else [category_col]) + list(extra_cols or [])
+        df = read_table(csv_path, cols, float_dtype=np.float64, categorical=False)
+        return cls.from_frame(df, true_col, pred_col, category_col, extra_cols, name)
+
+    def __len__(self):
+        return len(self.y_true)
+
+    def __repr__(self):
+        return f"PredictionSet(name={self.name!r}, n={len(self)}, cached={sorted(map(str, self._cache))})"
+
+    def _memo(self, key, func):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    def peek(self, key):
+        """返回已缓存的派生量，未计算过时返回 None（不触发计算）。"""
+        return self._cache.get(key)
+
+    # ===============================
+    # 派生量
+    # ===============================
+    @property
+    def residuals(self):
+        """残差 y_pred - y_true。"""
+        return self._memo("residuals", lambda: self.y_pred - self.y_true)
+
+    @property
+    def true_order(self):
+        """按真实值升序的排序索引。"""
+        return self._memo("true_order", lambda: np.argsort(self.y_true, kind="stable"))
+
+    @property
+    def true_ranks(self):
+        """真实值的平均秩（从 1 开始，与 scipy.stats.rankdata 一致）。"""
+        return self._memo("true_ranks", lambda: group_ranks(np.zeros(len(self), np.intp), self.y_true, 1))
+
+    @property
+    def pred_ranks(self):
+        """预测值的平均秩。"""
+        return self._memo("pred_ranks", lambda: group_ranks(np.zeros(len(self), np.intp), self.y_pred, 1))
+
+    @property
+    def true_range(self):
+        """真实值 (最小值, 最大值)，忽略 NaN。"""
+        return self._memo("true_range", lambda: finite_range(self.y_true))
+
+    @property
+    def pred_range(self):
+        """预测值 (最小值, 最大值)，忽略 NaN。"""
+        return self._memo("pred_range", lambda: finite_range(self.y_pred))
+
+    @property
+    def value_range(self):
+        """真实值与预测值的联合 (最小值, 最大值)。"""
+        (t0, t1), (p0, p1) = self.true_range, self.pred_range
+        return min(t0, p0), max(t1, p1)
+
+    @property
+    def linear_fit(self):
+        """y_pred ≈ a * y_true + b 的最小二乘系数 (a, b)，与 np.polyfit(y_true, y_pred, 1) 一致。"""
+        def fit():
+            dx = self.y_true - self.y_true.mean()
+            a = float(np.dot(dx, self.y_pred - self.y_pred.mean()) / np.dot(dx, dx))
+            return a, float(self.y_pred.mean() - a * self.y_true.mean())
+        return self._memo("linear_fit", fit)
+
+    @property
+    def category_codes(self):
+        """(类别标签（已排序）, 每个样本的类别编号)；未提供 categories 时所有样本为同一类 "All"。"""
+        if self.categories is None:
+            return self._memo("category_codes",
+                              lambda: (np.array(["All"]), np.zeros(len(self.y_true), dtype=np.intp)))
+        return self._memo("category_codes", lambda: np.unique(self.categories, return_inverse=True))
+
+    def true_bins(self, bins):
+        """按真实值分箱 (codes, edges)；分箱数时复用缓存的取值范围，结果按 bins 缓存。"""
+        if np.ndim(bins) == 0:
+            lo, hi = self.true_range
+            edges = np.linspace(lo, hi if hi > lo else lo + 1.0, int(bins) + 1)
+            key = ("true_bins", int(bins))
+        else:
+            edges = np.asarray(bins, dtype=float)
+            key = ("true_bins", tuple(edges))
+        return self._memo(key, lambda: bin_codes(self.y_true, edges))
+
+
+def as_prediction_set(y_true, y_pred=None, categories=None):
+    """
+    绘图函数入口统一转换：已是 PredictionSet 时原样返回（保留缓存），否则由数组构建。
+    """
+    if isinstance(y_true, PredictionSet):
+        return y_true
+    if y_pred is None:
+        raise ValueError("未传入 PredictionSet 时必须提供 y_pred")
+    return PredictionSet(y_true, y_pred, categories=categories)
@@ -0,0 +1,201 @@
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# =========================================================
+# 🧩【分阶段计时】—— 默认关闭，关闭时每个埋点只做一次上下文变量读取
+# =========================================================
+# 绘图函数用 @profiled 装饰，函数体内用 mark(阶段名) 打点：每次 mark 把距上一次打点
+# 的耗时记入该阶段（圈速式，无需缩进代码块）。约定的阶段名：
+#   import  首次调用时延迟导入的 seaborn / scipy
+#   load    读取 CSV / xvg 等输入
+#   stats   统计计算（curve_fit、相关系数、Spearman、分组指标…）
+#   artists 创建图元（save_figure 在保存前自动打点）
+#   layout  tight_layout / subplots_adjust
+#   encode  savefig 编码与写盘（save_figure 自动打点）
+# 计数器：artists（保存时图中的图元数）、bytes_written（写出的字节数）、figures。
+#
+# 启用方式：
+#   环境变量 PLOT_PROFILE=1            每次调用结束在 stderr 打印一行摘要
+#            PLOT_PROFILE=路径.jsonl   每次调用追加一行 JSON 记录
+#            PLOT_PROFILE_CPROFILE=目录 同时为每次调用保存 cProfile 结果（.prof）
+#   代码中   with collect() as records: ...   收集为 ProfileRecord 列表
+#            enable(sink) / disable()
+
+_record = contextvars.ContextVar("plot_profile_record", default=None)
+_sinks = []
+_cprofile_dir = None
+_enabled = False
+
+
+class ProfileRecord:
+    """一次绘图函数调用的分阶段耗时与计数。"""
+
+    __slots__ = ("function", "stages", "counters", "seconds", "started", "error", "_last")
+
+    def __init__(self, function):
+        self.function = function
+        self.stages = {}
+        self.counters = {}
+        self.seconds = None
+        self.error = None
+        self.started = time.time()
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def to_dict(self):
+        return {"function": self.function, "seconds": self.seconds, "stages": dict(self.stages),
+                "counters": dict(self.counters), "started": self.started, "error": self.error}
+
+    def __repr__(self):
+        stages = ", ".join(f"{k}={v:.3f}" for k, v in self.stages.items())
+        return f"<ProfileRecord {self.function} {self.seconds or 0:.3f} s: {stages}>"
+
+
+# ---------- 埋点 ----------
+def mark(stage):
+    """把距上一次打点的耗时记入 stage（未启用时为空操作）。"""
+    rec = _record.get()
+    if rec is not None:
+        rec.lap(stage)
+
+
+def count(name, value=1):
+    """累加计数器（未启用时为空操作）。"""
+    rec = _record.get()
+    if rec is not None:
+        rec.counters[name] = rec.counters.get(name, 0) + value
+
+
+def active():
+    """当前调用是否在记录中（用于跳过只为计数才需要的额外计算）。"""
+    return _record.get() is not None
+
+
+def profiled(func):
+    """
+    绘图函数装饰器：启用时为每次（最外层）调用建立 ProfileRecord 并在结束后发送到各输出端。
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled or _record.get() is not None:
+            # 未启用，或嵌套在另一个被记录的绘图函数内（计入外层记录）
+            return func(*args, **kwargs)
+        rec = ProfileRecord(func.__name__)
+        token = _record.set(rec)
+        profiler = None
+        if _cprofile_dir is not None:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            rec.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            rec.seconds = time.perf_counter() - t0
+            rec.lap("other")   # 最后一次打点之后的剩余时间
+            if not rec.stages["other"]:
+                del rec.stages["other"]
+            _record.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(_cprofile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(
+                    _cprofile_dir, f"{func.__name__}_{int(rec.started * 1000)}_{threading.get_ident()}.prof"))
+            _emit(rec)
+    return wrapper
+
+
+# ---------- 输出端 ----------
+def _emit(rec):
+    for sink in list(_sinks):
+        try:
+            sink(rec)
+        except Exception as e:   # 输出端故障不影响绘图
+            print(f"[profiling] 输出端 {sink!r} 出错: {e}", file=sys.stderr)
+
+
+class JsonlSink:
+    """把每条记录追加为 JSONL 的一行（线程安全）。"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"JsonlSink({self.path!r})"
+
+    def __call__(self, rec):
+        line = json.dumps(rec.to_dict(), ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def stderr_sink(rec):
+    """在 stderr 打印一行摘要。"""
+    stages = "  ".join(f"{k} {v * 1000:.1f}ms" for k, v in rec.stages.items())
+    counters = "  ".join(f"{k}={v}" for k, v in rec.counters.items())
+    print(f"[profile] {rec.function} {rec.seconds * 1000:.1f}ms | {stages} | {counters}", file=sys.stderr)
+
+
+def enable(sink=None, cprofile_dir=None):
+    """启用记录并添加输出端 sink（可调用对象，接收 ProfileRecord）。"""
+    global _enabled, _cprofile_dir
+    if sink is not None and sink not in _sinks:
+        _sinks.append(sink)
+    if cprofile_dir is not None:
+        _cprofile_dir = cprofile_dir
+    _enabled = True
+
+
+def disable():
+    """关闭记录并移除全部输出端。"""
+    global _enabled, _cprofile_dir
+    _enabled = False
+    _cprofile_dir = None
+    _sinks.clear()
+
+
+@contextmanager
+def collect(cprofile_dir=None):
+    """
+    在作用域内启用记录，返回收集到的 ProfileRecord 列表；退出后恢复原先的启用状态。
+
+        with collect() as records:
+            plot_residual_hist(y_true, y_pred)
+        records[0].stages   # {"stats": ..., "artists": ..., "layout": ..., "encode": ...}
+    """
+    global _enabled, _cprofile_dir
+    records = []
+    previous = (_enabled, _cprofile_dir)
+    _sinks.append(records.append)
+    enable(cprofile_dir=cprofile_dir)
+    try:
+        yield records
+    finally:
+        _sinks.remove(records.append)
+        _enabled, _cprofile_dir = previous
+
+
+def _configure_from_env():
+    value = os.environ.get("PLOT_PROFILE", "").strip()
+    cprofile_dir = os.environ.get("PLOT_PROFILE_CPROFILE") or None
+    if value in ("", "0") and cprofile_dir is None:
+        return
+    sink = stderr_sink if value in ("", "0", "1") else JsonlSink(value)
+    enable(sink, cprofile_dir)
+
+
+_configure_from_env()
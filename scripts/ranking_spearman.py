@@ -1,17 +1,394 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import re
+from render_utils import new_subplots, save_figure, scoped_style
+from profiling import mark, profiled
+from table_io import is_table_path, read_table
 
+# =========================================================
+# 由原始预测计算 Spearman 排名与自助法置信区间
+# =========================================================
+def _tie_runs(sorted_vals):
+    """沿最后一维排好序的数组中，每个位置是否为并列片段的首/尾。"""
+    first = np.ones(sorted_vals.shape, dtype=bool)
+    first[..., 1:] = sorted_vals[..., 1:] != sorted_vals[..., :-1]
+    last = np.ones(sorted_vals.shape, dtype=bool)
+    last[..., :-1] = first[..., 1:]
+    return first, last
+
+
+def _weighted_ranks(w_sorted, first, last):
+    """
+    带重数的平均秩：样本按原始顺序排好，w_sorted 为各位置在自助样本中的出现次数。
+
+    秩 = 严格更小样本的总重数 + (并列片段总重数 + 1) / 2，与对重抽样数据直接求
+    rankdata 的结果一致，但只需一次累加而无需重新排序。累计重数单调不减，
+    因此片段首尾处的累计值可用 maximum/minimum.accumulate 向后/向前传播。
+    """
+    cw = np.cumsum(w_sorted, axis=-1)
+    if first.all():
+        # 无并列：片段即自身
+        return cw - 0.5 * (w_sorted - 1)
+    before = np.maximum.accumulate(np.where(first, cw - w_sorted, 0), axis=-1)
+    upto = np.minimum.accumulate(np.where(last, cw, np.inf)[..., ::-1], axis=-1)[..., ::-1]
+    return 0.5 * (before + upto + 1)
+
+
+def spearman_bootstrap(y_true, scores, n_boot=10000, ci=0.9, seed=0, batch_size=20):
+    """
+    一次性计算所有评分函数的 Spearman ρ 及自助法置信区间。
+
+    所有评分函数共用同一组重抽样索引；重抽样后的秩由原始排序上的重数累加得到，
+    无需对每次重抽样重新排序，整体为 (批大小 × 样本数 × 评分函数数) 的向量化运算。
+
+    参数
+    ----------
+    y_true : np.ndarray
+        真实值，形状 (n,)
+    scores : np.ndarray
+        预测矩阵，形状 (n, F)，每列一个评分函数
+    n_boot : int
+        自助法重抽样次数
+    ci : float
+        置信水平
+    seed : int
+        随机种子
+    batch_size : int
+        每批处理的重抽样次数（控制内存）
+
+    返回
+    -------
+    rho : np.ndarray
+        形状 (F,) 的 Spearman ρ
+    ci_low, ci_high : np.ndarray
+        置信区间上下限
+    boot : np.ndarray
+        形状 (n_boot, F) 的自助法 ρ 分布
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    scores = np.asarray(scores, dtype=float)
+    n, n_func = scores.shape
+
+    # 各评分函数与真实值的排序及并列片段，只计算一次（样本维放在最后，保证连续访问）
+    order = np.argsort(scores.T, axis=1, kind="stable")
+    first, last = _tie_runs(np.take_along_axis(scores.T, order, axis=1))
+    t_order = np.argsort(y_true, kind="stable")
+    t_first, t_last = _tie_runs(y_true[t_order])
+    tied = ~first.all(axis=1)
+    untied = ~tied
+    mid = (n + 1) / 2
+
+    def batch_rho(w):
+        # 真实值的秩（回到原始样本位置），再按各评分函数的排序取出
+        rt_sorted = _weighted_ranks(w[:, t_order], t_first, t_last) - mid
+        rt = np.empty_like(rt_sorted)
+        rt[:, t_order] = rt_sorted
+        w_sorted = w[:, order]  # (批, 评分函数, 样本)
+        if tied.any() and untied.any():
+            # 无并列的评分函数走快速路径，只对存在并列的列做片段传播
+            rf = np.empty_like(w_sorted)
+            rf[:, untied] = _weighted_ranks(w_sorted[:, untied], first[untied], last[untied])
+            rf[:, tied] = _weighted_ranks(w_sorted[:, tied], first[tied], last[tied])
+        else:
+            rf = _weighted_ranks(w_sorted, first, last)
+        wrf = w_sorted * (rf - mid)
+        cov = (wrf * rt[:, order]).sum(axis=-1)
+        var_f = (wrf * wrf / np.maximum(w_sorted, 1)).sum(axis=-1)
+        var_t = (w * rt * rt).sum(axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return cov / np.sqrt(var_f * var_t[:, None])
+
+    rho = batch_rho(np.ones((1, n)))[0]
+
+    rng = np.random.default_rng(seed)
+    boot = np.empty((n_boot, n_func))
+    for b0 in range(0, n_boot, batch_size):
+        b = min(batch_size, n_boot - b0)
+        idx = rng.integers(0, n, size=(b, n))
+        # 重抽样索引转为每个样本的出现次数
+        flat = (np.arange(b)[:, None] * n + idx).ravel()
+        # 重数为整数，float32 下累加精确，可减半内存带宽
+        w = np.bincount(flat, minlength=b * n).reshape(b, n).astype(np.float32)
+        boot[b0:b0 + b] = batch_rho(w)
+
+    if n_boot == 0:
+        return rho, np.full(n_func, np.nan), np.full(n_func, np.nan), boot
+    alpha = (1 - ci) / 2
+    ci_low, ci_high = np.nanquantile(boot, [alpha, 1 - alpha], axis=0)
+    return rho, ci_low, ci_high, boot
+
+
+def _read_scores(data, true_col, score_cols):
+    if not is_table_path(data):
+        return data
+    return read_table(data, None if score_cols is None else [true_col] + list(score_cols))
+
+
+def compute_spearman_ranking(data, true_col, score_cols=None, n_boot=10000, ci=0.9, seed=0):
+    """
+    由每个复合物的原始预测值计算各评分函数的 Spearman 排名表。
+
+    参数
+    ----------
+    data : str or pd.DataFrame
+        宽格式表格路径（CSV / Parquet / Feather，见 table_io）或 DataFrame：
+        每行一个复合物，一列真实值，每个评分函数一列预测值；
+        给定 score_cols 时只读取所需列，数值以 float32 读入
+    true_col : str
+        真实值列名
+    score_cols : list, optional
+        评分函数列名，默认取除真实值外的全部数值列
+    n_boot : int
+        自助法重抽样次数
+    ci : float
+        置信水平
+    seed : int
+        随机种子
+
+    返回
+    -------
+    ranking_df : pd.DataFrame
+        按 ρ 降序排列，包含 plot_spearman_ranking 所需的列以及数值型 ci_low / ci_high
+    """
+    df = _read_scores(data, true_col, score_cols)
+    if score_cols is None:
+        score_cols = [c for c in df.select_dtypes("number").columns if c != true_col]
+    # 只保留所有评分函数都有预测值的复合物，保证各函数在同一样本集上比较
+    sub = df[[true_col] + list(score_cols)].dropna()
+
+    rho, ci_low, ci_high, _ = spearman_bootstrap(sub[true_col].to_numpy(), sub[score_cols].to_numpy(),
+                                                 n_boot=n_boot, ci=ci, seed=seed)
+    ranking_df = pd.DataFrame({
+        "评分函数 (Scoring Function)": score_cols,
+        "ρ (Spearman)": rho,
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+    })
+    ranking_df[f"{ci * 100:g}% 置信区间 (Confidence Interval)"] = [
+        f"{lo:.2f}-{hi:.2f}" for lo, hi in zip(ci_low, ci_high)]
+    return ranking_df.sort_values("ρ (Spearman)", ascending=False, ignore_index=True)
+
+
+# =========================================================
+# 评分函数两两显著性检验
+# =========================================================
+def paired_bootstrap_pvalues(boot, kind="normal", batch_size=500):
+    """
+    由共享重抽样得到的 ρ 分布计算所有评分函数两两差异的双侧 p 值。
+
+    同一次重抽样下各函数的 ρ 是配对的，差值 d = ρ_i - ρ_j 的分布即配对检验的依据：
+
+    - "normal"：d 的均值与方差由 ρ 分布的均值向量和协方差矩阵一次矩阵运算得到，
+      按正态近似求 p 值；p 值连续，多重校正后仍有分辨力（推荐用于上百个函数）
+    - "percentile"：直接统计 d 跨过 0 的比例，按批次以 (批, F, F) 广播比较；
+      p 值下限为 2 / (n_boot + 1)
+
+    参数
+    ----------
+    boot : np.ndarray
+        spearman_bootstrap 返回的 (n_boot, F) 自助法 ρ 分布
+    kind : str
+        "normal" 或 "percentile"
+    batch_size : int
+        percentile 模式下每批比较的重抽样次数
+
+    返回
+    -------
+    p : np.ndarray
+        (F, F) 对称 p 值矩阵，对角线为 1
+    """
+    n_boot, n_func = boot.shape
+    if kind == "normal":
+        mean = boot.mean(axis=0)
+        cov = np.cov(boot, rowvar=False)
+        var = np.diag(cov)
+        var_d = var[:, None] + var[None, :] - 2 * cov
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = (mean[:, None] - mean[None, :]) / np.sqrt(np.maximum(var_d, 0))
+        from scipy.stats import norm
+        p = 2 * norm.sf(np.abs(z))
+        p = np.where(np.isfinite(p), p, 1.0)
+    else:
+        greater = np.zeros((n_func, n_func))
+        for b0 in range(0, n_boot, batch_size):
+            chunk = boot[b0:b0 + batch_size]
+            greater += (chunk[:, :, None] > chunk[:, None, :]).sum(axis=0)
+        ties = n_boot - greater - greater.T
+        # 双侧：2 × min(P(d ≤ 0), P(d ≥ 0))，加 1 平滑避免 p = 0
+        le = greater.T + ties
+        ge = greater + ties
+        p = np.minimum(1.0, 2 * (np.minimum(le, ge) + 1) / (n_boot + 1))
+    np.fill_diagonal(p, 1.0)
+    return p
+
+
+def steiger_pvalues(y_true, scores):
+    """
+    Steiger (1980) 相依相关系数检验：所有评分函数两两比较与真实值的 Spearman ρ。
+
+    两个函数的 ρ 共享同一真实值，彼此相关；检验统计量需用到两函数预测之间的秩相关，
+    一次对秩矩阵求相关矩阵即可得到全部 F × F 组合。对 Spearman ρ 为近似检验。
+
+    参数
+    ----------
+    y_true : np.ndarray
+        真实值，形状 (n,)
+    scores : np.ndarray
+        预测矩阵，形状 (n, F)
+
+    返回
+    -------
+    p : np.ndarray
+        (F, F) 对称 p 值矩阵，对角线为 1
+    """
+    from scipy.stats import norm, rankdata
+
+    n = len(y_true)
+    ranks = rankdata(np.column_stack([y_true, scores]), axis=0)
+    corr = np.corrcoef(ranks, rowvar=False)
+    r = corr[0, 1:]                # 各函数与真实值的 ρ
+    r_ab = corr[1:, 1:]            # 函数之间的 ρ
+
+    ra, rb = r[:, None], r[None, :]
+    rbar2 = ((ra + rb) / 2) ** 2
+    psi = r_ab * (1 - 2 * rbar2) - 0.5 * rbar2 * (1 - 2 * rbar2 - r_ab ** 2)
+    c = psi / (1 - rbar2) ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (np.arctanh(ra) - np.arctanh(rb)) * np.sqrt(n - 3) / np.sqrt(2 - 2 * c)
+    p = 2 * norm.sf(np.abs(z))
+    p = np.where(np.isfinite(p), p, 1.0)
+    np.fill_diagonal(p, 1.0)
+    return p
+
+
+def holm_adjust(p):
+    """对 p 值矩阵上三角做 Holm 多重比较校正，返回对称矩阵。"""
+    n_func = len(p)
+    iu = np.triu_indices(n_func, k=1)
+    raw = p[iu]
+    order = np.argsort(raw)
+    m = len(raw)
+    adj = np.maximum.accumulate(raw[order] * (m - np.arange(m)))
+    out_u = np.empty(m)
+    out_u[order] = np.minimum(adj, 1.0)
+    out = np.ones_like(p)
+    out[iu] = out_u
+    out.T[iu] = out_u
+    return out
+
+
+def significance_letters(rho, p, alpha=0.05):
+    """
+    紧凑字母显示（insert-absorb 算法）：共享同一字母的评分函数之间差异不显著。
+
+    参数
+    ----------
+    rho : np.ndarray
+        各函数 ρ，用于让最优函数获得字母 "a"
+    p : np.ndarray
+        (F, F) p 值矩阵
+    alpha : float
+        显著性水平
+
+    返回
+    -------
+    letters : list[str]
+        与 rho 等长的字母标记
+    """
+    n_func = len(rho)
+    sig = p < alpha
+    cols = np.ones((1, n_func), dtype=bool)   # 每一行是一个字母覆盖的函数集合
+    for i, j in zip(*np.nonzero(np.triu(sig, k=1))):
+        both = cols[:, i] & cols[:, j]
+        if not both.any():
+            continue
+        split_i, split_j = cols[both].copy(), cols[both].copy()
+        split_i[:, i] = False
+        split_j[:, j] = False
+        cols = np.vstack([cols[~both], split_i, split_j])
+        # 吸收：去掉被其他集合完全包含的集合（及重复集合）
+        contained = (cols[:, None, :] <= cols[None, :, :]).all(axis=2)
+        np.fill_diagonal(contained, False)
+        dup_later = contained & contained.T & np.tri(len(cols), k=-1, dtype=bool).T
+        strict = contained & ~contained.T
+        cols = cols[~(strict.any(axis=1) | dup_later.any(axis=1))]
+
+    # 字母按集合中最优函数的排名分配
+    rank_pos = np.empty(n_func, dtype=int)
+    rank_pos[np.argsort(-np.asarray(rho))] = np.arange(n_func)
+    best = np.where(cols, rank_pos[None, :], n_func).min(axis=1)
+    cols = cols[np.argsort(best, kind="stable")]
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    symbols = [alphabet[k] if k < len(alphabet) else f"({k})" for k in range(len(cols))]
+    return ["".join(symbols[k] for k in np.flatnonzero(cols[:, f])) for f in range(n_func)]
+
+
+def paired_significance(data, true_col, score_cols=None, method="bootstrap", n_boot=10000,
+                        alpha=0.05, adjust="holm", seed=0, kind="normal"):
+    """
+    所有评分函数两两比较 Spearman ρ 的显著性。
+
+    参数
+    ----------
+    data : str or pd.DataFrame
+        宽格式表格路径或 DataFrame（同 compute_spearman_ranking）
+    true_col : str
+        真实值列名
+    score_cols : list, optional
+        评分函数列名，默认取除真实值外的全部数值列
+    method : str
+        "bootstrap" 配对自助法（与置信区间使用同一组重抽样）；"steiger" 相依相关检验
+    n_boot : int
+        自助法重抽样次数
+    alpha : float
+        显著性水平（用于字母标记）
+    adjust : str or None
+        "holm" 做 Holm 校正，None 不校正
+    seed : int
+        随机种子
+    kind : str
+        自助法 p 值的计算方式，见 paired_bootstrap_pvalues
+
+    返回
+    -------
+    p_df : pd.DataFrame
+        F × F 的 p 值矩阵，行列为评分函数名
+    letters : pd.Series
+        每个评分函数的显著性字母
+    """
+    df = _read_scores(data, true_col, score_cols)
+    if score_cols is None:
+        score_cols = [c for c in df.select_dtypes("number").columns if c != true_col]
+    sub = df[[true_col] + list(score_cols)].dropna()
+    y_true, scores = sub[true_col].to_numpy(), sub[score_cols].to_numpy()
+
+    if method == "steiger":
+        rho = spearman_bootstrap(y_true, scores, n_boot=0)[0]
+        p = steiger_pvalues(y_true, scores)
+    else:
+        rho, _, _, boot = spearman_bootstrap(y_true, scores, n_boot=n_boot, seed=seed)
+        p = paired_bootstrap_pvalues(boot, kind=kind)
+    if adjust == "holm":
+        p = holm_adjust(p)
+
+    p_df = pd.DataFrame(p, index=score_cols, columns=score_cols)
+    letters = pd.Series(significance_letters(rho, p, alpha), index=score_cols, name="letters")
+    return p_df, letters
+
+
+@profiled
 def plot_spearman_ranking(csv_path, save_path="ranking_bar.png", highlight_name="FusionSmi",
                            figsize=(5,6), bar_color="#2B5DA3", highlight_color="#F5A623",
-                           ecolor="black", capsize=3, xlabel="Spearman Correlation Coefficient"):
+                           ecolor="black", capsize=3, xlabel="Spearman Correlation Coefficient",
+                           top_n=20, letters=None):
     """
     绘制带置信区间的水平条形图，突出显示指定评分函数。
 
     参数
     ----------
-    csv_path : str
-        CSV文件路径，需包含列 ["评分函数 (Scoring Function)", "ρ (Spearman)", "90% 置信区间 (Confidence Interval)"]
+    csv_path : str or pd.DataFrame
+        CSV文件路径，需包含列 ["评分函数 (Scoring Function)", "ρ (Spearman)", "90% 置信区间 (Confidence Interval)"]；
+        也可直接传入 compute_spearman_ranking 返回的排名表（含 ci_low / ci_high 列）
     save_path : str
         保存图片路径
     highlight_name : str
@@ -28,9 +405,15 @@ def plot_spearman_ranking(csv_path, save_path="ranking_bar.png", highlight_name=
         误差条帽宽度
     xlabel : str
         x轴标签
+    top_n : int or None
+        只绘制前 top_n 名，None 表示全部
+    letters : dict or pd.Series, optional
+        评分函数 -> 显著性字母（如 paired_significance 的返回值），标注在误差条右侧
     """
-    df = pd.read_csv(csv_path)
-    df = df.head(20)  # 只取前20名
+    df = pd.read_csv(csv_path) if isinstance(csv_path, str) else csv_path.copy()
+    mark("load")
+    if top_n is not None:
+        df = df.head(top_n)  # 只取前 top_n 名
 
     # 解析置信区间字符串
     def parse_interval(interval_str):
@@ -39,7 +422,8 @@ def plot_spearman_ranking(csv_path, save_path="ranking_bar.png", highlight_name=
             raise ValueError(f"Invalid confidence interval values: {nums[0]}, {nums[1]}")
         return [float(nums[0]), float(nums[1])] if len(nums) == 2 else [None, None]
 
-    df[["ci_low", "ci_high"]] = df["90% 置信区间 (Confidence Interval)"].apply(parse_interval).tolist()
+    if "ci_low" not in df.columns:
+        df[["ci_low", "ci_high"]] = df["90% 置信区间 (Confidence Interval)"].apply(parse_interval).tolist()
 
     # 计算误差
     df["error_low"] = df["ρ (Spearman)"] - df["ci_low"]
@@ -52,21 +436,33 @@ def plot_spearman_ranking(csv_path, save_path="ranking_bar.png", highlight_name=
     colors = [highlight_color if x == highlight_name else bar_color for x in df["评分函数 (Scoring Function)"]]
 
     # 绘图
-    plt.figure(figsize=figsize)
-    plt.barh(df["评分函数 (Scoring Function)"], df["ρ (Spearman)"],
-             xerr=[df["error_low"], df["error_high"]],
-             color=colors, ecolor=ecolor, capsize=capsize)
-
-    plt.xlabel(xlabel, fontsize=12)
-    plt.ylabel("")
-    plt.xlim(0, 1.0)
-    plt.tight_layout()
-    plt.savefig(save_path, dpi=300)
-    plt.close()
+    with scoped_style():
+        fig, ax = new_subplots(figsize=figsize)
+        ax.barh(df["评分函数 (Scoring Function)"], df["ρ (Spearman)"],
+                xerr=[df["error_low"], df["error_high"]],
+                color=colors, ecolor=ecolor, capsize=capsize)
+
+        # 显著性字母
+        if letters is not None:
+            for name, high in zip(df["评分函数 (Scoring Function)"], df["ci_high"]):
+                ax.text(high + 0.01, name, letters.get(name, ""), va="center", fontsize=9)
+
+        ax.set_xlabel(xlabel, fontsize=12)
+        ax.set_ylabel("")
+        ax.set_xlim(min(0, df["ci_low"].min()), 1.1 if letters is not None else 1.0)
+        mark("artists")
+        fig.tight_layout()
+        mark("layout")
+        save_figure(fig, save_path, dpi=300)
 
 # csv_path = "example_spearman.csv"
 # plot_spearman_ranking(csv_path, save_path="ranking_bar_example.png", highlight_name="FusionSmi")
 
+# # 由原始预测值直接计算排名与 90% 自助法置信区间
+# # 宽格式 CSV：PDB,True,FusionSmi,Vina,Glide,...
+# ranking_df = compute_spearman_ranking("example_predictions.csv", true_col="True", n_boot=10000)
+# plot_spearman_ranking(ranking_df, save_path="ranking_bar_raw.png", highlight_name="FusionSmi")
+
 # 评分函数 (Scoring Function),ρ (Spearman),90% 置信区间 (Confidence Interval)
 # FusionSmi,0.78,"0.70-0.85"
 # Vina,0.72,"0.63-0.80"
@@ -76,3 +472,7 @@ def plot_spearman_ranking(csv_path, save_path="ranking_bar.png", highlight_name=
 # XScore,0.58,"0.48-0.67"
 # Autodock,0.55,"0.45-0.63"
 # PLP,0.52,"0.42-0.60"
+
+# # 两两显著性检验，并在条形图上标注紧凑字母（同字母表示差异不显著）
+# p_df, letters = paired_significance("example_predictions.csv", true_col="True", method="bootstrap")
+# plot_spearman_ranking(ranking_df, save_path="ranking_bar_letters.png", letters=letters)
@@ -0,0 +1,306 @@
+import argparse
+import base64
+import html
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from metrics_radar import grouped_metrics
+from table_io import read_table
+
+# =========================================================
+# 🧩【任务表】—— 报告中的诊断图：(模块, 函数, 默认参数)
+# =========================================================
+REPORT_PLOTS = {
+    # 计数轴刻度随样本量变化，不使用固定间隔
+    "residual_hist": ("plot_residual_hist", "plot_residual_hist", {"ytick_step": None}),
+    "residual_scatter": ("plot_residual_scatter", "plot_residual_scatter", {}),
+    "sorted_curve": ("plot_sorted_curve", "plot_sorted_curve", {}),
+    "pred_vs_true": ("plot_pred_vs_true_slope_bias_histograms", "plot_pred_vs_true", {}),
+    "metrics_radar": ("metrics_radar", "plot_metrics_radar", {}),
+}
+
+# 样本数超过该值时，散点/逐点曲线默认改用分箱条带/排名包络
+LARGE_N = 50_000
+
+# 共享内存中的行顺序
+_ROW_TRUE, _ROW_PRED, _ROW_CATEGORY, _ROW_LENGTH = range(4)
+
+
+# =========================================================
+# 🧩【共享内存】—— 父进程写入一次，工作进程零拷贝读取
+# =========================================================
+def _attach(name):
+    """在工作进程中挂载共享内存，不注册到 resource_tracker（由父进程负责释放）。"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 没有 track 参数；工作进程与父进程共用同一个 resource_tracker，
+        # 重复登记同名内存无副作用，释放仍由父进程的 unlink 完成
+        return shared_memory.SharedMemory(name=name)
+
+
+def _large_n_defaults(task, n):
+    """大样本时的默认绘图模式，绘图开销与样本量无关。"""
+    if n <= LARGE_N:
+        return {}
+    return {"residual_scatter": {"mode": "binned"}, "sorted_curve": {"mode": "envelope"}}.get(task, {})
+
+
+def _render_plot(task, shm_name, shape, category_labels, length_col, save_path, kwargs):
+    """
+    工作进程：由共享内存构建 PredictionSet 并绘制一张诊断图。
+
+    返回
+    -------
+    (task, save_path, 耗时秒数)
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    from prediction_set import PredictionSet
+
+    t0 = time.perf_counter()
+    shm = _attach(shm_name)
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        extra = {length_col: block[_ROW_LENGTH]} if length_col is not None else None
+        categories = np.asarray(category_labels, dtype=object)[block[_ROW_CATEGORY].astype(np.intp)]
+        ps = PredictionSet(block[_ROW_TRUE], block[_ROW_PRED], categories=categories, extra=extra)
+
+        module_name, func_name, defaults = REPORT_PLOTS[task]
+        func = getattr(importlib.import_module(module_name), func_name)
+        params = {**defaults, **_large_n_defaults(task, shape[1]), **kwargs, "save_path": save_path}
+        if task == "metrics_radar":
+            func(ps, length_col, None, "Pred", **params)
+        else:
+            func(ps, **params)
+        del ps, block, extra
+    finally:
+        shm.close()
+    return task, save_path, time.perf_counter() - t0
+
+
+def _category_codes(values):
+    """
+    类别列 → (类别标签列表, 整数编码)；缺失值（code = -1）单独归为 "NA" 类，
+    避免在工作进程中按负索引取到最后一个类别。标签统一转为字符串，
+    数值类别与 "NA" 混合时仍可排序（PredictionSet.category_codes 使用 np.unique）。
+    """
+    cat = values.astype("category")
+    labels = [str(c) for c in cat.cat.categories]
+    codes = cat.cat.codes.to_numpy()
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(labels), codes)
+        labels.append("NA")
+    return labels, codes
+
+
+# =========================================================
+# 🧩【指标表】
+# =========================================================
+def summary_metrics(y_true, y_pred):
+    """
+    整体回归指标：N, RMSE, MAE, Pearson, Spearman, R2, CI, Slope, Intercept。
+    """
+    codes = np.zeros(len(y_true), dtype=np.intp)
+    m = grouped_metrics(codes, y_true, y_pred, ["All"]).drop(columns="Length_Group")
+    # 与 grouped_metrics 一致：只用真实值与预测值均有限的样本拟合
+    keep = np.isfinite(y_true) & np.isfinite(y_pred)
+    y_true, y_pred = y_true[keep], y_pred[keep]
+    dx = y_true - y_true.mean()
+    slope = np.dot(dx, y_pred - y_pred.mean()) / np.dot(dx, dx)
+    m["Slope"] = slope
+    m["Intercept"] = y_pred.mean() - slope * y_true.mean()
+    m.index = ["All"]
+    return m
+
+
+# =========================================================
+# 🧩【报告输出】
+# =========================================================
+def _write_html(report_path, title, metrics_df, images, timings):
+    parts = [
+        "<!DOCTYPE html>",
+        f"<html><head><meta charset='utf-8'><title>{html.escape(title)}</title>",
+        "<style>body{font-family:sans-serif;margin:2em;} table{border-collapse:collapse;}"
+        "td,th{border:1px solid #999;padding:4px 8px;text-align:right;}"
+        ".fig{display:inline-block;margin:1em;vertical-align:top;text-align:center;}"
+        ".fig img{max-width:560px;}</style></head><body>",
+        f"<h1>{html.escape(title)}</h1>",
+        "<h2>Metrics</h2>",
+        metrics_df.to_html(float_format=lambda v: f"{v:.4f}"),
+        "<h2>Diagnostics</h2>",
+    ]
+    for task, path in images:
+        with open(path, "rb") as f:
+            data = base64.b64encode(f.read()).decode("ascii")
+        parts.append(f"<div class='fig'><img src='data:image/png;base64,{data}'>"
+                     f"<div>{html.escape(task)} ({timings[task]:.2f} s)</div></div>")
+    parts.append("</body></html>")
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+
+def _write_pdf(report_path, title, metrics_df, images):
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.image import imread
+    from render_utils import managed_figures, new_figure, new_subplots, scoped_style
+
+    with scoped_style(), PdfPages(report_path) as pdf:
+        # 第一页：指标表
+        fig, ax = new_subplots(figsize=(8.27, 3))
+        ax.axis("off")
+        ax.set_title(title, fontsize=14, fontweight="bold")
+        table = metrics_df.reset_index().rename(columns={"index": ""})
+        cells = [[f"{v:.4f}" if isinstance(v, float) else str(v) for v in row] for row in table.to_numpy()]
+        ax.table(cellText=cells, colLabels=list(table.columns), loc="center").scale(1, 1.5)
+        pdf.savefig(fig)
+
+        # 每张诊断图一页（写入后立即释放，不同时持有所有页面的图像）
+        for task, path in images:
+            with managed_figures():
+                img = imread(path)
+                h, w = img.shape[:2]
+                fig = new_figure(figsize=(8.27, 8.27 * h / w))
+                fig.add_axes([0, 0, 1, 1]).imshow(img)
+                fig.axes[0].axis("off")
+                pdf.savefig(fig)
+
+
+# =========================================================
+# 🧩【主函数】
+# =========================================================
+def generate_report(csv_path, true_col, pred_col, out_dir="report",
+                    category_col=None, length_col=None, fmt="html",
+                    plots=None, plot_kwargs=None, max_workers=None, title=None):
+    """
+    一次读取预测文件，在多个工作进程中并行绘制全部回归诊断图，并汇总为一份报告。
+
+    数组只读入一次并写入一块共享内存，各工作进程直接映射同一块内存构建 PredictionSet，
+    不经过 pickle 复制；主进程在等待绘图的同时计算指标表。总耗时接近最慢的单张图。
+
+    参数
+    ----------
+    csv_path : str
+        预测结果表格路径（CSV / Parquet / Feather）
+    true_col, pred_col : str
+        真实值列与预测值列
+    out_dir : str
+        输出目录（存放各诊断图与报告）
+    category_col : str, optional
+        类别列（pred_vs_true 着色用），缺省时所有样本为同一类；缺失值归为 "NA" 类
+    length_col : str, optional
+        蛋白长度列（metrics_radar 分组用），缺省时不绘制雷达图
+    fmt : str
+        报告格式："html"（图片内嵌为 base64）或 "pdf"
+    plots : list[str], optional
+        要绘制的诊断图，默认 REPORT_PLOTS 中全部（无 length_col 时跳过 metrics_radar）
+    plot_kwargs : dict, optional
+        每张图的额外参数，如 {"residual_scatter": {"mode": "scatter"}}；
+        样本数超过 LARGE_N 时散点图与排序曲线默认使用 binned / envelope 模式
+    max_workers : int, optional
+        工作进程数，默认等于诊断图数量
+    title : str, optional
+        报告标题，默认使用 pred_col
+
+    返回
+    -------
+    report_path : str
+        报告文件路径
+    timings : dict
+        每张诊断图在工作进程中的耗时，以及 "total" 总耗时
+    """
+    t0 = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    plot_kwargs = plot_kwargs or {}
+    if plots is None:
+        plots = [p for p in REPORT_PLOTS if p != "metrics_radar" or length_col is not None]
+    if not plots:
+        raise ValueError("plots 为空：至少需要一张诊断图")
+
+    # ===============================
+    # 读取一次（仅所需列）
+    # ===============================
+    cols = [true_col, pred_col] + [c for c in (category_col, length_col) if c is not None]
+    df = read_table(csv_path, cols, float_dtype=np.float64)
+    n = len(df)
+
+    if category_col is not None:
+        category_labels, category_codes = _category_codes(df[category_col])
+    else:
+        category_labels = ["All"]
+        category_codes = np.zeros(n)
+
+    # ===============================
+    # 写入共享内存：4 行 × n 列的 float64 块
+    # ===============================
+    shape = (4, n)
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        block[_ROW_TRUE] = df[true_col].to_numpy(dtype=float)
+        block[_ROW_PRED] = df[pred_col].to_numpy(dtype=float)
+        block[_ROW_CATEGORY] = category_codes
+        block[_ROW_LENGTH] = df[length_col].to_numpy(dtype=float) if length_col is not None else 0.0
+        del df
+
+        # ===============================
+        # 并行绘图；主进程同时计算指标表
+        # ===============================
+        paths = {p: os.path.join(out_dir, f"{p}.png") for p in plots}
+        with ProcessPoolExecutor(max_workers=max_workers or len(plots)) as pool:
+            futures = [pool.submit(_render_plot, p, shm.name, shape, category_labels, length_col,
+                                   paths[p], plot_kwargs.get(p, {})) for p in plots]
+            metrics_df = summary_metrics(block[_ROW_TRUE], block[_ROW_PRED])
+            results = [f.result() for f in futures]
+        del block
+    finally:
+        shm.close()
+        shm.unlink()
+
+    timings = {task: elapsed for task, _, elapsed in results}
+    images = [(task, path) for task, path, _ in results]
+
+    # ===============================
+    # 汇总报告
+    # ===============================
+    title = title or f"Regression diagnostics: {pred_col}"
+    report_path = os.path.join(out_dir, f"report.{fmt}")
+    if fmt == "html":
+        _write_html(report_path, title, metrics_df, images, timings)
+    elif fmt == "pdf":
+        _write_pdf(report_path, title, metrics_df, images)
+    else:
+        raise ValueError(f"不支持的报告格式: {fmt}")
+
+    timings["total"] = time.perf_counter() - t0
+    return report_path, timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并行生成回归诊断报告")
+    parser.add_argument("csv_path")
+    parser.add_argument("--true-col", default="True")
+    parser.add_argument("--pred-col", default="Pred")
+    parser.add_argument("--category-col", default=None)
+    parser.add_argument("--length-col", default=None)
+    parser.add_argument("--out-dir", default="report")
+    parser.add_argument("--format", default="html", choices=["html", "pdf"])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    path, timings = generate_report(
+        args.csv_path, args.true_col, args.pred_col, out_dir=args.out_dir,
+        category_col=args.category_col, length_col=args.length_col,
+        fmt=args.format, max_workers=args.workers
+    )
+    print(f"报告已保存: {path}")
+    for task, elapsed in timings.items():
+        print(f"  {task:<18s}{elapsed:7.2f} s")
+
+# python regression_report.py predictions.csv --true-col True --pred-col Pred_fp \
+#     --category-col Category --length-col Protein_Len --out-dir report_fp --format html
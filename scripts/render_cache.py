@@ -0,0 +1,315 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from plot_registry import PLOT_FUNCTIONS, get_plot_function, replace_outputs, with_default_outputs
+from prediction_set import PredictionSet
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 参与缓存键的库版本
+VERSIONED_LIBRARIES = ["numpy", "pandas", "matplotlib", "seaborn", "scipy"]
+
+# 上次扫描后本实例写入超过 max_bytes 的该比例时重新扫描目录（计入其他进程写入的条目）
+RESCAN_FRACTION = 0.05
+
+
+# =========================================================
+# 🧩【内容哈希】—— 数组 / 表格 / 文件 / 参数字典 / 库与脚本版本
+# =========================================================
+_file_digests = {}
+
+
+def file_digest(path):
+    """文件内容哈希，按 (路径, 大小, 修改时间) 缓存，未改动的文件不重复读取。"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _file_digests:
+        h = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _file_digests[key] = h.hexdigest()
+    return _file_digests[key]
+
+
+def _update(h, obj):
+    """把任意参数值按内容写入哈希（类型 + 结构 + 数据）。"""
+    import pandas as pd
+
+    if obj is None or isinstance(obj, (bool, int, float, complex)):
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, str):
+        # 指向已有文件的字符串按文件内容哈希（输入 CSV / xvg 等）
+        if len(obj) < 4096 and os.path.isfile(obj):
+            h.update(f"file:{file_digest(obj)};".encode())
+        else:
+            h.update(f"str:{len(obj)}:".encode() + obj.encode("utf-8", "surrogatepass"))
+    elif isinstance(obj, bytes):
+        h.update(f"bytes:{len(obj)}:".encode() + obj)
+    elif isinstance(obj, np.ndarray):
+        h.update(f"nd:{obj.dtype.str}:{obj.shape};".encode())
+        if obj.dtype.hasobject:
+            _update(h, obj.tolist())
+        else:
+            h.update(np.ascontiguousarray(obj).view(np.uint8).data)
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(f"{type(obj).__name__}:{obj.shape};".encode())
+        _update(h, [str(c) for c in (obj.columns if isinstance(obj, pd.DataFrame) else [obj.name])])
+        _update(h, [str(d) for d in (obj.dtypes if isinstance(obj, pd.DataFrame) else [obj.dtype])])
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().view(np.uint8).data)
+    elif isinstance(obj, dict):
+        h.update(f"dict:{len(obj)};".encode())
+        for k in sorted(obj, key=repr):
+            _update(h, k)
+            _update(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}:{len(obj)};".encode())
+        for v in obj:
+            _update(h, v)
+    elif isinstance(obj, PredictionSet):
+        # 派生量缓存不影响图像，只哈希原始数据
+        _update(h, ["PredictionSet", obj.y_true, obj.y_pred, obj.categories, obj.extra, obj.name])
+    elif isinstance(obj, np.generic):
+        _update(h, obj.item())
+    else:
+        # 其他对象（如颜色映射）按 repr 处理
+        h.update(f"{type(obj).__qualname__}:{obj!r};".encode())
+
+
+def _local_modules(module):
+    """模块自身及其（递归）引用的同目录脚本模块。"""
+    seen, stack = {}, [module]
+    while stack:
+        mod = stack.pop()
+        path = getattr(mod, "__file__", None)
+        if path is None or os.path.dirname(os.path.abspath(path)) != SCRIPTS_DIR or mod.__name__ in seen:
+            continue
+        seen[mod.__name__] = path
+        for value in vars(mod).values():
+            ref = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+            if ref is not None:
+                stack.append(ref)
+    return seen
+
+
+@functools.lru_cache(maxsize=None)
+def environment_digest(module_name):
+    """库版本 + 绘图脚本（及其依赖的同目录模块）源码的哈希。"""
+    module = sys.modules[module_name]
+    h = hashlib.blake2b(digest_size=20)
+    for lib in VERSIONED_LIBRARIES:
+        mod = sys.modules.get(lib)
+        h.update(f"{lib}={getattr(mod, '__version__', None)};".encode())
+    for name, path in sorted(_local_modules(module).items()):
+        h.update(f"{name}={file_digest(path)};".encode())
+    return h.hexdigest()
+
+
+# =========================================================
+# 🧩【渲染缓存】
+# =========================================================
+class RenderCache:
+    """
+    内容寻址的图像缓存：输入数据、参数、库版本与脚本源码都未变时，
+    直接把已缓存的输出文件链接/复制到目标路径，跳过绘图。
+
+    缓存目录结构：<cache_dir>/<键前两位>/<键>/{输出参数名}.<扩展名>、result.pkl、meta.json；
+    总大小超过 max_bytes 时按最近使用时间（LRU）淘汰。总大小在内存中累加估计，
+    只在估计值超限或写入量超过 RESCAN_FRACTION * max_bytes 时才扫描目录。
+
+    参数
+    ----------
+    cache_dir : str, optional
+        缓存目录，默认环境变量 RENDER_CACHE_DIR 或 ~/.cache/matplotlib-demos/render
+    max_bytes : int
+        缓存总大小上限（字节）
+    link : bool
+        命中时优先硬链接（同一文件系统、不占额外空间），失败时复制
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=2 * 1024 ** 3, link=True):
+        self.cache_dir = cache_dir or os.environ.get(
+            "RENDER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "matplotlib-demos", "render"))
+        self.max_bytes = max_bytes
+        self.link = link
+        self.hits = self.misses = 0
+        self._total_bytes = None      # 上次扫描得到的总大小 + 之后本实例写入的字节数
+        self._added_bytes = 0         # 上次扫描后本实例写入的字节数
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # ---------- 键 ----------
+    def key(self, name, kwargs):
+        """
+        计算缓存键；输出路径只取扩展名（决定格式），不影响键。
+        """
+        def placeholder(key, path):
+            return f"<{key}>{os.path.splitext(path)[1].lower() if path else ''}"
+        hashed_kwargs, _ = replace_outputs(name, kwargs, placeholder)
+        h = hashlib.blake2b(digest_size=20)
+        h.update(f"{name};{environment_digest(PLOT_FUNCTIONS[name]['module'])};".encode())
+        _update(h, hashed_kwargs)
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    # ---------- 调用 ----------
+    def call(self, name, **kwargs):
+        """
+        带缓存地调用绘图函数，返回 (函数返回值, 是否命中)。
+        """
+        func = get_plot_function(name)
+        # 未显式给出的输出路径使用函数默认值
+        kwargs = with_default_outputs(name, kwargs)
+        _, targets = replace_outputs(name, kwargs, lambda key, path: path)
+        # 值为 None 的输出（如 colorbar_file=None）不写文件，不参与缓存
+        targets = {key: path for key, path in targets.items() if path is not None}
+        if not targets or any(not isinstance(path, (str, os.PathLike)) for path in targets.values()):
+            # 无法确定输出文件（如仅显示不保存、输出到 ImageBuffer），不缓存
+            return func(**kwargs), False
+
+        key = self.key(name, kwargs)
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            try:
+                result = self._restore(entry, targets)
+                self.hits += 1
+                return result, True
+            except (OSError, pickle.UnpicklingError, EOFError):
+                shutil.rmtree(entry, ignore_errors=True)
+
+        self.misses += 1
+        for path in targets.values():
+            # 目标若是缓存文件的硬链接，先断开，避免原地覆盖写坏缓存
+            if os.path.exists(path) and os.stat(path).st_nlink > 1:
+                os.unlink(path)
+        result = func(**kwargs)
+        self._account(self._store(entry, name, targets, result))
+        return result, False
+
+    def wrap(self, name):
+        """返回带缓存的绘图函数，调用方式与原函数相同（仅接受关键字参数）。"""
+        def wrapper(**kwargs):
+            return self.call(name, **kwargs)[0]
+        return functools.wraps(get_plot_function(name))(wrapper)
+
+    # ---------- 读写 ----------
+    def _place(self, src, dst):
+        os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+        if os.path.lexists(dst):
+            os.unlink(dst)
+        if self.link:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)
+
+    def _restore(self, entry, targets):
+        for key, path in targets.items():
+            self._place(os.path.join(entry, self._filename(key, path)), path)
+        with open(os.path.join(entry, "result.pkl"), "rb") as f:
+            result = pickle.load(f)
+        os.utime(os.path.join(entry, "meta.json"))   # 记录最近使用时间
+        return result
+
+    @staticmethod
+    def _filename(key, path):
+        return key.replace(".", "_") + os.path.splitext(path)[1].lower()
+
+    def _store(self, entry, name, targets, result):
+        """写入一个条目，返回写入的字节数（失败或已被其他进程写入时为 0）。"""
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp_", dir=os.path.dirname(entry))
+        try:
+            size = 0
+            for key, path in targets.items():
+                dst = os.path.join(tmp, self._filename(key, path))
+                shutil.copyfile(path, dst)
+                size += os.path.getsize(dst)
+            try:
+                payload = pickle.dumps(result)
+            except Exception:
+                payload = pickle.dumps(None)
+            with open(os.path.join(tmp, "result.pkl"), "wb") as f:
+                f.write(payload)
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"function": name, "outputs": list(targets), "bytes": size + len(payload),
+                           "created": time.time()}, f)
+            # 原子替换；多个进程同时写入同一条目时保留先完成的一份
+            os.rename(tmp, entry)
+            return size + len(payload)
+        except OSError:
+            return 0
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    # ---------- 淘汰 ----------
+    def _account(self, added):
+        """累加写入量，估计总大小超限或写入量达到重新扫描阈值时才执行 evict。"""
+        if self._total_bytes is None:
+            self.evict()
+            return
+        self._total_bytes += added
+        self._added_bytes += added
+        if self._total_bytes > self.max_bytes or self._added_bytes > self.max_bytes * RESCAN_FRACTION:
+            self.evict()
+
+    def entries(self):
+        """返回 [(最近使用时间, 大小, 条目目录)]。"""
+        items = []
+        for prefix in os.scandir(self.cache_dir):
+            if not prefix.is_dir():
+                continue
+            for e in os.scandir(prefix.path):
+                meta = os.path.join(e.path, "meta.json")
+                try:
+                    with open(meta, "r", encoding="utf-8") as f:
+                        size = json.load(f)["bytes"]
+                    items.append((os.stat(meta).st_mtime, size, e.path))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return items
+
+    def evict(self):
+        """总大小超过上限时，按最近使用时间从旧到新删除条目，返回删除数量。"""
+        items = self.entries()
+        total = sum(size for _, size, _ in items)
+        removed = 0
+        for _, size, path in sorted(items):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        self._total_bytes, self._added_bytes = total, 0
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes, self._added_bytes = 0, 0
+
+
+# cache = RenderCache(max_bytes=5 * 1024 ** 3)
+#
+# # 直接调用：参数必须用关键字形式
+# cache.call("plot_mixed_correlation_heatmap", csv_file="features.csv", save_path="corr.jpg")
+#
+# # 或包装后像原函数一样使用
+# plot_metrics_radar = cache.wrap("plot_metrics_radar")
+# metrics_norm_df = plot_metrics_radar(csv_path="example_data.csv", length_col="Protein_Len",
+#                                      true_col="True", pred_col="Pred_fp", save_path="radar.png")
+#
+# # 批量渲染时启用：python batch_render.py jobs.jsonl --cache ~/.cache/matplotlib-demos/render
@@ -0,0 +1,311 @@
+import argparse
+import base64
+import http.client
+import io
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import batch_render
+from plot_registry import PLOT_FUNCTIONS, plot_modules, replace_outputs
+from worker_pool import RecyclingPool
+
+# 常驻进程预先加载的字体
+DEFAULT_FONTS = ["Times New Roman", "DejaVu Sans"]
+
+CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf",
+                 "jpg": "image/jpeg", "jpeg": "image/jpeg"}
+
+
+# =========================================================
+# 🧩【工作进程】—— 导入全部绘图模块、加载字体，之后常驻复用
+# =========================================================
+def _init_render_worker(modules, fonts):
+    batch_render._init_worker(modules)
+    from matplotlib import font_manager
+    from render_utils import new_figure
+
+    # 解析字体并实际渲染一次文字，字体文件与字形缓存常驻内存
+    fig = new_figure(figsize=(1, 1))
+    for family in fonts:
+        font_manager.findfont(font_manager.FontProperties(family=family))
+        fig.text(0.5, 0.5, "Ag 0.9", family=family)
+    fig.canvas.draw()
+
+
+def render_to_bytes(job, fmt="png"):
+    """
+    在工作进程中执行一个绘图请求，输出直接编码到内存（ImageBuffer），不经过磁盘。
+
+    返回
+    -------
+    result : dict
+        batch_render.run_job 的结果，另含 images（输出参数名 → 图像字节）
+    """
+    from render_utils import ImageBuffer
+
+    kwargs, buffers = replace_outputs(job["function"], job.get("kwargs", {}), lambda key, _: ImageBuffer(fmt))
+    result = batch_render.run_job({**job, "kwargs": kwargs})
+    result["outputs"] = list(buffers)
+    result["images"] = {key: buf.data for key, buf in buffers.items()} if result["ok"] else {}
+    return result
+
+
+# =========================================================
+# 🧩【渲染服务】—— 固定进程池 + 并发上限 + 工作进程定期回收
+# =========================================================
+class RenderService:
+    """
+    常驻渲染服务。
+
+    参数
+    ----------
+    workers : int
+        工作进程数
+    max_pending : int, optional
+        同时处理（排队 + 执行）的请求上限，超出时返回 503，默认 workers * 4
+    recycle_after : int
+        每个工作进程最多执行的任务数，达到后自动替换为新进程，防止内存泄漏累积
+    max_rss_mb : float, optional
+        工作进程常驻内存上限（MB），某个请求完成后超过即替换该进程
+    request_timeout : float
+        单个请求最长等待秒数
+    fonts : list[str]
+        工作进程启动时预加载的字体
+    """
+
+    def __init__(self, workers=2, max_pending=None, recycle_after=200, request_timeout=120.0,
+                 fonts=DEFAULT_FONTS, max_rss_mb=None):
+        self.workers = workers
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self.request_timeout = request_timeout
+        self.fonts = list(fonts)
+        self.slots = threading.BoundedSemaphore(max_pending or workers * 4)
+        self.n_served = 0
+        self._lock = threading.Lock()
+        self._pool = RecyclingPool(
+            max_workers=self.workers, initializer=_init_render_worker, initargs=(plot_modules(), self.fonts),
+            max_tasks_per_child=self.recycle_after,
+            max_rss_bytes=None if max_rss_mb is None else int(max_rss_mb * 1024 ** 2),
+        )
+
+    def warm_up(self):
+        """等待所有工作进程完成启动（导入模块、加载字体）。"""
+        futures = [self._pool.submit(time.sleep, 0.05) for _ in range(self.workers)]
+        for f in futures:
+            f.result()
+
+    def render(self, job, fmt="png"):
+        """
+        执行一个绘图请求；并发已满时立即返回 None。
+
+        并发名额在任务真正结束时才归还：请求超时后任务仍在工作进程中运行（或排队），
+        此时仍计入 max_pending，避免超时请求不断累积到进程池队列中。
+        """
+        if not self.slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._pool.submit(render_to_bytes, job, fmt)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        # 工作进程异常退出（如段错误、被 OOM 终止）时只有该请求失败（BrokenProcessPool），
+        # 进程池自动补充新进程
+        result = future.result(timeout=self.request_timeout)
+        with self._lock:
+            self.n_served += 1
+        return result
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+# =========================================================
+# 🧩【HTTP 接口】
+# =========================================================
+# GET  /health  → {"functions": [...], "workers": n, "served": k, "recycled": r, "crashed": c,
+#                  "peak_worker_rss_mb": m}
+# POST /render  → 请求体为 JSON 任务（同 batch_render 清单格式，无需输出路径），
+#                 可选 "format"（默认 png，须为编码格式，不支持 rgba）；单个输出时直接返回图像字节，
+#                 多个输出（如热图 + colorbar）时返回 {输出参数名: base64}。
+class RenderHandler(BaseHTTPRequestHandler):
+    server_version = "RenderServer/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send(404, {"error": "not found"})
+        service = self.server.service
+        pool = service._pool
+        self._send(200, {"functions": sorted(PLOT_FUNCTIONS), "workers": service.workers,
+                         "served": service.n_served, "recycled": pool.n_recycled, "crashed": pool.n_crashed,
+                         "peak_worker_rss_mb": round(pool.peak_rss_bytes / 2 ** 20, 1)})
+
+    def do_POST(self):
+        if self.path != "/render":
+            return self._send(404, {"error": "not found"})
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if not isinstance(job, dict):
+                raise ValueError(f"请求体必须是 JSON 对象，而不是 {type(job).__name__}")
+            if job.get("function") not in PLOT_FUNCTIONS:
+                raise ValueError(f"未注册的绘图函数: {job.get('function')}")
+            fmt = job.pop("format", "png")
+            if not isinstance(fmt, str) or fmt.lower() == "rgba":
+                # rgba 不编码（ImageBuffer.data 为空），无法作为图像字节返回
+                raise ValueError(f"不支持的输出格式: {fmt}（需为编码格式，如 png / svg / pdf）")
+        except (ValueError, TypeError) as e:
+            return self._send(400, {"error": str(e)})
+
+        job.setdefault("id", "request")
+        try:
+            result = self.server.service.render(job, fmt)
+        except FutureTimeoutError:
+            return self._send(504, {"error": "render timeout"})
+        except BrokenProcessPool:
+            return self._send(500, {"error": "worker crashed; replaced"})
+        if result is None:
+            return self._send(503, {"error": "server busy"})
+        if not result["ok"]:
+            return self._send(422, {"error": result["error"]})
+
+        images = result["images"]
+        if len(images) == 1:
+            self._send(200, next(iter(images.values())), CONTENT_TYPES.get(fmt, "application/octet-stream"))
+        else:
+            self._send(200, {k: base64.b64encode(v).decode("ascii") for k, v in images.items()})
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.TCPServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+
+def serve(host="127.0.0.1", port=8765, socket_path=None, quiet=True, **service_kwargs):
+    """
+    启动渲染服务（阻塞）。给定 socket_path 时监听 Unix 套接字，否则监听 host:port。
+    """
+    service = RenderService(**service_kwargs)
+    service.warm_up()
+    if socket_path is not None:
+        server = UnixHTTPServer(socket_path, RenderHandler)
+        where = socket_path
+    else:
+        server = ThreadingHTTPServer((host, port), RenderHandler)
+        where = f"http://{host}:{port}"
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    print(f"渲染服务已启动: {where}（{service.workers} 个工作进程）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# =========================================================
+# 🧩【客户端】
+# =========================================================
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def encode_array(arr):
+    """将数组编码为 {"npy_b64": ...} 输入规格，比 JSON 列表更快、无精度损失。"""
+    import numpy as np
+    buf = io.BytesIO()
+    np.save(buf, np.asarray(arr), allow_pickle=False)
+    return {"npy_b64": base64.b64encode(buf.getvalue()).decode("ascii")}
+
+
+def render_remote(function, kwargs=None, inputs=None, fmt="png",
+                  host="127.0.0.1", port=8765, socket_path=None, timeout=300):
+    """
+    向渲染服务提交一个绘图请求。
+
+    返回
+    -------
+    image : bytes or dict
+        单个输出时为图像字节，多个输出时为 {输出参数名: 字节}
+    """
+    payload = json.dumps({"function": function, "kwargs": kwargs or {},
+                          "inputs": inputs or {}, "format": fmt}).encode("utf-8")
+    conn = (_UnixHTTPConnection(socket_path, timeout=timeout) if socket_path is not None
+            else http.client.HTTPConnection(host, port, timeout=timeout))
+    try:
+        conn.request("POST", "/render", body=payload, headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        body = resp.read()
+    finally:
+        conn.close()
+    if resp.status != 200:
+        raise RuntimeError(f"渲染失败 ({resp.status}): {json.loads(body).get('error')}")
+    if resp.getheader("Content-Type") == "application/json":
+        return {k: base64.b64decode(v) for k, v in json.loads(body).items()}
+    return body
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="常驻本地渲染服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", default=None, help="Unix 套接字路径（给定时不监听 TCP）")
+    parser.add_argument("-j", "--workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=None, help="并发请求上限")
+    parser.add_argument("--recycle-after", type=int, default=200, help="每个工作进程最多执行的任务数")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="工作进程常驻内存上限（MB），超过后替换")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单个请求超时秒数")
+    parser.add_argument("--verbose", action="store_true", help="打印访问日志")
+    args = parser.parse_args()
+
+    serve(host=args.host, port=args.port, socket_path=args.socket, quiet=not args.verbose,
+          workers=args.workers, max_pending=args.max_pending,
+          recycle_after=args.recycle_after, request_timeout=args.timeout, max_rss_mb=args.max_rss_mb)
+
+# python render_server.py --socket /tmp/render.sock -j 4
+
+# from render_server import render_remote, encode_array
+# png = render_remote("plot_residual_hist", socket_path="/tmp/render.sock",
+#                     inputs={"y_true": encode_array(y_true), "y_pred": encode_array(y_pred)})
+# open("residual_hist.png", "wb").write(png)
@@ -0,0 +1,470 @@
+import contextvars
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.text import Text
+
+from profiling import active, count, mark
+
+# =========================================================
+# 🧩【样式作用域】—— rcParams 是进程级全局状态
+# =========================================================
+# 绘图函数在创建图元和保存时都会读取 rcParams。不改样式的绘图可以在多个线程中
+# 同时进行（共享锁）；需要临时修改样式的绘图独占执行，退出时恢复原样式（独占锁），
+# 这样既不会把样式泄漏给其他图，也不会读到其他线程的临时样式。
+
+class _StyleLock:
+    """读写锁：共享段可并发、可嵌套；独占段在同一线程内可重入。"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = {}        # 线程 id → 共享段嵌套层数
+        self._writer = None       # 持有独占锁的线程 id
+        self._writer_depth = 0
+
+    @contextmanager
+    def shared(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                while self._writer is not None:
+                    self._cond.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers[me] -= 1
+                if not self._readers[me]:
+                    del self._readers[me]
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                if me in self._readers:
+                    raise RuntimeError("不能在共享样式段内嵌套修改样式的绘图")
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._writer, self._writer_depth = me, 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                self._cond.notify_all()
+
+
+_style_lock = _StyleLock()
+
+
+@contextmanager
+def scoped_style(rc=None):
+    """
+    在作用域内应用样式 rc（dict），退出时恢复；rc 为空时不修改样式、允许并发。
+
+    绘图函数应把建图、绘制和保存都放在同一个 scoped_style 作用域内；
+    作用域内创建的 Figure 在退出时释放（见 managed_figures）。
+    """
+    if not rc:
+        with _style_lock.shared(), managed_figures():
+            yield
+    else:
+        with _style_lock.exclusive(), matplotlib.rc_context(rc), managed_figures():
+            yield
+
+
+# =========================================================
+# 🧩【Figure 生命周期】—— 作用域结束即释放，不等待循环垃圾回收
+# =========================================================
+# Figure 与其中的图元互相引用，不再使用后只能由循环垃圾回收释放；回收之前，
+# 每张图的 Agg 像素缓冲区（300 dpi 的 8×6 英寸图约 17 MB）一直占用内存，
+# 同一进程连续绘图时 RSS 会涨到数百 MB。new_figure 创建的图登记在当前
+# managed_figures 作用域中，作用域结束时（包括异常退出）立即释放。
+# scoped_style 自带该作用域，因此每个绘图函数返回时它创建的图都已释放。
+#
+# 高 dpi 的像素缓冲区与 PNG 编码的中间缓冲区由 C 代码分配，glibc 释放后往往留在
+# 进程堆中而不归还系统（600 dpi 的雷达图连续绘制 20 次 RSS 可达 700 MB+）；
+# 释放的缓冲区合计较大时，作用域结束后调用 malloc_trim 把空闲页归还系统。
+
+_live_figures = contextvars.ContextVar("live_figures", default=None)
+
+TRIM_THRESHOLD_BYTES = 16 * 2 ** 20
+_malloc_trim = None
+
+
+def _trim_native_heap():
+    global _malloc_trim
+    if _malloc_trim is None:
+        try:
+            import ctypes
+            _malloc_trim = ctypes.CDLL("libc.so.6").malloc_trim
+        except (OSError, AttributeError):   # 非 glibc 平台
+            _malloc_trim = False
+    if _malloc_trim:
+        _malloc_trim(0)
+
+
+def release_figure(fig):
+    """
+    释放 Figure 占用的资源：关闭 pyplot 窗口、清空图元（断开循环引用）、丢弃 Agg 像素缓冲区。
+    已取出的 ImageBuffer("rgba").array 仍持有原缓冲区，不受影响。
+
+    返回
+    -------
+    n_bytes : int
+        丢弃的像素缓冲区大小
+    """
+    if getattr(fig.canvas, "manager", None) is not None:
+        import matplotlib.pyplot as plt
+        plt.close(fig)
+    # Text 绘制时保存渲染器引用，清空后仍在循环引用中存活，会把像素缓冲区一起留到垃圾回收
+    for text in fig.findobj(Text):
+        text._renderer = None
+    fig.clear()
+    canvas = fig.canvas
+    n_bytes = 0
+    if isinstance(canvas, FigureCanvasAgg):
+        renderer = getattr(canvas, "renderer", None)
+        if renderer is not None:
+            n_bytes = int(renderer.width * renderer.height * 4)
+        canvas.renderer = None
+        canvas._lastKey = None
+    return n_bytes
+
+
+@contextmanager
+def managed_figures():
+    """
+    作用域内由 new_figure / new_subplots 创建的 Figure 在退出时全部释放（可嵌套，内层各自释放）。
+
+        with managed_figures():
+            fig = new_figure()
+            ...
+            save_figure(fig, "out.png")
+    """
+    figures = []
+    token = _live_figures.set(figures)
+    try:
+        yield figures
+    finally:
+        _live_figures.reset(token)
+        if sum(release_figure(fig) for fig in figures) >= TRIM_THRESHOLD_BYTES:
+            _trim_native_heap()
+
+
+# =========================================================
+# 🧩【Figure 创建与保存】—— 不经过 pyplot 状态机
+# =========================================================
+def new_figure(figsize=None, show=False, **fig_kw):
+    """
+    创建独立的 Figure 并绑定 Agg 画布；不注册到 pyplot，线程安全、无需 plt.close。
+    show=True 时改为由 pyplot 管理（需要弹出窗口显示）。
+    在 managed_figures（或 scoped_style）作用域内创建时，作用域结束即释放。
+    """
+    if show:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=figsize, **fig_kw)
+    else:
+        fig = Figure(figsize=figsize, **fig_kw)
+        FigureCanvasAgg(fig)
+    figures = _live_figures.get()
+    if figures is not None:
+        figures.append(fig)
+    return fig
+
+
+def new_subplots(nrows=1, ncols=1, figsize=None, show=False, squeeze=True, subplot_kw=None,
+                 gridspec_kw=None, **fig_kw):
+    """与 plt.subplots 用法相同，但使用 new_figure 创建的独立 Figure。"""
+    fig = new_figure(figsize=figsize, show=show, **fig_kw)
+    axes = fig.subplots(nrows, ncols, squeeze=squeeze, subplot_kw=subplot_kw, gridspec_kw=gridspec_kw)
+    return fig, axes
+
+
+def save_figure(fig, save_path=None, show=False, **savefig_kwargs):
+    """
+    保存并（可选）显示图像；pyplot 管理的图在显示后关闭。
+    save_path 可以是文件路径、文件对象，或实现 capture(fig, **savefig_kwargs) 的输出目标：
+    ImageBuffer（在内存中输出）、FigureExport（一次绘制输出多种格式）、
+    encode_pipeline.PipelineTarget（后台编码写盘）。
+    """
+    if active():
+        count("figures")
+        count("artists", len(fig.findobj()))
+    mark("artists")
+    if hasattr(save_path, "capture"):
+        save_path.capture(fig, **savefig_kwargs)
+    elif save_path is not None:
+        fig.savefig(save_path, **savefig_kwargs)
+    if save_path is not None:
+        mark("encode")
+        if active():
+            count("bytes_written", _written_bytes(save_path))
+    if show:
+        import matplotlib.pyplot as plt
+        plt.show()
+        plt.close(fig)
+
+
+def _written_bytes(target):
+    if isinstance(target, (str, os.PathLike)):
+        return os.path.getsize(target) if os.path.exists(target) else 0
+    if isinstance(target, ImageBuffer):
+        return len(target.data) if target.data is not None else target.array.nbytes
+    if isinstance(target, FigureExport):
+        return sum(os.path.getsize(p) for p in target.paths)
+    return 0
+
+
+# =========================================================
+# 🧩【内存输出】—— 不经过磁盘，直接得到编码后的字节或 RGBA 像素
+# =========================================================
+# 任何绘图函数的输出路径参数（save_path、heatmap_file、config["output_file"] 等）
+# 都可以传入 ImageBuffer，绘图完成后从中取结果：
+#   buf = ImageBuffer("png");  plot_residual_hist(y_true, y_pred, save_path=buf);  buf.data
+#   buf = ImageBuffer("rgba"); plot_residual_hist(y_true, y_pred, save_path=buf);  buf.array
+
+RASTER_FORMATS = ("png", "jpg", "jpeg", "tif", "tiff", "webp")
+
+
+class ImageBuffer:
+    """
+    内存中的图像输出目标。
+
+    参数
+    ----------
+    format : str
+        "png" / "jpg" / "svg" / "pdf" 等编码格式，或 "rgba"（不编码，返回像素数组）
+    dpi : float, optional
+        覆盖绘图函数自身的 dpi（如网页预览使用较低分辨率）
+    **savefig_kwargs
+        覆盖绘图函数传给 savefig 的其他参数
+
+    属性
+    ----------
+    data : bytes
+        编码后的图像（format 不为 "rgba" 时）
+    array : np.ndarray, shape (H, W, 4), uint8
+        Agg 画布像素缓冲区的只读视图（format 为 "rgba" 时，零拷贝）
+    """
+
+    def __init__(self, format="png", dpi=None, **savefig_kwargs):
+        self.format = format.lower()
+        self.dpi = dpi
+        self.savefig_kwargs = savefig_kwargs
+        self.data = None
+        self.array = None
+
+    def __repr__(self):
+        if self.array is not None:
+            return f"<ImageBuffer rgba {self.array.shape[1]}x{self.array.shape[0]}>"
+        size = "empty" if self.data is None else f"{len(self.data)} bytes"
+        return f"<ImageBuffer {self.format} {size}>"
+
+    def getvalue(self):
+        """返回 data（编码格式）或 array（rgba）。"""
+        return self.array if self.format == "rgba" else self.data
+
+    def capture(self, fig, **savefig_kwargs):
+        """把 fig 写入缓冲区（由 save_figure 调用）。"""
+        kwargs = {**savefig_kwargs, **self.savefig_kwargs}
+        if self.dpi is not None:
+            kwargs["dpi"] = self.dpi
+        if self.format == "rgba":
+            self._capture_rgba(fig, kwargs)
+            return
+        if self.format not in RASTER_FORMATS:
+            kwargs.pop("pil_kwargs", None)   # 矢量格式不接受 PIL 参数
+        stream = io.BytesIO()
+        fig.savefig(stream, format=self.format, **kwargs)
+        self.data = stream.getvalue()
+
+    def _capture_rgba(self, fig, kwargs):
+        canvas = fig.canvas if isinstance(fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(fig)
+        # 按 savefig 的流程绘制（dpi、bbox_inches 等处理与编码输出一致），
+        # 写出的原始字节直接丢弃，随后取渲染器缓冲区的视图
+        fig.savefig(_DiscardStream(), format="rgba", **kwargs)
+        pixels = np.asarray(canvas.renderer.buffer_rgba())
+        pixels.flags.writeable = False
+        self.array = pixels
+
+
+class _DiscardStream(io.RawIOBase):
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return len(data)
+
+
+
+# =========================================================
+# 🧩【多格式导出】—— 一次布局、一次 tight bbox、栅格格式同 dpi 只绘制一次
+# =========================================================
+VECTOR_FORMATS = ("pdf", "svg", "eps", "ps")
+
+
+class FigureExport:
+    """
+    多格式输出目标：传给任意绘图函数的输出路径参数，一次调用写出 PNG / PDF / SVG 等。
+
+    bbox_inches="tight" 的裁剪框只计算一次（不渲染的布局绘制），之后各格式直接使用；
+    同一 dpi 的栅格格式（png、jpg 等）共用一次 Agg 绘制，只重复编码；
+    矢量格式各由对应后端绘制一次。
+
+    参数
+    ----------
+    stem : str
+        输出路径（扩展名会被去掉，按格式重新添加）
+    formats : list[str]
+        输出格式
+    dpi : float or dict, optional
+        统一 dpi，或 {格式: dpi 或 dpi 列表}；未给出的格式使用绘图函数自身的 dpi。
+        同一格式有多个 dpi 时文件名为 <stem>_<dpi>dpi.<格式>
+    **savefig_kwargs
+        覆盖绘图函数传给 savefig 的其他参数
+
+    属性
+    ----------
+    paths : list[str]
+        已写出的文件
+    """
+
+    def __init__(self, stem, formats=("png", "pdf", "svg"), dpi=None, **savefig_kwargs):
+        root, ext = os.path.splitext(os.fspath(stem))
+        self.stem = root if ext.lower().lstrip(".") in RASTER_FORMATS + VECTOR_FORMATS else os.fspath(stem)
+        self.formats = [f.lower() for f in formats]
+        self.dpi = dpi
+        self.savefig_kwargs = savefig_kwargs
+        self.paths = []
+
+    def __repr__(self):
+        return f"<FigureExport {self.stem}.{{{','.join(self.formats)}}}>"
+
+    def targets(self, default_dpi):
+        """返回 [(格式, dpi, 路径)]。"""
+        out = []
+        for fmt in self.formats:
+            dpis = self.dpi.get(fmt, default_dpi) if isinstance(self.dpi, dict) else self.dpi or default_dpi
+            dpis = dpis if isinstance(dpis, (list, tuple)) else [dpis]
+            for d in dpis:
+                suffix = f"_{d:g}dpi" if len(dpis) > 1 else ""
+                out.append((fmt, d, f"{self.stem}{suffix}.{fmt}"))
+        return out
+
+    def capture(self, fig, **savefig_kwargs):
+        """把 fig 写出为全部格式（由 save_figure 调用）。"""
+        from matplotlib.image import imsave
+
+        kwargs = {**savefig_kwargs, **self.savefig_kwargs}
+        default_dpi = kwargs.pop("dpi", matplotlib.rcParams["savefig.dpi"])
+        if default_dpi == "figure":
+            default_dpi = fig.dpi
+        pil_kwargs = kwargs.pop("pil_kwargs", None)
+        metadata = kwargs.pop("metadata", None)
+        if kwargs.get("bbox_inches") == "tight":
+            # 只做布局、不光栅化，得到各格式共用的裁剪框（英寸）
+            # 文字度量与 dpi 有关，按主 dpi 计算，与单独 savefig 的结果一致
+            pad = kwargs.pop("pad_inches", matplotlib.rcParams["savefig.pad_inches"])
+            canvas = fig.canvas if isinstance(fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(fig)
+            fig_dpi = fig.dpi
+            try:
+                fig.set_dpi(default_dpi)
+                fig.draw_without_rendering()
+                kwargs["bbox_inches"] = fig.get_tightbbox(canvas.get_renderer()).padded(pad)
+            finally:
+                fig.set_dpi(fig_dpi)
+
+        targets = self.targets(default_dpi)
+        os.makedirs(os.path.dirname(os.path.abspath(self.stem)), exist_ok=True)
+        raster = {}
+        for fmt, d, path in targets:
+            if fmt in RASTER_FORMATS:
+                raster.setdefault(d, []).append((fmt, path))
+            else:
+                fig.savefig(path, format=fmt, dpi=d, metadata=metadata, **kwargs)
+                self.paths.append(path)
+
+        for d, items in raster.items():
+            buf = ImageBuffer("rgba")
+            buf.capture(fig, dpi=d, **kwargs)
+            for fmt, path in items:
+                # 与 Agg 后端 savefig 相同的编码路径（PIL），只是跳过重复绘制
+                imsave(path, buf.array, format=fmt, origin="upper", dpi=d, metadata=metadata,
+                       pil_kwargs=None if pil_kwargs is None else dict(pil_kwargs))
+                self.paths.append(path)
+
+
+def render_image(name, format="png", dpi=None, **kwargs):
+    """
+    调用注册表中的绘图函数并在内存中返回图像，不写磁盘。
+
+    参数
+    ----------
+    name : str
+        plot_registry.PLOT_FUNCTIONS 中的函数名
+    format : str
+        编码格式或 "rgba"
+    dpi : float, optional
+        覆盖绘图函数自身的 dpi
+    **kwargs
+        绘图函数参数（输出路径参数会被忽略）
+
+    返回
+    -------
+    image : bytes or np.ndarray or dict
+        单个输出时为字节 / RGBA 数组，多个输出（如热图 + colorbar）时为 {输出参数名: 图像}
+    result
+        绘图函数自身的返回值
+    """
+    from plot_registry import get_plot_function, replace_outputs
+
+    kwargs, buffers = replace_outputs(name, kwargs, lambda key, _: ImageBuffer(format, dpi=dpi))
+    result = get_plot_function(name)(**kwargs)
+    images = {key: buf.getvalue() for key, buf in buffers.items()}
+    return (next(iter(images.values())) if len(images) == 1 else images), result
+
+
+def export_plot(name, stem, formats=("png", "pdf", "svg"), dpi=None, **kwargs):
+    """
+    调用注册表中的绘图函数，一次绘制写出多种格式。
+
+    参数
+    ----------
+    name : str
+        plot_registry.PLOT_FUNCTIONS 中的函数名
+    stem : str
+        输出路径（不含扩展名）；有多个输出（如热图 + colorbar）时追加 _<输出参数名>
+    formats, dpi
+        同 FigureExport
+    **kwargs
+        绘图函数参数（输出路径参数会被忽略）
+
+    返回
+    -------
+    paths : dict
+        输出参数名 → 写出的文件列表
+    result
+        绘图函数自身的返回值
+    """
+    from plot_registry import PLOT_FUNCTIONS, get_plot_function, replace_outputs
+
+    single = len(PLOT_FUNCTIONS[name]["outputs"]) == 1
+    kwargs, exports = replace_outputs(
+        name, kwargs,
+        lambda key, _: FigureExport(stem if single else f"{stem}_{key.replace('.', '_')}", formats, dpi))
+    result = get_plot_function(name)(**kwargs)
+    return {key: exp.paths for key, exp in exports.items()}, result
@@ -0,0 +1,221 @@
+import importlib.util
+import os
+
+import numpy as np
+
+# =========================================================
+# 🧩【表格读取】—— CSV / Parquet / Arrow IPC（Feather），只读所需列、紧凑 dtype
+# =========================================================
+# 绘图函数只需要表中的两三列，但 pd.read_csv 默认按 float64 / object 解析整张表。
+# 这里统一：
+#   - 列投影：CSV 用 usecols（不转换其余列）；Parquet / Feather 只读取所需列的数据页
+#   - 紧凑 dtype：浮点列默认 float32（保留约 7 位有效数字，绘图与统计指标足够），
+#                 字符串列转为 category（整数编码 + 一份类别表）
+#   - Feather（未压缩的 Arrow IPC）以内存映射方式打开，无缺失值的数值列直接返回
+#     映射内存上的 NumPy 只读视图（零拷贝）
+# Parquet / Feather 需要 pyarrow；CSV 在安装了 pyarrow 时使用其多线程解析器，
+# 否则使用 pandas 的 C 解析器。
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".feather", ".arrow", ".ipc")
+
+# CSV 先读取的行数，用于判断各列类型后为整个文件指定 dtype
+CSV_SAMPLE_ROWS = 10_000
+
+
+def table_format(path):
+    """按扩展名判断表格格式："csv"、"parquet" 或 "arrow"。"""
+    name = os.fspath(path).lower()
+    if name.endswith(PARQUET_SUFFIXES):
+        return "parquet"
+    if name.endswith(ARROW_SUFFIXES):
+        return "arrow"
+    return "csv"
+
+
+def is_table_path(obj):
+    """是否为可由本模块读取的文件路径（而不是已在内存中的表）。"""
+    return isinstance(obj, (str, os.PathLike))
+
+
+def _has_pyarrow():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _require_pyarrow(fmt):
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(f"读取 {fmt} 文件需要安装 pyarrow（pip install pyarrow），或改用 CSV") from None
+    return pyarrow
+
+
+def table_columns(path):
+    """只读取表头，返回列名列表。"""
+    fmt = table_format(path)
+    if fmt == "csv":
+        import pandas as pd
+        return list(pd.read_csv(path, nrows=0).columns)
+    pa = _require_pyarrow(fmt)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+    import pyarrow.ipc
+    with pa.memory_map(os.fspath(path)) as source:
+        return list(pyarrow.ipc.open_file(source).schema.names)
+
+
+# ---------- CSV ----------
+def _csv_dtypes(path, columns, float_dtype, categorical):
+    import pandas as pd
+    sample = pd.read_csv(path, usecols=columns, nrows=CSV_SAMPLE_ROWS)
+    dtypes = {}
+    for c in sample.columns:
+        s = sample[c]
+        if s.dtype.kind == "f" and float_dtype is not None:
+            dtypes[c] = float_dtype
+        elif categorical and (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)):
+            dtypes[c] = "category"
+    return dtypes
+
+
+def _read_csv(path, columns, float_dtype, categorical):
+    import pandas as pd
+    dtypes = _csv_dtypes(path, columns, float_dtype, categorical)
+    engine = "pyarrow" if _has_pyarrow() else "c"
+    try:
+        return pd.read_csv(path, usecols=columns, dtype=dtypes, engine=engine)
+    except (ValueError, TypeError):
+        # 抽样之后的行出现了不符合推断类型的值：按默认类型解析后再转换
+        df = pd.read_csv(path, usecols=columns)
+        for c, dtype in dtypes.items():
+            if dtype == "category" or df[c].dtype.kind == "f":
+                df[c] = df[c].astype(dtype)
+        return df
+
+
+# ---------- Parquet / Arrow ----------
+def _read_arrow(path, columns, fmt):
+    _require_pyarrow(fmt)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns, memory_map=True)
+    import pyarrow.feather as feather
+    return feather.read_table(path, columns=columns, memory_map=True)
+
+
+def _arrow_to_numpy(col, float_dtype, categorical):
+    """ChunkedArray → np.ndarray（数值列尽量零拷贝）或 pd.Categorical。"""
+    import pyarrow as pa
+    typ = col.type
+    if pa.types.is_floating(typ) or pa.types.is_integer(typ):
+        if col.num_chunks == 1 and col.null_count == 0:
+            values = col.chunk(0).to_numpy(zero_copy_only=True)   # 映射内存上的只读视图
+        else:
+            values = col.to_numpy()   # 多块拼接或缺失值转为 NaN 时需要复制
+        if pa.types.is_floating(typ) and float_dtype is not None and values.dtype != float_dtype:
+            values = values.astype(float_dtype)
+        return values
+    if categorical and (pa.types.is_dictionary(typ) or pa.types.is_string(typ) or pa.types.is_large_string(typ)):
+        import pandas as pd
+        import pyarrow.compute as pc
+        if not pa.types.is_dictionary(typ):
+            col = pc.dictionary_encode(col)
+        combined = col.unify_dictionaries().combine_chunks()
+        codes = combined.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+        return pd.Categorical.from_codes(codes, categories=combined.dictionary.to_pylist())
+    return col.to_numpy()
+
+
+# ---------- 对外接口 ----------
+def read_arrays(path, columns=None, float_dtype=np.float32, categorical=True):
+    """
+    读取表中指定列，返回 {列名: 一维数组}。
+
+    参数
+    ----------
+    path : str or PathLike
+        .csv（含 .csv.gz 等）、.parquet / .pq、.feather / .arrow / .ipc
+    columns : list[str], optional
+        需要的列，默认全部；只读取这些列
+    float_dtype : dtype or None
+        浮点列的 dtype，默认 float32；None 保持文件中的精度（CSV 为 float64）。
+        下游会转换为 float64 的代码（如 PredictionSet）应传 np.float64，避免再复制一次
+    categorical : bool
+        字符串列是否转为 pd.Categorical
+
+    返回
+    -------
+    arrays : dict
+        列名 → np.ndarray（C 连续）或 pd.Categorical；顺序与 columns 一致。
+        Feather / Parquet 中无缺失值的数值列可能是只读视图
+    """
+    columns = None if columns is None else list(dict.fromkeys(columns))
+    fmt = table_format(path)
+    if fmt == "csv":
+        df = _read_csv(path, columns, float_dtype, categorical)
+        names = columns or list(df.columns)
+        arrays = {}
+        for c in names:
+            s = df[c]
+            arrays[c] = s.array if s.dtype == "category" else np.ascontiguousarray(s.to_numpy())
+        return arrays
+    table = _read_arrow(path, columns, fmt)
+    names = columns or table.column_names
+    return {c: _arrow_to_numpy(table.column(c), float_dtype, categorical) for c in names}
+
+
+def read_table(path, columns=None, float_dtype=np.float32, categorical=True):
+    """
+    与 read_arrays 相同，但返回 DataFrame（各列直接使用读取得到的数组，不再合并复制）。
+    """
+    import pandas as pd
+    return pd.DataFrame(read_arrays(path, columns, float_dtype, categorical), copy=False)
+
+
+def iter_table_chunks(path, columns, chunksize=1_000_000, dtype=None):
+    """
+    分块读取（流式计算用），每块为只含 columns 的 DataFrame。
+
+    参数
+    ----------
+    dtype : dict, optional
+        列名 → dtype（CSV 在解析时使用，Parquet / Arrow 在每块转换后使用）
+    """
+    import pandas as pd
+    fmt = table_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunksize)
+        return
+    pa = _require_pyarrow(fmt)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunksize, columns=columns)
+    else:
+        import pyarrow.ipc
+        source = pa.memory_map(os.fspath(path))
+        reader = pyarrow.ipc.open_file(source)
+        batches = (reader.get_batch(i).select(columns) for i in range(reader.num_record_batches))
+    for batch in batches:
+        chunk = batch.to_pandas()
+        yield chunk if dtype is None else chunk.astype(dtype)
+
+
+def write_table(df, path, **kwargs):
+    """按扩展名写出 DataFrame（CSV 不写索引）；用于把 CSV 转存为列式格式。"""
+    fmt = table_format(path)
+    if fmt == "csv":
+        df.to_csv(path, index=False, **kwargs)
+    elif fmt == "parquet":
+        _require_pyarrow(fmt)
+        df.to_parquet(path, index=False, **kwargs)
+    else:
+        _require_pyarrow(fmt)
+        df.reset_index(drop=True).to_feather(path, **kwargs)
+    return path
+
+# 一次性转存，之后的读取只需要几秒：
+# from table_io import read_table, write_table
+# write_table(read_table("predictions.csv", float_dtype=None), "predictions.feather", compression="uncompressed")
+#
+# arrays = read_arrays("predictions.feather", ["Protein_Len", "True", "Pred"])
@@ -0,0 +1,264 @@
+import collections
+import itertools
+import os
+import sys
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import Pipe, get_context
+from multiprocessing.connection import wait
+
+# =========================================================
+# 🧩【可回收进程池】—— 按任务数或常驻内存（RSS）上限替换工作进程
+# =========================================================
+# 长时间运行的批处理中，matplotlib 的字体 / 文本缓存、numpy 内存碎片等会让工作进程
+# 的常驻内存缓慢增长。ProcessPoolExecutor 只能按任务数回收（max_tasks_per_child），
+# 这里的 RecyclingPool 在每个任务完成后检查当前 RSS，超过上限的进程交回结果后退出，
+# 由新进程接替；某个进程异常退出（段错误、被 OOM 终止）时只让它正在执行的任务失败，
+# 其余任务与进程不受影响。
+
+
+def current_rss_bytes():
+    """当前进程的常驻内存（字节）；非 Linux 平台退化为峰值 RSS。"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024   # Linux 单位为 KB
+
+
+def _worker_main(conn, initializer, initargs, max_rss_bytes, max_tasks):
+    if initializer is not None:
+        initializer(*initargs)
+    n_done = 0
+    while True:
+        item = conn.recv()
+        if item is None:
+            return
+        task_id, fn, args, kwargs = item
+        try:
+            ok, value = True, fn(*args, **kwargs)
+        except Exception as e:
+            ok, value = False, e
+        n_done += 1
+        rss = current_rss_bytes()
+        retire = ((max_tasks is not None and n_done >= max_tasks)
+                  or (max_rss_bytes is not None and rss > max_rss_bytes))
+        try:
+            # 同步写入各自的管道：进程随后退出或被终止都不会丢失已完成的结果
+            conn.send((task_id, ok, value, rss, retire))
+        except Exception as e:   # 结果或异常无法序列化
+            conn.send((task_id, False, RuntimeError(f"结果无法传回: {e}"), rss, retire))
+        if retire:
+            return
+
+
+class RecyclingPool:
+    """
+    用法与 concurrent.futures.ProcessPoolExecutor 相同（submit / shutdown / with），
+    另按内存上限回收工作进程。
+
+    每个工作进程通过独立的管道收发任务（由管理线程逐个分派给空闲进程），
+    进程被终止时不会占住共享队列的锁，也不会影响其他进程。
+
+    参数
+    ----------
+    max_workers : int, optional
+        工作进程数，默认 CPU 核数
+    initializer, initargs :
+        每个（包括替换后的）工作进程启动时执行
+    max_rss_bytes : int, optional
+        任务完成后进程 RSS 超过此值即退出并由新进程替换
+    max_tasks_per_child : int, optional
+        每个工作进程最多执行的任务数
+    mp_context : multiprocessing context, optional
+        默认 spawn（管理线程运行时 fork 不安全）
+
+    属性
+    ----------
+    n_recycled : int
+        因达到上限而被替换的进程数
+    n_crashed : int
+        异常退出的进程数
+    peak_rss_bytes : int
+        各任务完成时观测到的最大工作进程 RSS
+    """
+
+    def __init__(self, max_workers=None, initializer=None, initargs=(), max_rss_bytes=None,
+                 max_tasks_per_child=None, mp_context=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_rss_bytes = max_rss_bytes
+        self.max_tasks_per_child = max_tasks_per_child
+        self.n_recycled = 0
+        self.n_crashed = 0
+        self.peak_rss_bytes = 0
+        self._ctx = mp_context or get_context("spawn")
+        self._init = (initializer, initargs)
+        self._pending = collections.deque()   # (task_id, fn, args, kwargs)，尚未分派
+        self._futures = {}                    # task_id → Future（已提交、未完成）
+        self._workers = {}                    # worker_id → (Process, Connection)
+        self._idle = []                       # 空闲的 worker_id
+        self._running = {}                    # worker_id → task_id
+        self._retiring = set()
+        self._crash_streak = 0                # 连续异常退出次数（期间没有任何任务完成）
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._wake_r, self._wake_w = Pipe(duplex=False)
+        self._shutdown = False
+        for _ in range(self.max_workers):
+            self._spawn()
+        self._manager = threading.Thread(target=self._manage, name="RecyclingPool", daemon=True)
+        self._manager.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown(wait=True)
+
+    def _spawn(self):
+        worker_id = next(self._ids)
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(
+            target=_worker_main, daemon=True,
+            args=(child_conn, *self._init, self.max_rss_bytes, self.max_tasks_per_child))
+        proc.start()
+        child_conn.close()
+        self._workers[worker_id] = (proc, parent_conn)
+        self._idle.append(worker_id)
+
+    def _wake(self):
+        self._wake_w.send(None)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("进程池已关闭")
+            task_id = next(self._ids)
+            self._futures[task_id] = future
+            self._pending.append((task_id, fn, args, kwargs))
+        self._wake()
+        return future
+
+    # ---------- 管理线程：分派任务、分发结果、替换退出的进程 ----------
+    def _dispatch(self):
+        while self._idle:
+            with self._lock:
+                if not self._pending:
+                    return
+                item = self._pending.popleft()
+                future = self._futures[item[0]]
+            if not future.set_running_or_notify_cancel():
+                with self._lock:
+                    self._futures.pop(item[0], None)
+                continue
+            worker_id = self._idle.pop()
+            try:
+                self._workers[worker_id][1].send(item)
+            except Exception as e:   # 任务参数无法序列化
+                self._idle.append(worker_id)
+                with self._lock:
+                    self._futures.pop(item[0], None)
+                future.set_exception(e)
+                continue
+            self._running[worker_id] = item[0]
+
+    def _receive(self, worker_id, conn):
+        try:
+            task_id, ok, value, rss, retire = conn.recv()
+        except (EOFError, OSError):
+            return False
+        self._running.pop(worker_id, None)
+        self._crash_streak = 0
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+        if retire:
+            self._retiring.add(worker_id)
+        else:
+            self._idle.append(worker_id)
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+        return True
+
+    def _reap(self, worker_id):
+        proc, conn = self._workers.pop(worker_id)
+        while conn.poll() and self._receive(worker_id, conn):   # 退出前写出的结果
+            pass
+        conn.close()
+        proc.join()
+        if worker_id in self._idle:
+            self._idle.remove(worker_id)
+        task_id = self._running.pop(worker_id, None)
+        if worker_id in self._retiring:
+            self._retiring.discard(worker_id)
+            self.n_recycled += 1
+        elif not self._shutdown:
+            self.n_crashed += 1
+            self._crash_streak += 1
+        error = BrokenProcessPool(f"工作进程异常退出（exitcode={proc.exitcode}），任务未完成")
+        if task_id is not None:
+            with self._lock:
+                future = self._futures.pop(task_id, None)
+            future.set_exception(error)
+        if self._crash_streak > 2 * self.max_workers:
+            # 新进程持续无法完成任何任务（如 initializer 出错）：停止替换，排队任务全部失败
+            with self._lock:
+                self._shutdown = True
+                failed = [self._futures.pop(task_id) for task_id, *_ in self._pending]
+                self._pending.clear()
+            for future in failed:
+                future.set_exception(error)
+        with self._lock:
+            # 关闭过程中仍有排队任务时也要补充进程，保证任务执行完
+            respawn = not self._shutdown or bool(self._pending)
+        if respawn:
+            self._spawn()
+
+    def _manage(self):
+        while True:
+            self._dispatch()
+            with self._lock:
+                finished = self._shutdown and not self._pending and not self._running
+            if finished:
+                break
+            sentinels = {proc.sentinel: worker_id for worker_id, (proc, _) in self._workers.items()}
+            conns = {conn: worker_id for worker_id, (_, conn) in self._workers.items()}
+            for ready in wait([self._wake_r, *conns, *sentinels]):
+                if ready is self._wake_r:
+                    while self._wake_r.poll():
+                        self._wake_r.recv()
+                elif ready in conns and conns[ready] in self._workers:
+                    self._receive(conns[ready], ready)
+                elif ready in sentinels and sentinels[ready] in self._workers:
+                    self._reap(sentinels[ready])
+        for proc, conn in self._workers.values():
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for proc, conn in self._workers.values():
+            proc.join()
+            conn.close()
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """关闭进程池；cancel_futures=True 时取消尚未开始的任务。"""
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                for task_id, *_ in self._pending:
+                    self._futures.pop(task_id).cancel()
+                self._pending.clear()
+        self._wake()
+        if wait:
+            self._manager.join()
+
+# with RecyclingPool(4, max_rss_bytes=2 * 1024 ** 3) as pool:
+#     futures = [pool.submit(render_one, job) for job in jobs]
+#     results = [f.result() for f in futures]
+#     print(pool.n_recycled, pool.peak_rss_bytes / 2 ** 20)
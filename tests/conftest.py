@@ -0,0 +1,8 @@
+import os
+import sys
+
+import matplotlib
+
+# 各脚本以同目录模块名相互导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+matplotlib.use("Agg")
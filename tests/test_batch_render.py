@@ -0,0 +1,36 @@
+import os
+
+import batch_render
+from batch_render import render_batch
+
+
+def _resid_job(job_id, path, n_pred=5):
+    return {"id": job_id, "function": "plot_residual_hist",
+            "kwargs": {"y_true": [1.0, 2.0, 3.0, 4.0, 5.0], "y_pred": [1.1, 2.2, 2.9, 4.1, 5.3][:n_pred],
+                       "save_path": path}}
+
+
+def test_failing_job_in_encode_pipeline_mode(tmp_path):
+    good = str(tmp_path / "good.png")
+    bad = str(tmp_path / "bad.png")
+    report = str(tmp_path / "report.jsonl")
+    jobs = [_resid_job("good", good), _resid_job("bad", bad, n_pred=3)]   # y_pred 长度不符
+
+    results = render_batch(jobs, max_workers=2, threads=True, encode_threads=1,
+                           report_path=report, verbose=False)
+
+    assert [r["id"] for r in results] == ["good", "bad"]
+    assert results[0]["ok"] and os.path.exists(good)
+    assert not results[1]["ok"] and results[1]["error"]
+    assert not os.path.exists(bad)
+    assert os.path.exists(report)
+
+
+def test_thread_mode_cache_does_not_leak(tmp_path):
+    path = str(tmp_path / "r.png")
+    first = render_batch([_resid_job("a", path)], max_workers=1, threads=True,
+                         cache_dir=str(tmp_path / "cache"), verbose=False)
+    assert first[0]["ok"] and batch_render._cache is None
+
+    second = render_batch([_resid_job("a", path)], max_workers=1, threads=True, verbose=False)
+    assert second[0]["ok"] and not second[0]["cached"]
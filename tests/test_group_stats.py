@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from group_stats import bin_codes
+from plot_residual_scatter import plot_residual_scatter
+
+
+def test_bin_codes_ignores_nan_when_deriving_edges():
+    x = np.array([0.0, 1.0, np.nan, 2.0, 4.0])
+    codes, edges = bin_codes(x, 4)
+    np.testing.assert_allclose(edges, [0, 1, 2, 3, 4])
+    assert codes.tolist() == [0, 1, -1, 2, 3]
+
+
+def test_binned_residual_scatter_with_nan_truth(tmp_path):
+    rng = np.random.default_rng(0)
+    y_true = rng.normal(size=500)
+    y_pred = y_true + rng.normal(0, 0.3, 500)
+    y_true[7] = np.nan
+    stats = plot_residual_scatter(y_true, y_pred, mode="binned", bins=10, save_path=str(tmp_path / "r.png"))
+    assert stats["count"].sum() == 499
+
+
+def test_residual_scatter_rejects_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        plot_residual_scatter([1.0, 2.0], [1.0, 2.5], mode="bogus", save_path=str(tmp_path / "r.png"))
@@ -0,0 +1,31 @@
+import os
+
+import pandas as pd
+
+from heatmap import heatmap_value_range, plot_heatmap_batch, plot_heatmap_with_colorbar
+
+
+def test_batch_heatmap_from_table_with_label_column(tmp_path):
+    path = tmp_path / "scores.csv"
+    pd.DataFrame({"name": ["r1", "r2", "r3"], "A": [0.1, 0.5, 0.9], "B": [0.2, -0.4, 0.3]}).to_csv(path, index=False)
+    data = {"m1": str(path), "m2": {"A": [1.5, 0.0, 0.2], "B": [0.3, 0.1, 0.4]}}
+
+    out = plot_heatmap_batch(data, heatmap_file=str(tmp_path / "h_{name}.png"),
+                             colorbar_file=str(tmp_path / "cb.png"), row_label_col="name", threads=True)
+
+    assert (out["vmin"], out["vmax"]) == (-0.4, 1.5)
+    assert all(r["ok"] for r in out["results"]), [r["error"] for r in out["results"]]
+    assert os.path.exists(tmp_path / "h_m1.png") and os.path.exists(tmp_path / "cb.png")
+
+
+def test_value_range_ignores_text_columns(tmp_path):
+    path = tmp_path / "scores.csv"
+    pd.DataFrame({"name": ["r1", "r2"], "A": [3.0, -1.0]}).to_csv(path, index=False)
+    assert heatmap_value_range([str(path)]) == (-1.0, 3.0)
+
+
+def test_dataframe_input_not_modified(tmp_path):
+    df = pd.DataFrame({"a": [1.0, 2.0], "b": [3.0, 4.0]})
+    plot_heatmap_with_colorbar(df, col_labels=["x", "y"], heatmap_file=str(tmp_path / "h.png"),
+                               colorbar_file=None)
+    assert list(df.columns) == ["a", "b"]
@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+
+from hist import aggregate_long_table, plot_bar_chart_from_table
+
+
+def test_bar_chart_from_table_forwards_boot_max_n(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"method": np.repeat(["a", "b"], 40), "rmse": rng.normal(1.0, 0.2, 80)})
+    summary = plot_bar_chart_from_table(df, "method", "rmse", err="ci", boot_max_n=10,
+                                        save_path=str(tmp_path / "bar.png"))
+    expected = aggregate_long_table(df, "method", "rmse", err="ci", boot_max_n=10)
+    default = aggregate_long_table(df, "method", "rmse", err="ci")
+    pd.testing.assert_frame_equal(summary, expected)
+    assert not np.allclose(summary["err_low"], default["err_low"])
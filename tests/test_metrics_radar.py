@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics_radar import plot_metrics_radar
+
+
+@pytest.fixture
+def table(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 400
+    df = pd.DataFrame({"L": rng.integers(50, 1200, n), "y": rng.normal(size=n)})
+    df["a"] = df["y"] + rng.normal(0, 0.3, n)
+    df["b"] = np.nan
+    path = tmp_path / "pred.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("layout", ["grid", "overlay"])
+def test_all_nan_model_is_skipped(table, tmp_path, layout):
+    out = tmp_path / f"{layout}.png"
+    norm = plot_metrics_radar(table, "L", "y", ["a", "b"], layout=layout, save_path=str(out))
+    assert list(norm.index.get_level_values(0).unique()) == ["a"]
+    assert out.exists()
+
+
+def test_single_all_nan_model_raises(table, tmp_path):
+    with pytest.raises(ValueError):
+        plot_metrics_radar(table, "L", "y", "b", save_path=str(tmp_path / "b.png"))
@@ -0,0 +1,11 @@
+import numpy as np
+
+from plot_pred_vs_true_slope_bias_histograms import plot_pred_vs_true
+
+
+def test_without_categories_uses_single_class(tmp_path):
+    rng = np.random.default_rng(0)
+    y_true = rng.normal(size=200)
+    out = tmp_path / "pvt.png"
+    plot_pred_vs_true(y_true, y_true + rng.normal(0, 0.3, 200), save_path=str(out))
+    assert out.exists()
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from regression_report import _category_codes, generate_report, summary_metrics
+
+
+def test_missing_category_maps_to_na():
+    labels, codes = _category_codes(pd.Series(["a", None, "b", np.nan]))
+    assert labels == ["a", "b", "NA"]
+    assert [labels[c] for c in codes] == ["a", "NA", "b", "NA"]
+
+
+def test_empty_plots_rejected(tmp_path):
+    path = tmp_path / "pred.csv"
+    pd.DataFrame({"y": [1.0, 2.0], "p": [1.1, 1.9]}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        generate_report(str(path), "y", "p", out_dir=str(tmp_path / "out"), plots=[])
+
+
+def test_numeric_categories_with_nan(tmp_path):
+    labels, codes = _category_codes(pd.Series([1.0, np.nan, 2.0]))
+    assert labels == ["1.0", "2.0", "NA"]
+    assert [labels[c] for c in codes] == ["1.0", "NA", "2.0"]
+
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=60)
+    df = pd.DataFrame({"y": y, "p": y + rng.normal(0, 0.2, 60), "c": rng.choice([1.0, 2.0, np.nan], 60)})
+    path = tmp_path / "pred.csv"
+    df.to_csv(path, index=False)
+    report, _ = generate_report(str(path), "y", "p", out_dir=str(tmp_path / "out"), category_col="c",
+                                plots=["pred_vs_true"], max_workers=1)
+    assert os.path.exists(report)
+
+
+def test_summary_metrics_ignores_nan_pairs():
+    rng = np.random.default_rng(0)
+    y_true = rng.normal(size=100)
+    y_pred = 2 * y_true + 1
+    y_pred[5] = np.nan
+    m = summary_metrics(y_true, y_pred)
+    assert m.loc["All", "N"] == 99
+    assert m.loc["All", "Slope"] == pytest.approx(2)
+    assert m.loc["All", "Intercept"] == pytest.approx(1)
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+
+from render_cache import RenderCache
+
+
+def _data():
+    rng = np.random.default_rng(0)
+    return {f"c{i}": rng.normal(size=5) for i in range(3)}
+
+
+def test_none_output_is_cached(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    kwargs = dict(data_dict=_data(), heatmap_file=str(tmp_path / "h.png"), colorbar_file=None)
+    _, hit = cache.call("plot_heatmap_with_colorbar", **kwargs)
+    assert not hit
+    os.remove(tmp_path / "h.png")
+    _, hit = cache.call("plot_heatmap_with_colorbar", **kwargs)
+    assert hit
+    assert (tmp_path / "h.png").exists()
+
+
+def test_directory_scanned_only_when_needed(tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path / "cache"))
+    scans = []
+    entries = cache.entries
+    monkeypatch.setattr(cache, "entries", lambda: scans.append(1) or entries())
+    for i in range(3):
+        cache.call("plot_colorbar", vmin=0, vmax=i + 1, colorbar_file=str(tmp_path / f"cb{i}.png"))
+    assert len(scans) == 1        # 仅首次写入时扫描
+
+    # 估计总大小超限时淘汰到上限以内
+    cache.max_bytes = cache._total_bytes - 1
+    cache.call("plot_colorbar", vmin=0, vmax=9, colorbar_file=str(tmp_path / "cb9.png"))
+    assert len(scans) == 2
+    assert sum(size for _, size, _ in entries()) <= cache.max_bytes
@@ -0,0 +1,72 @@
+import http.client
+import json
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import render_server
+from render_server import RenderHandler, RenderService
+
+
+class FakePool:
+    """不启动进程的进程池替身：submit 返回由测试控制的 Future。"""
+
+    def __init__(self, *args, **kwargs):
+        self.futures = []
+        self.n_recycled = self.n_crashed = self.peak_rss_bytes = 0
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(render_server, "RecyclingPool", FakePool)
+    return RenderService(workers=1, max_pending=1, request_timeout=0.05)
+
+
+@pytest.fixture
+def server(service):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RenderHandler)
+    httpd.service, httpd.quiet = service, True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _post(server, body):
+    conn = http.client.HTTPConnection(*server.server_address)
+    conn.request("POST", "/render", body=json.dumps(body))
+    resp = conn.getresponse()
+    return resp.status, json.loads(resp.read())
+
+
+def test_timed_out_request_keeps_slot_until_done(service):
+    with pytest.raises(FutureTimeoutError):
+        service.render({"function": "plot_residual_hist", "id": "a"})
+    # 任务仍在运行：名额未归还
+    assert service.render({"function": "plot_residual_hist", "id": "b"}) is None
+    service._pool.futures[0].set_result({"ok": True})
+    assert service.slots.acquire(blocking=False)
+
+
+def test_non_object_body_returns_400(server):
+    status, body = _post(server, [1, 2, 3])
+    assert status == 400
+    assert "JSON" in body["error"]
+
+
+def test_rgba_format_rejected(server):
+    status, body = _post(server, {"function": "plot_residual_hist", "format": "rgba"})
+    assert status == 400
+    assert "rgba" in body["error"]
+    assert server.service._pool.futures == []
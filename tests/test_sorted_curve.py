@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from plot_sorted_curve import plot_sorted_curve, sorted_envelope
+
+
+@pytest.mark.parametrize("n_buckets", [4, 50])   # argpartition 与完整排序两条路径
+def test_sorted_envelope_matches_per_bucket_reference(n_buckets):
+    rng = np.random.default_rng(1)
+    y_true = rng.normal(size=1003)
+    y_pred = y_true + rng.normal(size=1003)
+    env = sorted_envelope(y_true, y_pred, n_buckets)
+
+    order = np.argsort(y_true)
+    bounds = np.linspace(0, len(y_true), n_buckets + 1).astype(int)
+    for b in range(n_buckets):
+        idx = order[bounds[b]:bounds[b + 1]]
+        assert env["true"][b] == pytest.approx(np.median(y_true[idx]))
+        assert env["median"][b] == pytest.approx(np.median(y_pred[idx]))
+        assert env["q05"][b] == pytest.approx(np.quantile(y_pred[idx], 0.05))
+
+
+def test_sorted_curve_rejects_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        plot_sorted_curve([1.0, 2.0], [1.0, 2.5], mode="bogus", save_path=str(tmp_path / "s.png"))
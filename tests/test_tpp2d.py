@@ -0,0 +1,23 @@
+import numpy as np
+
+import batch_render
+from CETSA_curve import fit_tpp2d, plot_tpp2d_hits
+
+
+def test_hit_heatmaps_follow_protein_rows_of_filtered_summary(monkeypatch, tmp_path):
+    rng = np.random.default_rng(0)
+    temps = np.array([40.0, 45.0, 50.0])
+    concs = np.array([0.0, 0.1, 1.0, 10.0])
+    intensity = rng.lognormal(0, 0.02, (6, len(temps), len(concs)))
+    summary, _, log2fc = fit_tpp2d(intensity, temps, concs, proteins=[f"P{i}" for i in range(6)])
+    summary["hit"] = [False, True, False, False, True, False]
+
+    captured = []
+    monkeypatch.setattr(batch_render, "render_batch", lambda jobs, **kwargs: captured.extend(jobs) or [])
+    # 先筛选再逆序：位置与原始行号都不一致
+    plot_tpp2d_hits(summary[summary.hit].iloc[::-1], log2fc, temps, concs, out_dir=str(tmp_path))
+
+    assert {job["id"] for job in captured} == {"P1", "P4"}
+    for job in captured:
+        row = int(job["id"][1:])
+        np.testing.assert_array_equal(job["kwargs"]["log2fc"], log2fc[row])